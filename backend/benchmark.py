@@ -0,0 +1,654 @@
+"""
+HTTP load and latency benchmark for the Material Map API
+Generates a synthetic dataset, starts the app in a subprocess and drives every
+route in main.py at a fixed concurrency. Latency percentiles, throughput, DB
+queries per request (from the Server-Timing header) and peak server RSS are written to a JSON file that can be
+compared against a previous run.
+
+Usage:
+    python benchmark.py run --stores 500 --products 5000 --concurrency 8 --output bench.json
+    python benchmark.py run --server gunicorn --workers 4 --baseline bench.json --threshold 0.15
+    python benchmark.py compare bench.json new.json --threshold 0.15
+    python benchmark.py formats --skip-generate --output formats.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Emitted by instrumentation.py: db;dur=<ms>;desc="<n> queries", app;dur=<ms>
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+# Routes that wipe or reseed the database would invalidate the generated dataset,
+# and image uploads depend on external storage
+SKIPPED_ROUTES = {
+    ('POST', '/api/reseed'),
+    ('POST', '/api/quick-seed'),
+    ('POST', '/api/seed'),
+    ('POST', '/api/products/<product_id>/image'),
+    ('POST', '/api/products/images'),
+    ('POST', '/api/stores/<store_id>/image'),
+    ('GET', '/media/<path:key>'),
+}
+
+# Response formats compared by `formats` (see response_formats.py), and the list routes they are compared on
+FORMAT_ACCEPT = {
+    'json': 'application/json',
+    'json-columnar': 'application/json; layout=columnar',
+    'msgpack': 'application/msgpack',
+    'msgpack-columnar': 'application/msgpack; layout=columnar',
+}
+FORMAT_ROUTES = (
+    '/api/products',
+    '/api/stores',
+    '/api/inventory',
+    '/api/inventory/store/{store_id}',
+    '/api/products/{product_id}/inventory',
+)
+
+
+# ============ CLIENT SIDE ============
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def _process_tree(root_pid):
+    """PIDs of a process and all its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler(threading.Thread):
+    """Samples the total RSS of the server process tree and keeps the peak"""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if not os.path.isdir('/proc'):
+            return
+        while not self._stop_event.is_set():
+            total = sum(_rss_kb(pid) for pid in _process_tree(self.pid))
+            self.peak_kb = max(self.peak_kb, total)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Client:
+    """Minimal keep-alive HTTP client (one per load thread)"""
+
+    def __init__(self, host, port, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, response.headers, data
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed the keep-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def get_json(self, path):
+        status, _, data = self.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(data)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def collect_samples(client, rng):
+    """Pick ids, categories and search terms from the running API to parameterize routes"""
+    products = client.get_json('/api/products')
+    stores = client.get_json('/api/stores')
+    if not products or not stores:
+        raise RuntimeError("Dataset is empty - run without --skip-generate")
+
+    product_sample = rng.sample(products, min(200, len(products)))
+    store_sample = rng.sample(stores, min(100, len(stores)))
+
+    item_ids = []
+    for store in store_sample[:10]:
+        item_ids.extend(i['id'] for i in client.get_json(f"/api/inventory/store/{store['id']}"))
+
+    email = f"bench-{rng.getrandbits(32):08x}@example.com"
+    status, _, data = client.request('POST', '/api/auth/register', {'email': email, 'password': 'bench-password'})
+    token = json.loads(data)['access_token'] if status == 201 else ''
+
+    return {
+        'product_ids': [p['id'] for p in product_sample],
+        'store_ids': [s['id'] for s in store_sample],
+        'item_ids': item_ids or [''],
+        'product_categories': sorted({p['category'] for p in products}),
+        'store_categories': sorted({s['category'] for s in stores if s.get('category')}),
+        'search_terms': sorted({p['name'].split()[0].lower() for p in product_sample}),
+        'coordinates': [(s['latitude'], s['longitude']) for s in store_sample if s.get('latitude')],
+        'email': email,
+        'token': token,
+        'product_id_for_writes': product_sample[0]['id'],
+        'store_id_for_writes': store_sample[0]['id'],
+        'created_item_ids': [],
+    }
+
+
+def route_specs():
+    """
+    (method, rule, request factory) for every benchmarked route
+
+    A factory takes (rng, samples) and returns (path, json_body). Reads come
+    first so that writes don't change the data the read numbers are based on.
+    """
+    def fixed(path):
+        return lambda rng, s: (path, None)
+
+    def with_query(path, params_fn):
+        return lambda rng, s: (f"{path}?{urlencode(params_fn(rng, s))}", None)
+
+    def nearby_params(rng, s):
+        lat, lon = rng.choice(s['coordinates'])
+        return {'latitude': lat, 'longitude': lon, 'radius': 5}
+
+    def browse_params(rng, s):
+        lat, lon = rng.choice(s['coordinates'])
+        return {'category': rng.choice(s['product_categories']), 'in_stock': 'true',
+                'latitude': lat, 'longitude': lon, 'radius': 10, 'sort': 'price_asc'}
+
+    def create_inventory(rng, s):
+        return '/api/inventory', {
+            'product_id': s['product_id_for_writes'],
+            'store_id': s['store_id_for_writes'],
+            'price': round(rng.uniform(10, 500), 2),
+            'quantity': rng.randint(1, 100),
+        }
+
+    def delete_inventory(rng, s):
+        item_id = s['created_item_ids'].pop() if s['created_item_ids'] else 'missing'
+        return f"/api/inventory/{item_id}", None
+
+    return [
+        ('GET', '/', fixed('/')),
+        ('GET', '/health', fixed('/health')),
+        ('GET', '/api/health', fixed('/api/health')),
+        ('GET', '/api/status', fixed('/api/status')),
+        ('GET', '/api/products', fixed('/api/products')),
+        ('GET', '/api/products/category/<category>',
+         lambda rng, s: (f"/api/products/category/{rng.choice(s['product_categories'])}", None)),
+        ('GET', '/api/products/browse', with_query('/api/products/browse', browse_params)),
+        ('GET', '/api/products/search', with_query('/api/products/search', lambda rng, s: {'q': rng.choice(s['search_terms'])})),
+        ('GET', '/api/products/<product_id>', lambda rng, s: (f"/api/products/{rng.choice(s['product_ids'])}", None)),
+        ('GET', '/api/products/<product_id>/inventory',
+         lambda rng, s: (f"/api/products/{rng.choice(s['product_ids'])}/inventory", None)),
+        ('GET', '/api/products/<product_id>/price-history',
+         lambda rng, s: (f"/api/products/{rng.choice(s['product_ids'])}/price-history", None)),
+        ('GET', '/api/deals', with_query('/api/deals', nearby_params)),
+        ('GET', '/api/stores', fixed('/api/stores')),
+        ('GET', '/api/store-categories', fixed('/api/store-categories')),
+        ('GET', '/api/store-categories/<category>/items',
+         lambda rng, s: (f"/api/store-categories/{rng.choice(s['store_categories'])}/items?"
+                         f"{urlencode(nearby_params(rng, s))}", None)),
+        ('GET', '/api/stores/category/<category>',
+         lambda rng, s: (f"/api/stores/category/{rng.choice(s['store_categories'])}", None)),
+        ('GET', '/api/stores/<store_id>', lambda rng, s: (f"/api/stores/{rng.choice(s['store_ids'])}", None)),
+        ('GET', '/api/stores/nearby', with_query('/api/stores/nearby', nearby_params)),
+        ('GET', '/api/stores/<store_id>/catalog',
+         lambda rng, s: (f"/api/stores/{rng.choice(s['store_ids'])}/catalog", None)),
+        ('GET', '/api/inventory', fixed('/api/inventory')),
+        ('GET', '/api/inventory/product/<product_id>',
+         lambda rng, s: (f"/api/inventory/product/{rng.choice(s['product_ids'])}", None)),
+        ('GET', '/api/inventory/store/<store_id>',
+         lambda rng, s: (f"/api/inventory/store/{rng.choice(s['store_ids'])}", None)),
+        ('GET', '/api/inventory/<item_id>', lambda rng, s: (f"/api/inventory/{rng.choice(s['item_ids'])}", None)),
+        ('GET', '/api/debug/query-stats', fixed('/api/debug/query-stats')),
+        ('GET', '/metrics', fixed('/metrics')),
+        ('GET', '/api/auth/me', with_query('/api/auth/me', lambda rng, s: {'token': s['token']})),
+        ('POST', '/api/auth/login',
+         lambda rng, s: ('/api/auth/login', {'email': s['email'], 'password': 'bench-password'})),
+        ('POST', '/api/auth/register',
+         lambda rng, s: ('/api/auth/register', {'email': f"bench-{rng.getrandbits(64):016x}@example.com",
+                                                'password': 'bench-password'})),
+        ('POST', '/api/auth/logout', lambda rng, s: ('/api/auth/logout', None)),
+        ('POST', '/api/products', lambda rng, s: ('/api/products', {
+            'name': 'Bench Product', 'brand': 'Bench', 'category': rng.choice(s['product_categories']), 'unit': '1 piece'})),
+        ('POST', '/api/stores', lambda rng, s: ('/api/stores', {
+            'name': 'Bench Store', 'address': 'Bench Road', 'latitude': 11.34, 'longitude': 77.71})),
+        ('POST', '/api/inventory', create_inventory),
+        ('PUT', '/api/inventory/<item_id>', lambda rng, s: (f"/api/inventory/{rng.choice(s['item_ids'])}", {
+            'price': round(rng.uniform(10, 500), 2), 'quantity': rng.randint(1, 100)})),
+        ('DELETE', '/api/inventory/<item_id>', delete_inventory),
+    ]
+
+
+def run_route(host, port, method, rule, factory, samples, requests_count, concurrency, seed):
+    """Fire requests_count requests at fixed concurrency and summarize latencies"""
+    rng = random.Random(f"{seed}:{method} {rule}")
+    plan = [factory(rng, samples) for _ in range(requests_count)]
+    lock = threading.Lock()
+    latencies, query_counts = [], []
+    errors = 0
+    cursor = iter(plan)
+
+    def worker():
+        nonlocal errors
+        client = Client(host, port)
+        try:
+            while True:
+                with lock:
+                    job = next(cursor, None)
+                if job is None:
+                    return
+                path, body = job
+                started = time.perf_counter()
+                try:
+                    status, headers, data = client.request(method, path, body)
+                except Exception:
+                    with lock:
+                        errors += 1
+                    continue
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 500:
+                        errors += 1
+                    match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+                    if match:
+                        query_counts.append(int(match.group(1)))
+                    if method == 'POST' and path == '/api/inventory' and status == 201:
+                        samples['created_item_ids'].append(json.loads(data)['id'])
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'requests': len(plan),
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'db_queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def start_server(args, port, env):
+    if args.server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '--chdir', BACKEND_DIR,
+               '--config', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--timeout', '120', 'main:app']
+    elif args.server == 'asgi':
+        # ASGI variants only report DB query counts if they emit the same Server-Timing header
+        cmd = [sys.executable, '-m', 'uvicorn', '--app-dir', BACKEND_DIR, '--host', '127.0.0.1',
+               '--port', str(port), '--workers', str(args.workers), '--log-level', 'warning', args.app]
+    else:
+        cmd = [sys.executable, os.path.join(BACKEND_DIR, 'benchmark.py'), 'serve', '--port', str(port)]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL if not args.verbose else None,
+                            stderr=subprocess.DEVNULL if not args.verbose else None)
+
+
+def wait_for_server(port, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def _free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two result files route by route
+
+    A route regresses when its p95 latency grows or its throughput drops by
+    more than `threshold` (fraction). Returns a list of human-readable regressions.
+    """
+    regressions = []
+    for route, new in current['routes'].items():
+        old = baseline.get('routes', {}).get(route)
+        if not old or old.get('p95_ms') is None or new.get('p95_ms') is None:
+            continue
+        if new['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            regressions.append(f"{route}: p95 {old['p95_ms']}ms -> {new['p95_ms']}ms")
+        if old.get('throughput_rps') and new['throughput_rps'] < old['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{route}: throughput {old['throughput_rps']} -> {new['throughput_rps']} req/s")
+        if (old.get('db_queries_per_request') is not None and new.get('db_queries_per_request') is not None
+                and new['db_queries_per_request'] > old['db_queries_per_request']):
+            regressions.append(f"{route}: queries/request {old['db_queries_per_request']} -> {new['db_queries_per_request']}")
+    return regressions
+
+
+def prepare_dataset(args):
+    """Server environment for args.database_url, generating the dataset unless --skip-generate"""
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'material_map_bench.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, ENVIRONMENT='benchmark')
+
+    if not args.skip_generate:
+        print(f"🔄 Generating dataset ({args.stores} stores, {args.products} products, density {args.density})...")
+        subprocess.run([sys.executable, os.path.join(BACKEND_DIR, 'generate_data.py'),
+                        '--stores', str(args.stores), '--products', str(args.products),
+                        '--density', str(args.density), '--seed', str(args.seed), '--reset'],
+                       cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    return database_url, env
+
+
+def run(args):
+    database_url, env = prepare_dataset(args)
+
+    # Size the connection pools for how the server will actually run (see db_pool.py)
+    if args.server == 'flask':
+        env.update(WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.concurrency))
+    else:
+        env.update(WEB_CONCURRENCY=str(args.workers))
+    port = _free_port()
+    proc = start_server(args, port, env)
+    sampler = None
+    try:
+        wait_for_server(port, proc)
+        sampler = RssSampler(proc.pid)
+        sampler.start()
+
+        rng = random.Random(args.seed)
+        setup_client = Client('127.0.0.1', port)
+        samples = collect_samples(setup_client, rng)
+        setup_client.close()
+
+        specs = [s for s in route_specs() if (s[0], s[1]) not in SKIPPED_ROUTES]
+        if args.routes:
+            specs = [s for s in specs if any(pattern in s[1] for pattern in args.routes)]
+
+        results = {}
+        for method, rule, factory in specs:
+            name = f"{method} {rule}"
+            # Warm up connection pools and caches without recording
+            run_route('127.0.0.1', port, method, rule, factory, samples, min(args.concurrency, args.requests), args.concurrency, args.seed)
+            results[name] = run_route('127.0.0.1', port, method, rule, factory, samples, args.requests, args.concurrency, args.seed)
+            r = results[name]
+            print(f"  {name:45s} p50 {r['p50_ms']}ms  p95 {r['p95_ms']}ms  p99 {r['p99_ms']}ms  "
+                  f"{r['throughput_rps']} req/s  queries {r['db_queries_per_request']}  errors {r['errors']}")
+    finally:
+        if sampler:
+            sampler.stop()
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'server': args.server,
+            'workers': args.workers,
+            'database': database_url.split(':', 1)[0],
+            'dataset': {'stores': args.stores, 'products': args.products, 'density': args.density, 'seed': args.seed},
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+        },
+        'peak_rss_mb': round(sampler.peak_kb / 1024, 1) if sampler and sampler.peak_kb else None,
+        'routes': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output} (peak RSS {report['peak_rss_mb']} MB)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return report_regressions(compare(baseline, report, args.threshold))
+    return 0
+
+
+def decode_body(content_type, data):
+    if content_type.startswith('application/msgpack'):
+        import ormsgpack
+        return ormsgpack.unpackb(data)
+    return json.loads(data)
+
+
+def measure_formats(client, samples, repeats):
+    """
+    Body size (plain and gzip) and client-side decode time of every list route in every format
+
+    Decoding runs in this process (json / ormsgpack); it stands in for the
+    relative cost on the client, not for its absolute speed.
+    """
+    results = {}
+    for template in FORMAT_ROUTES:
+        path = template.format(store_id=samples['store_ids'][0], product_id=samples['product_ids'][0])
+        results[template] = {}
+        for name, accept in FORMAT_ACCEPT.items():
+            status, headers, data = client.request('GET', path, headers={'Accept': accept})
+            if status != 200:
+                raise RuntimeError(f"GET {path} ({name}) returned {status}")
+            _, gzip_headers, gzip_data = client.request('GET', path, headers={'Accept': accept, 'Accept-Encoding': 'gzip'})
+            content_type = headers.get('Content-Type', '')
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                decode_body(content_type, data)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results[template][name] = {
+                'content_type': content_type,
+                'bytes': len(data),
+                'gzip_bytes': len(gzip_data) if gzip_headers.get('Content-Encoding') == 'gzip' else None,
+                'decode_ms': round(timings[len(timings) // 2] * 1000, 3),
+            }
+    return results
+
+
+def formats(args):
+    database_url, env = prepare_dataset(args)
+    env.update(WEB_CONCURRENCY='1', GUNICORN_THREADS='1')
+    args.server = 'flask'
+    port = _free_port()
+    proc = start_server(args, port, env)
+    try:
+        wait_for_server(port, proc)
+        client = Client('127.0.0.1', port)
+        samples = collect_samples(client, random.Random(args.seed))
+        results = measure_formats(client, samples, args.repeats)
+        client.close()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    for route, by_format in results.items():
+        print(f"  {route}")
+        baseline = by_format['json']
+        for name, r in by_format.items():
+            gzip_bytes = f"{r['gzip_bytes']:,}" if r['gzip_bytes'] else '-'
+            print(f"    {name:17s} {r['bytes']:>11,} B  gzip {gzip_bytes:>11} B  "
+                  f"decode {r['decode_ms']}ms  ({r['bytes'] / baseline['bytes']:.0%} of JSON)")
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'database': database_url.split(':', 1)[0],
+            'dataset': {'stores': args.stores, 'products': args.products, 'density': args.density, 'seed': args.seed},
+            'repeats': args.repeats,
+        },
+        'routes': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    return 0
+
+
+def report_regressions(regressions):
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every Material Map API route')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='Generate data, start the server and benchmark all routes')
+    run_parser.add_argument('--stores', type=int, default=500)
+    run_parser.add_argument('--products', type=int, default=5000)
+    run_parser.add_argument('--density', type=float, default=0.05)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--database-url', help='Database to benchmark against (default: temp SQLite file)')
+    run_parser.add_argument('--skip-generate', action='store_true', help='Reuse the existing dataset')
+    run_parser.add_argument('--server', choices=['flask', 'gunicorn', 'asgi'], default='flask')
+    run_parser.add_argument('--app', default='main:app', help='ASGI app import path for --server asgi')
+    run_parser.add_argument('--workers', type=int, default=4, help='Worker processes for gunicorn/asgi')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+    run_parser.add_argument('--routes', nargs='*', help='Only benchmark routes containing these substrings')
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--baseline', help='Previous result file to check for regressions')
+    run_parser.add_argument('--threshold', type=float, default=0.15, help='Allowed regression fraction (default: 0.15)')
+    run_parser.add_argument('--verbose', action='store_true', help='Show server output')
+
+    compare_parser = sub.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15)
+
+    formats_parser = sub.add_parser('formats', help='Compare JSON and MessagePack body sizes and decode times')
+    formats_parser.add_argument('--stores', type=int, default=500)
+    formats_parser.add_argument('--products', type=int, default=5000)
+    formats_parser.add_argument('--density', type=float, default=0.05)
+    formats_parser.add_argument('--seed', type=int, default=42)
+    formats_parser.add_argument('--database-url', help='Database to read (default: temp SQLite file)')
+    formats_parser.add_argument('--skip-generate', action='store_true', help='Reuse the existing dataset')
+    formats_parser.add_argument('--repeats', type=int, default=5, help='Decodes per body (median is reported)')
+    formats_parser.add_argument('--output', default='bench_formats.json')
+    formats_parser.add_argument('--verbose', action='store_true', help='Show server output')
+
+    serve_parser = sub.add_parser('serve', help='Run the threaded Flask development server (used internally)')
+    serve_parser.add_argument('--port', type=int, required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        from main import app
+        app.run(host='127.0.0.1', port=args.port, threaded=True)
+        return 0
+    if args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        return report_regressions(compare(baseline, current, args.threshold))
+    if args.command == 'formats':
+        return formats(args)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Per-worker in-memory catalog snapshot
+The catalog (products, stores, store categories) changes a few times a day but
+is read constantly, so each worker keeps an immutable snapshot of it built from
+compact __slots__ records and indexed by id and category. Serialized list
+responses are memoized on the snapshot.
+
+A single-row `catalog_version` counter is bumped in the same transaction as any
+ORM write to the tracked models. Readers poll it at most every
+CATALOG_POLL_SECONDS (one primary-key lookup) and, when it moves, build a new
+snapshot and swap the module-level reference; requests already holding the old
+snapshot finish with it.
+
+Rows written outside the ORM (bulk loads, raw SQL) must call bump_version().
+
+Usage (in main.py):
+    from catalog_snapshot import init_catalog, get_catalog
+    init_catalog(db, CatalogVersion, Product, Store)
+    catalog = get_catalog()  # None when disabled or the DB is unreachable
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'True').lower() == 'true'
+CATALOG_POLL_SECONDS = float(os.getenv('CATALOG_POLL_SECONDS', 2))
+# memory: one Python copy per worker; shared: one mmap file per host (see shared_catalog.py)
+CATALOG_SNAPSHOT_MODE = os.getenv('CATALOG_SNAPSHOT_MODE', 'memory').lower()
+
+_db = None
+_version_model = None
+_product_model = None
+_store_model = None
+_prebuild = None
+
+_snapshot = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+class ProductRecord:
+    """Read-only product row (duck-types the Product model for product_to_dict)"""
+
+    __slots__ = ('id', 'name', 'brand', 'category', 'image_url', 'description', 'unit', 'created_at')
+
+    def __init__(self, row):
+        for slot, value in zip(self.__slots__, row):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('catalog records are immutable')
+
+
+class StoreRecord:
+    """Read-only store row (duck-types the Store model for store_to_dict)"""
+
+    __slots__ = ('id', 'name', 'category', 'address', 'latitude', 'longitude', 'phone', 'image_url', 'created_at')
+
+    def __init__(self, row):
+        for slot, value in zip(self.__slots__, row):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('catalog records are immutable')
+
+
+class CatalogSnapshot:
+    """Immutable catalog at one version, with lookup indexes"""
+
+    def __init__(self, version, products, stores):
+        self.version = version
+        self.loaded_at = time.time()
+        self.products = tuple(products)
+        self.stores = tuple(stores)
+        self.products_by_id = {p.id: p for p in self.products}
+        self.stores_by_id = {s.id: s for s in self.stores}
+        self.products_by_category = _group(self.products, 'category')
+        self.stores_by_category = _group(self.stores, 'category')
+        self.store_categories = tuple(sorted(c for c in self.stores_by_category if c))
+        self._responses = {}
+
+    def response(self, key, build):
+        """
+        Memoized serialized body for this version
+
+        Args:
+            key: Cache key, e.g. 'products' or ('stores', category)
+            build: Called once to produce the body (str or bytes)
+        """
+        body = self._responses.get(key)
+        if body is None:
+            # Racing threads may both build; either result is the same
+            body = self._responses[key] = build()
+        return body
+
+
+def _group(records, attribute):
+    groups = {}
+    for record in records:
+        groups.setdefault(getattr(record, attribute), []).append(record)
+    return {key: tuple(values) for key, values in groups.items()}
+
+
+def init_catalog(db, version_model, product_model, store_model, prebuild=None):
+    """
+    Bump catalog_version on ORM writes to the given models and enable get_catalog()
+
+    Args:
+        prebuild: Optional function(snapshot) -> {response key: body}; in shared
+            mode these bodies are written into the shared file once per version
+    """
+    global _db, _version_model, _product_model, _store_model, _prebuild
+    _db = db
+    _version_model = version_model
+    _product_model = product_model
+    _store_model = store_model
+    _prebuild = prebuild
+
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_bulk_delete', _after_bulk_write)
+        event.listen(Session, 'after_bulk_update', _after_bulk_write)
+        event.listen(Session, 'after_commit', _after_commit)
+
+
+def _tracked(obj):
+    return isinstance(obj, (_product_model, _store_model))
+
+
+def _after_flush(session, flush_context):
+    # new/dirty/deleted and attribute history still describe the flush here
+    changed = (
+        any(_tracked(obj) for obj in session.new)
+        or any(_tracked(obj) for obj in session.deleted)
+        or any(_tracked(obj) and session.is_modified(obj) for obj in session.dirty)
+    )
+    if changed:
+        bump_version(session.connection())
+        session.info['catalog_changed'] = True
+
+
+def _after_bulk_write(context):
+    entity = context.query.column_descriptions[0].get('entity')
+    if entity in (_product_model, _store_model):
+        bump_version(context.session.connection())
+        context.session.info['catalog_changed'] = True
+
+
+def _after_commit(session):
+    # The writing worker sees its own change on the next read instead of after the poll interval
+    global _checked_at
+    if session.info.pop('catalog_changed', False):
+        _checked_at = 0.0
+
+
+def bump_version(connection):
+    """Mark the catalog as changed in the caller's transaction"""
+    table = _version_model.__table__
+    result = connection.execute(
+        table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        # A new counter (fresh or reset database) starts from the clock, not 1, so it
+        # never repeats a version that a worker or the shared file still holds
+        connection.execute(table.insert().values(id=1, version=time.time_ns() // 1000))
+
+
+def _current_version(session):
+    table = _version_model.__table__
+    return session.execute(select(table.c.version).where(table.c.id == 1)).scalar() or 0
+
+
+def load_snapshot():
+    """Read the catalog from the database (version first, so a concurrent write triggers another reload)"""
+    session = _db.session
+    version = _current_version(session)
+    product_columns = [getattr(_product_model, name) for name in ProductRecord.__slots__]
+    store_columns = [getattr(_store_model, name) for name in StoreRecord.__slots__]
+    products = [
+        ProductRecord(row) for row in session.execute(
+            select(*product_columns).order_by(_product_model.name, _product_model.id)
+        )
+    ]
+    stores = [
+        StoreRecord(row) for row in session.execute(
+            select(*store_columns).order_by(_store_model.name, _store_model.id)
+        )
+    ]
+    return CatalogSnapshot(version, products, stores)
+
+
+def load_shared_snapshot(version):
+    """Map the host-wide catalog file, building it first if it is older than version"""
+    from shared_catalog import (
+        SharedCatalog, SharedSnapshot, catalog_path, ensure_catalog_file, write_catalog_file
+    )
+
+    path = catalog_path(_db.engine.url)
+
+    def build():
+        snapshot = load_snapshot()
+        write_catalog_file(path, snapshot, _prebuild(snapshot) if _prebuild else {})
+
+    ensure_catalog_file(path, version, build)
+    return SharedSnapshot(SharedCatalog(path))
+
+
+def get_catalog():
+    """
+    Current snapshot, reloaded if the version counter moved
+
+    Returns:
+        CatalogSnapshot, or None if disabled or the catalog could not be loaded
+        (callers then fall back to querying the database)
+    """
+    global _snapshot, _checked_at
+    if not CATALOG_SNAPSHOT_ENABLED or _db is None:
+        return None
+
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < CATALOG_POLL_SECONDS:
+        return snapshot
+
+    # One thread polls/reloads; the others keep serving the snapshot they have
+    if snapshot is not None and not _reload_lock.acquire(blocking=False):
+        return snapshot
+    if snapshot is None:
+        _reload_lock.acquire()
+    try:
+        if _snapshot is not None and _snapshot is not snapshot:
+            return _snapshot
+        version = _current_version(_db.session)
+        if _snapshot is None or version != _snapshot.version:
+            _snapshot = load_shared_snapshot(version) if CATALOG_SNAPSHOT_MODE == 'shared' else load_snapshot()
+            print(f"🔄 Catalog snapshot v{_snapshot.version}: "
+                  f"{len(_snapshot.products)} products, {len(_snapshot.stores)} stores")
+        _checked_at = time.monotonic()
+        return _snapshot
+    except Exception as e:
+        print(f"⚠️  Catalog snapshot unavailable: {e}")
+        _db.session.rollback()
+        return snapshot
+    finally:
+        _reload_lock.release()
+
+
+def reset_catalog():
+    """Drop the snapshot so the next get_catalog() reloads (tests, reseeds)"""
+    global _snapshot, _checked_at
+    _snapshot = None
+    _checked_at = 0.0
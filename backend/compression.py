@@ -0,0 +1,189 @@
+"""
+Response compression with Accept-Encoding negotiation
+An after_request hook compresses JSON, MessagePack and text responses of at least
+COMPRESSION_MIN_BYTES (default 1024). The encoding is the client's best
+match among zstd (when the zstandard package is installed), br (when brotli
+is installed) and gzip, which is always available. Responses without an
+Accept-Encoding header, below the threshold, already encoded or streamed
+are sent as they are.
+
+Bodies that are served many times from a cache (catalog lists, responses held
+by single_flight.py) are marked with precompressed(response, key). Their
+encoded form is kept per key and encoding in a per-worker LRU of at most
+COMPRESSION_CACHE_MAX_BYTES, so they are compressed once per cache fill, at
+the higher COMPRESSION_CACHED_*_LEVEL, instead of on every response. Keys
+must change whenever the body does (e.g. include the catalog version).
+
+Usage (in main.py):
+    from compression import init_compression, precompressed
+    init_compression(app)
+    return precompressed(response, ('catalog', catalog.version, 'products'))
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+from metrics import record_cache
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+# Per-response levels; cached bodies are compressed once, so they can afford more
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', 4))
+COMPRESSION_CACHED_GZIP_LEVEL = int(os.getenv('COMPRESSION_CACHED_GZIP_LEVEL', 9))
+COMPRESSION_CACHED_ZSTD_LEVEL = int(os.getenv('COMPRESSION_CACHED_ZSTD_LEVEL', 10))
+COMPRESSION_CACHED_BROTLI_LEVEL = int(os.getenv('COMPRESSION_CACHED_BROTLI_LEVEL', 9))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack',
+    'application/javascript', 'application/xml', 'image/svg+xml',
+}
+# Statuses whose body is empty or must not be re-encoded
+SKIPPED_STATUSES = {204, 206, 304}
+
+
+def _gzip(data, level):
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _zstd(data, level):
+    # Compressor objects are not thread-safe; a new one per call is cheap next to the work
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+# Preferred first when the client rates several equally
+ENCODERS = OrderedDict()
+if ZSTD_AVAILABLE:
+    ENCODERS['zstd'] = (_zstd, COMPRESSION_ZSTD_LEVEL, COMPRESSION_CACHED_ZSTD_LEVEL)
+if BROTLI_AVAILABLE:
+    ENCODERS['br'] = (_brotli, COMPRESSION_BROTLI_LEVEL, COMPRESSION_CACHED_BROTLI_LEVEL)
+ENCODERS['gzip'] = (_gzip, COMPRESSION_GZIP_LEVEL, COMPRESSION_CACHED_GZIP_LEVEL)
+
+
+class EncodedBodyCache:
+    """LRU of encoded bodies by (key, encoding), bounded by total bytes"""
+
+    def __init__(self, max_bytes=COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = EncodedBodyCache()
+
+
+def _reset_after_fork():
+    global _cache
+    _cache = EncodedBodyCache()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def precompressed(response, key):
+    """Mark a response whose body is the same for every request with `key`, so its encodings are cached"""
+    response.compression_key = key
+    return response
+
+
+def negotiate(accept_encodings):
+    """Best encoding we support for the client's Accept-Encoding, or None"""
+    return accept_encodings.best_match(ENCODERS)
+
+
+def compressible(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in SKIPPED_STATUSES:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def compress_response(response):
+    """after_request hook: encode the body for the client when it is worth it"""
+    if not COMPRESSION_ENABLED or not compressible(response):
+        return response
+    # Caches must keep one copy per encoding, even of bodies sent uncompressed
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    encode, level, cached_level = ENCODERS[encoding]
+    key = getattr(response, 'compression_key', None)
+    if key is None:
+        body = encode(data, level)
+    else:
+        body = _cache.get((key, encoding))
+        record_cache('compression', body is not None)
+        if body is None:
+            body = encode(data, cached_level)
+            _cache.put((key, encoding), body)
+
+    if len(body) >= len(data):
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Compress eligible responses after every other after_request hook has run"""
+    # after_request hooks run in reverse order of registration; this one goes first in the list
+    if compress_response not in app.after_request_funcs.setdefault(None, []):
+        app.after_request_funcs[None].insert(0, compress_response)
+    return app
@@ -0,0 +1,49 @@
+"""
+Fixtures for tests that exercise the real app in main.py
+main.py reads DATABASE_URL when it is imported, so the first test asking for
+`client` imports it against a SQLite file in a session temp directory and
+migrates it once. Every test then starts from empty tables and empty caches.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def main_module(tmp_path_factory):
+    previous = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp_path_factory.mktemp('main') / 'main.db'}"
+    try:
+        import main
+    finally:
+        if previous is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous
+
+    with main.app.app_context():
+        main.migrate(main.db.engine, verbose=False)
+        main.init_db_tables.executed = True
+    return main
+
+
+@pytest.fixture
+def main_app(main_module):
+    import catalog_snapshot
+    import single_flight
+    from models import db
+
+    with main_module.app.app_context():
+        with db.engine.begin() as connection:
+            for table in reversed(db.metadata.sorted_tables):
+                connection.execute(table.delete())
+    single_flight._cache.clear()
+    catalog_snapshot.reset_catalog()
+    yield main_module.app
+    catalog_snapshot.reset_catalog()
+
+
+@pytest.fixture
+def client(main_app):
+    return main_app.test_client()
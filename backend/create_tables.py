@@ -4,10 +4,11 @@ Run this AFTER updating config files and before running main.py
 """
 
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from db_pool import engine_options, normalize_database_url
+from migrations import migrate
+from models import db
 
 load_dotenv()
 
@@ -21,65 +22,15 @@ if not db_url:
     exit(1)
 
 # Convert to psycopg format
-if db_url.startswith('postgresql://'):
-    db_url = db_url.replace('postgresql://', 'postgresql+psycopg://', 1)
+db_url = normalize_database_url(db_url)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_size': 10,
-    'pool_recycle': 3600,
-    'pool_pre_ping': True,
-}
+# A one-off script: the whole connection budget is this process's (see db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url, workers=1)
 
-db = SQLAlchemy(app)
-
-# ============ DATABASE MODELS ============
-
-class User(db.Model):
-    __tablename__ = 'users'
-    id = db.Column(db.String(36), primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    hashed_password = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Product(db.Model):
-    __tablename__ = 'products'
-    id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(255), nullable=False)
-    brand = db.Column(db.String(255), nullable=False)
-    category = db.Column(db.String(100), nullable=False, index=True)
-    image_url = db.Column(db.String(500))
-    description = db.Column(db.Text)
-    unit = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Store(db.Model):
-    __tablename__ = 'stores'
-    id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(255), nullable=False)
-    category = db.Column(db.String(100), nullable=False, index=True, default='other')
-    address = db.Column(db.String(500), nullable=False)
-    latitude = db.Column(db.Float)
-    longitude = db.Column(db.Float)
-    phone = db.Column(db.String(20))
-    image_url = db.Column(db.String(500))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class InventoryItem(db.Model):
-    __tablename__ = 'inventory_item'
-    id = db.Column(db.String(36), primary_key=True)
-    product_id = db.Column(db.String(36), db.ForeignKey('products.id'), nullable=False)
-    store_id = db.Column(db.String(36), db.ForeignKey('stores.id'), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    original_price = db.Column(db.Float)
-    discount_percentage = db.Column(db.Float, default=0)
-    offer_valid_until = db.Column(db.DateTime)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    product = db.relationship('Product', backref='inventory_items')
-    store = db.relationship('Store', backref='inventory_items')
+# The same models and migrations as main.py (see models.py, migrations.py)
+db.init_app(app)
 
 # ============ INITIALIZATION ============
 
@@ -90,12 +41,8 @@ def create_tables():
             print("🔄 Creating tables in Supabase PostgreSQL...")
             print("-" * 50)
             
-            # Drop existing tables (optional - comment out for production)
-            # print("Dropping existing tables...")
-            # db.drop_all()
-            
-            # Create all tables
-            db.create_all()
+            # Create missing tables and apply pending migrations (indexes, new columns)
+            migrate(db.engine)
             
             print("✅ Tables created successfully!")
             print("-" * 50)
@@ -122,7 +69,7 @@ def create_tables():
             print(f"\n❌ Error creating tables: {type(e).__name__}")
             print(f"❌ Details: {str(e)}")
             print("\n🔧 Troubleshooting:")
-            print("1. Ensure PostgreSQL syntax in models matches Supabase schema")
+            print("1. Check the failing migration in migrations.py against the Supabase schema")
             print("2. Check database permissions")
             print("3. Verify connection works: python test_supabase_connection.py")
             return False
@@ -0,0 +1,167 @@
+"""
+Database connection pooling shared by every entry point
+The web app, the standalone scripts (create_tables.py, database.py) and the
+benchmarks build their engines from here, so pool sizes follow one budget:
+
+    DB_MAX_CONNECTIONS   connections this service may hold in total (default 20)
+    WEB_CONCURRENCY      gunicorn workers sharing that budget (default 4)
+    GUNICORN_THREADS     request threads per worker (default 1)
+
+Each worker keeps `threads` connections open and may overflow up to its share
+of the budget. A checkout waits at most DB_POOL_TIMEOUT seconds (default 3),
+well inside gunicorn's 60 s worker timeout. When the pool is exhausted the
+request gets 503 with Retry-After instead of queueing behind its neighbours.
+
+DB_POOL_MODE=external is for an external pooler such as PgBouncer in
+transaction mode. Connections are opened per checkout (NullPool) and psycopg
+never prepares statements, since the pooler may hand the next transaction to
+another server connection.
+
+Usage (in main.py):
+    from db_pool import engine_options, init_pool_backpressure, normalize_database_url
+    database_url = normalize_database_url(os.getenv('DATABASE_URL', 'sqlite:///material_map.db'))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    init_pool_backpressure(app)
+"""
+
+import json
+import os
+import time
+
+from flask import g, has_app_context, jsonify
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+from metrics import POOL_TIMEOUTS, POOL_WAIT
+
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'queue').lower()  # queue | external
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 20))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 3))  # whole seconds
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_RETRY_AFTER = int(os.getenv('DB_POOL_RETRY_AFTER', 1))
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 15))
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 4))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 1))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time and counts checkouts that hit pool_timeout"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            POOL_WAIT.observe(value=time.perf_counter() - started)
+            if has_app_context():
+                g.db_pool_exhausted = True
+            raise
+        POOL_WAIT.observe(value=time.perf_counter() - started)
+        return connection
+
+
+def normalize_database_url(database_url):
+    """Use the psycopg v3 driver for postgresql:// URLs and require SSL"""
+    if database_url and database_url.startswith('postgresql://'):
+        database_url = database_url.replace('postgresql://', 'postgresql+psycopg://', 1)
+        if 'sslmode' not in database_url:
+            database_url += '?sslmode=require' if '?' not in database_url else '&sslmode=require'
+    return database_url
+
+
+def pool_sizes(workers=WEB_CONCURRENCY, threads=GUNICORN_THREADS, budget=DB_MAX_CONNECTIONS):
+    """
+    Split the connection budget across worker processes
+
+    Args:
+        workers: Processes sharing the budget (1 for scripts)
+        threads: Requests each process serves concurrently
+        budget: Total connections allowed
+
+    Returns:
+        (pool_size, max_overflow) for one process
+    """
+    per_process = max(1, budget // max(1, workers))
+    pool_size = max(1, min(threads, per_process))
+    return pool_size, per_process - pool_size
+
+
+def engine_options(database_url, workers=WEB_CONCURRENCY, threads=GUNICORN_THREADS, application_name='material_map'):
+    """
+    SQLAlchemy create_engine() keyword arguments for this process
+
+    Args:
+        database_url: Normalized database URL
+        workers: Processes sharing DB_MAX_CONNECTIONS (pass 1 from scripts)
+        threads: Requests each process serves concurrently
+        application_name: Shown in pg_stat_activity
+    """
+    if database_url.startswith('sqlite'):
+        pool_size, max_overflow = pool_sizes(workers, threads)
+        return {
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': DB_POOL_TIMEOUT,
+        }
+
+    connect_args = {
+        'connect_timeout': DB_CONNECT_TIMEOUT,
+        'application_name': application_name,
+    }
+    if DB_POOL_MODE == 'external':
+        # psycopg prepares statements after prepare_threshold executions; None turns that off
+        connect_args['prepare_threshold'] = None
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+
+    pool_size, max_overflow = pool_sizes(workers, threads)
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': connect_args,
+    }
+
+
+def describe(options):
+    """One-line summary for startup logs"""
+    if options['poolclass'] is NullPool:
+        return "external pooler (NullPool, no prepared statements)"
+    return (f"pool_size={options['pool_size']} max_overflow={options['max_overflow']} "
+            f"timeout={options['pool_timeout']:g}s")
+
+
+POOL_EXHAUSTED_BODY = {
+    'detail': 'Server busy, please retry',
+    'error': 'database connection pool exhausted',
+}
+
+
+def _pool_exhausted(e):
+    return jsonify(POOL_EXHAUSTED_BODY), 503, {'Retry-After': str(DB_POOL_RETRY_AFTER)}
+
+
+def _convert_pool_errors(response):
+    # Routes catch every exception and answer 500; a pool timeout behind one is really overload.
+    # Rewrite in place so headers added by other hooks (CORS) survive.
+    if g.get('db_pool_exhausted') and response.status_code == 500:
+        response.set_data(json.dumps(POOL_EXHAUSTED_BODY))
+        response.mimetype = 'application/json'
+        response.status_code = 503
+        response.headers['Retry-After'] = str(DB_POOL_RETRY_AFTER)
+    return response
+
+
+def init_pool_backpressure(app):
+    """
+    Answer 503 + Retry-After when a request could not get a connection in time
+
+    Call after init_instrumentation() so the request metrics see the 503.
+    """
+    app.register_error_handler(sa_exc.TimeoutError, _pool_exhausted)
+    app.after_request(_convert_pool_errors)
+    return app
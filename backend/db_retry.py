@@ -0,0 +1,162 @@
+"""
+Retries for transient database errors on read routes
+Supabase connections drop now and then (connection reset, SSL EOF, server
+restart) and Postgres may abort a transaction with a serialization failure or
+deadlock. These succeed when simply run again. Everything else (bad SQL,
+constraint violations, pool exhaustion) is returned at once.
+
+Routes catch their own exceptions and answer 500, so an engine `handle_error`
+listener notes transient errors in `g`. @retry_transient then re-runs the
+view when it failed because of one. Between attempts the session is rolled
+back and removed, so the next attempt checks out a fresh connection. Delays
+use decorrelated jitter (each delay random between the base and 3x the
+previous one, capped), and no attempt starts after the request's
+DB_RETRY_DEADLINE has passed.
+
+Usage (in main.py):
+    from db_retry import init_db_retry, retry_transient
+    init_db_retry(db)
+
+    @app.route('/api/products', methods=['GET'])
+    @retry_transient
+    def get_all_products(): ...
+"""
+
+import functools
+import os
+import random
+import ssl
+import time
+
+from flask import g, has_request_context
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.engine import Engine
+
+from metrics import DB_RETRIES
+
+DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', 3))
+DB_RETRY_BASE_DELAY = float(os.getenv('DB_RETRY_BASE_DELAY', 0.05))
+DB_RETRY_MAX_DELAY = float(os.getenv('DB_RETRY_MAX_DELAY', 1.0))
+# Time budget from the first attempt; keeps retries well inside gunicorn's worker timeout
+DB_RETRY_DEADLINE = float(os.getenv('DB_RETRY_DEADLINE', 5.0))
+
+# serialization_failure, deadlock_detected, admin/crash shutdown, cannot_connect_now, too_many_connections
+TRANSIENT_SQLSTATES = {'40001', '40P01', '57P01', '57P02', '57P03', '53300'}
+# Class 08 is "connection exception"
+TRANSIENT_SQLSTATE_CLASSES = ('08',)
+TRANSIENT_MESSAGES = (
+    'connection reset',
+    'server closed the connection unexpectedly',
+    'ssl syscall error',
+    'eof detected',
+    'ssl connection has been closed unexpectedly',
+    'could not receive data from server',
+    'terminating connection',
+    'database is locked',
+)
+
+_db = None
+
+
+def is_transient(error):
+    """
+    True if running the same operation again may succeed
+
+    Args:
+        error: SQLAlchemy exception, DBAPI exception or socket/SSL error
+    """
+    if isinstance(error, sa_exc.TimeoutError):
+        # Pool exhaustion: retrying adds load, db_pool.py answers 503 instead
+        return False
+    if isinstance(error, sa_exc.DBAPIError):
+        if error.connection_invalidated:
+            return True
+        error = error.orig
+    if isinstance(error, (ConnectionResetError, BrokenPipeError, ssl.SSLEOFError)):
+        return True
+    sqlstate = getattr(error, 'sqlstate', None) or getattr(error, 'pgcode', None)
+    if sqlstate and (sqlstate in TRANSIENT_SQLSTATES or sqlstate.startswith(TRANSIENT_SQLSTATE_CLASSES)):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in TRANSIENT_MESSAGES)
+
+
+def backoff_delays(base=None, cap=None, rng=random):
+    """Endless decorrelated-jitter delays: each is uniform in [base, 3 * previous], capped"""
+    base = DB_RETRY_BASE_DELAY if base is None else base
+    cap = DB_RETRY_MAX_DELAY if cap is None else cap
+    delay = base
+    while True:
+        delay = min(cap, rng.uniform(base, delay * 3))
+        yield delay
+
+
+def _handle_error(context):
+    if not has_request_context():
+        return
+    if context.is_disconnect or is_transient(context.original_exception):
+        g.db_transient_error = context.original_exception
+
+
+def _status_code(result):
+    """Status of a Flask view return value (response, (body, status), ...)"""
+    if isinstance(result, tuple):
+        return result[1] if len(result) > 1 and isinstance(result[1], int) else 200
+    return getattr(result, 'status_code', 200)
+
+
+def reset_session():
+    """Roll back and drop the request's session; the next query checks out a fresh connection"""
+    try:
+        _db.session.rollback()
+    except Exception:
+        pass
+    _db.session.remove()
+
+
+def retry_transient(view):
+    """Re-run a read-only view when it failed with a transient database error"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if _db is None:
+            return view(*args, **kwargs)
+        deadline = time.monotonic() + DB_RETRY_DEADLINE
+        delays = backoff_delays()
+        attempt = 1
+        while True:
+            g.pop('db_transient_error', None)
+            try:
+                result = view(*args, **kwargs)
+                error = g.pop('db_transient_error', None)
+                if error is None or _status_code(result) < 500:
+                    return result
+            except Exception as e:
+                error = g.pop('db_transient_error', None) or e
+                if not is_transient(error):
+                    raise
+                result, failure = None, e
+
+            delay = next(delays)
+            if attempt >= DB_RETRY_ATTEMPTS or time.monotonic() + delay > deadline:
+                print(f"❌ {view.__name__}: giving up after {attempt} attempts: {str(error)[:200]}")
+                if result is None:
+                    raise failure
+                return result
+
+            print(f"🔄 {view.__name__}: transient DB error on attempt {attempt} "
+                  f"({str(error)[:100]}), retrying in {delay * 1000:.0f} ms")
+            DB_RETRIES.inc(view.__name__)
+            reset_session()
+            time.sleep(delay)
+            attempt += 1
+
+    return wrapper
+
+
+def init_db_retry(db):
+    """Watch engine errors so @retry_transient can tell transient failures apart"""
+    global _db
+    _db = db
+    if not event.contains(Engine, 'handle_error', _handle_error):
+        event.listen(Engine, 'handle_error', _handle_error)
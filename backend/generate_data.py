@@ -0,0 +1,367 @@
+"""
+Synthetic data generator for load testing
+Builds a deterministic catalog of N stores, M products and their inventory and
+bulk-loads it with COPY (PostgreSQL) or executemany (SQLite).
+
+Usage:
+    python generate_data.py --stores 2000 --products 20000 --density 0.05 --seed 42 --reset
+"""
+
+import argparse
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Erode city center - same area as the hand-written demo stores in init_db
+DEFAULT_CENTER = (11.3415, 77.7171)
+DEFAULT_RADIUS_KM = 15.0
+
+# Fixed reference time so that two runs with the same seed produce identical rows
+BASE_TIME = datetime(2026, 1, 1)
+
+# Product category -> store category that stocks it (vegetables are sold in grocery stores)
+CATEGORY_STORES = {
+    'grocery': 'grocery',
+    'vegetables': 'grocery',
+    'stationery': 'stationery',
+    'household': 'household',
+    'plumbing': 'plumbing',
+    'electronics': 'electronics',
+}
+
+# Relative share of stores per store category
+STORE_CATEGORY_WEIGHTS = {
+    'grocery': 0.40,
+    'stationery': 0.15,
+    'household': 0.20,
+    'plumbing': 0.10,
+    'electronics': 0.15,
+}
+
+# Median shelf price (INR) per product category - matches the ranges used in init_db
+CATEGORY_MEDIAN_PRICE = {
+    'grocery': 110.0,
+    'vegetables': 36.0,
+    'stationery': 90.0,
+    'household': 120.0,
+    'plumbing': 480.0,
+    'electronics': 600.0,
+}
+
+CATEGORY_ITEMS = {
+    'grocery': ['Basmati Rice', 'Jasmine Rice', 'Cooking Oil', 'Olive Oil', 'Whole Wheat Atta',
+                'Toor Dal', 'Sugar', 'Salt', 'Tea', 'Coffee', 'Biscuits', 'Ghee'],
+    'vegetables': ['Tomato', 'Potato', 'Onion', 'Carrot', 'Broccoli', 'Capsicum', 'Beans', 'Cabbage'],
+    'stationery': ['Books', 'Pens', 'Pencils', 'Stapler', 'Eraser', 'Ruler', 'Marker', 'Glue Stick'],
+    'household': ['Detergent', 'Dish Soap', 'Paper Towels', 'Trash Bags', 'Floor Cleaner', 'Broom'],
+    'plumbing': ['Chrome Faucet', 'Adjustable Wrench', 'PVC Pipe', 'Teflon Tape', 'Ball Valve', 'Shower Head'],
+    'electronics': ['LED Bulb 9W', 'Extension Cord', 'USB-C Charger', 'AA Batteries', 'Ceiling Fan', 'Switch Board'],
+}
+
+CATEGORY_BRANDS = {
+    'grocery': ['India Gate', 'Tata', 'Fortune', 'Figaro', 'Aashirvaad', 'Tata Sampann', 'Uttam'],
+    'vegetables': ['Local Fresh', 'Organic Picks', 'Farm Fresh', 'Fresh Farm', 'Green Picks', 'Agro Fresh'],
+    'stationery': ['Classmate', 'Camlin', 'Reynolds', 'Kangaro', 'Apsara'],
+    'household': ['Surf Excel', 'Vim', 'Scotch Brite', 'Safewrap', 'Lizol'],
+    'plumbing': ['Parryware', 'Stanley', 'Supreme', 'Tapex', 'Jaquar'],
+    'electronics': ['Philips', 'Anchor', 'Boat', 'Duracell', 'Havells'],
+}
+
+CATEGORY_UNITS = {
+    'grocery': ['500 g', '1 kg', '5 kg', '500 ml', '1 L'],
+    'vegetables': ['250 g', '500 g', '1 kg', '1 head'],
+    'stationery': ['1 piece', 'Pack of 5', 'Pack of 10', 'Set of 12', '100 pages', '200 pages'],
+    'household': ['1 kg', '750 ml', '2 rolls', 'Pack of 30'],
+    'plumbing': ['1 piece', '10 inch', '3 m length', 'Pack of 3'],
+    'electronics': ['1 piece', '5 m', '20W', 'Pack of 4'],
+}
+
+STORE_NAME_PARTS = {
+    'grocery': ['Fresh', 'Daily', 'Green', 'Super', 'Value'],
+    'stationery': ['Scholar', 'Paper', 'Campus', 'Study'],
+    'household': ['Home', 'Clean', 'Family', 'Essentials'],
+    'plumbing': ['Pipe', 'Valve', 'Flow', 'Aqua'],
+    'electronics': ['Power', 'Volt', 'Spark', 'Circuit'],
+}
+
+STORE_NAME_SUFFIXES = ['Mart', 'Hub', 'Store', 'Corner', 'Plaza', 'Depot']
+STREETS = ['Main Street', 'Market Road', 'Gandhi Nagar', 'Perundurai Rd', 'Bus Stand Road',
+           'NH-47 Bypass', 'Park Road', 'Library Lane', 'Industrial Rd', 'Tech St']
+
+# Discount levels shoppers actually see, weighted towards small discounts
+DISCOUNT_LEVELS = [5, 8, 10, 12, 15, 18, 20, 25, 30, 40, 50]
+DISCOUNT_WEIGHTS = [14, 8, 18, 8, 14, 6, 12, 8, 6, 4, 2]
+
+STORE_COLUMNS = ('id', 'name', 'category', 'address', 'latitude', 'longitude', 'phone', 'image_url', 'created_at')
+PRODUCT_COLUMNS = ('id', 'name', 'brand', 'category', 'image_url', 'description', 'unit', 'created_at')
+INVENTORY_COLUMNS = ('id', 'product_id', 'store_id', 'store_category', 'price', 'quantity', 'original_price',
+                     'discount_percentage', 'offer_valid_until', 'updated_at')
+
+
+def _rng(seed, stream):
+    """Independent random stream per table so changing one count doesn't reshuffle the others"""
+    return random.Random(f"{seed}:{stream}")
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_stores(count, seed=42, center=DEFAULT_CENTER, radius_km=DEFAULT_RADIUS_KM):
+    """
+    Generate store rows scattered around a city center
+
+    Stores are denser near the center (half-normal distance) and clipped to radius_km.
+
+    Returns:
+        List of tuples in STORE_COLUMNS order
+    """
+    rng = _rng(seed, 'stores')
+    categories = list(STORE_CATEGORY_WEIGHTS)
+    weights = list(STORE_CATEGORY_WEIGHTS.values())
+    center_lat, center_lon = center
+    km_per_deg_lat = 111.32
+    km_per_deg_lon = 111.32 * math.cos(math.radians(center_lat))
+
+    stores = []
+    for i in range(count):
+        category = rng.choices(categories, weights)[0]
+        distance = min(abs(rng.gauss(0, radius_km / 2)), radius_km)
+        bearing = rng.uniform(0, 2 * math.pi)
+        latitude = center_lat + distance * math.cos(bearing) / km_per_deg_lat
+        longitude = center_lon + distance * math.sin(bearing) / km_per_deg_lon
+        name = f"{rng.choice(STORE_NAME_PARTS[category])} {rng.choice(STORE_NAME_SUFFIXES)} #{i + 1}"
+        address = f"{rng.randint(1, 400)}, {rng.choice(STREETS)}"
+        phone = f"+91-{rng.randint(100, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+        created_at = BASE_TIME - timedelta(days=rng.randint(0, 730))
+        stores.append((_uuid(rng), name, category, address, round(latitude, 6), round(longitude, 6),
+                       phone, None, created_at))
+    return stores
+
+
+def generate_products(count, seed=42):
+    """
+    Generate product rows spread evenly across the existing product categories
+
+    Returns:
+        List of tuples in PRODUCT_COLUMNS order
+    """
+    rng = _rng(seed, 'products')
+    categories = list(CATEGORY_STORES)
+
+    products = []
+    for i in range(count):
+        category = categories[i % len(categories)]
+        name = rng.choice(CATEGORY_ITEMS[category])
+        brand = rng.choice(CATEGORY_BRANDS[category])
+        unit = rng.choice(CATEGORY_UNITS[category])
+        description = f"{name} | {brand} | Synthetic SKU {i + 1}"
+        created_at = BASE_TIME - timedelta(days=rng.randint(0, 365))
+        products.append((_uuid(rng), name, brand, category, None, description, unit, created_at))
+    return products
+
+
+def generate_inventory(stores, products, density=0.05, seed=42):
+    """
+    Yield inventory rows for stores and the products their category stocks
+
+    Each store carries roughly `density` of the products that match its category.
+    Prices follow a per-product log-normal base price with a per-store markup; about
+    a third of the rows carry a discount with original_price and offer expiry set.
+
+    Yields:
+        Tuples in INVENTORY_COLUMNS order
+    """
+    rng = _rng(seed, 'inventory')
+
+    # Base price per product (log-normal around the category median)
+    base_prices = {}
+    products_by_store_category = {}
+    for product in products:
+        product_id, category = product[0], product[3]
+        base_prices[product_id] = CATEGORY_MEDIAN_PRICE[category] * math.exp(rng.gauss(0, 0.35))
+        products_by_store_category.setdefault(CATEGORY_STORES[category], []).append(product_id)
+
+    for store in stores:
+        store_id, store_category = store[0], store[2]
+        candidates = products_by_store_category.get(store_category, [])
+        if not candidates:
+            continue
+
+        # Normal approximation of Binomial(len(candidates), density)
+        mean = len(candidates) * density
+        stddev = math.sqrt(mean * (1 - density))
+        stocked = max(0, min(len(candidates), round(rng.gauss(mean, stddev))))
+        markup = rng.gauss(1.0, 0.06)
+
+        for product_id in rng.sample(candidates, stocked):
+            original_price = round(base_prices[product_id] * markup * rng.gauss(1.0, 0.04), 2)
+            quantity = int(rng.expovariate(1 / 60))
+            updated_at = BASE_TIME - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+
+            if rng.random() < 0.35:
+                discount = float(rng.choices(DISCOUNT_LEVELS, DISCOUNT_WEIGHTS)[0])
+                price = round(original_price * (1 - discount / 100), 2)
+                offer_valid_until = updated_at + timedelta(days=rng.randint(3, 45))
+                yield (_uuid(rng), product_id, store_id, store_category, price, quantity, original_price,
+                       discount, offer_valid_until, updated_at)
+            else:
+                yield (_uuid(rng), product_id, store_id, store_category, original_price, quantity, None,
+                       None, None, updated_at)
+
+
+def _sqlite_value(value):
+    # Same text format SQLAlchemy uses for DateTime columns on SQLite
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return value
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_load(engine, table_name, columns, rows, batch_size=50000):
+    """
+    Bulk insert rows into a table using the fastest path for the backend
+
+    PostgreSQL (psycopg 3) streams rows through COPY FROM STDIN; SQLite uses
+    executemany inside a single transaction. Rows may be any iterable.
+
+    Returns:
+        Number of rows written
+    """
+    column_list = ', '.join(columns)
+    written = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg':
+            with cursor.copy(f"COPY {table_name} ({column_list}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    written += 1
+        elif engine.dialect.name == 'sqlite':
+            placeholders = ', '.join('?' for _ in columns)
+            sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})"
+            for batch in _batches(rows, batch_size):
+                cursor.executemany(sql, [tuple(_sqlite_value(v) for v in row) for row in batch])
+                written += len(batch)
+        else:
+            placeholders = ', '.join('%s' for _ in columns)
+            sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})"
+            for batch in _batches(rows, batch_size):
+                cursor.executemany(sql, batch)
+                written += len(batch)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return written
+
+
+def generate(engine, stores=1000, products=5000, density=0.05, seed=42,
+             center=DEFAULT_CENTER, radius_km=DEFAULT_RADIUS_KM, reset=False):
+    """
+    Generate and load a full synthetic dataset into the database behind `engine`
+
+    Tables must already exist (migrations.migrate()). With reset=True existing
+    inventory, products and stores are deleted first.
+
+    Returns:
+        Dict with row counts and load time per table
+    """
+    from models import Store, Product, InventoryItem
+    from table_stats import recount
+    from catalog_snapshot import bump_version
+
+    store_table = Store.__table__.name
+    product_table = Product.__table__.name
+    inventory_table = InventoryItem.__table__.name
+
+    if reset:
+        with engine.begin() as conn:
+            for table in (InventoryItem.__table__, Product.__table__, Store.__table__):
+                conn.execute(table.delete())
+
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+    stats = {}
+
+    started = time.perf_counter()
+    store_rows = generate_stores(stores, seed=seed, center=center, radius_km=radius_km)
+    stats['stores'] = bulk_load(engine, store_table, STORE_COLUMNS, store_rows)
+    stats['stores_seconds'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    product_rows = generate_products(products, seed=seed)
+    stats['products'] = bulk_load(engine, product_table, PRODUCT_COLUMNS, product_rows)
+    stats['products_seconds'] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    inventory_rows = generate_inventory(store_rows, product_rows, density=density, seed=seed)
+    stats['inventory_items'] = bulk_load(engine, inventory_table, INVENTORY_COLUMNS, inventory_rows)
+    stats['inventory_seconds'] = round(time.perf_counter() - started, 3)
+
+    # Bulk loads bypass the ORM, so refresh the /api/status row counters
+    # and tell running workers to reload their catalog snapshots
+    with engine.begin() as conn:
+        recount(conn)
+        bump_version(conn)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Material Map dataset for load testing')
+    parser.add_argument('--stores', type=int, default=1000, help='Number of stores (default: 1000)')
+    parser.add_argument('--products', type=int, default=5000, help='Number of products (default: 5000)')
+    parser.add_argument('--density', type=float, default=0.05,
+                        help='Fraction of matching-category products each store stocks (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--lat', type=float, default=DEFAULT_CENTER[0], help='City center latitude')
+    parser.add_argument('--lon', type=float, default=DEFAULT_CENTER[1], help='City center longitude')
+    parser.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM, help='Scatter radius in km')
+    parser.add_argument('--reset', action='store_true', help='Delete existing stores, products and inventory first')
+    args = parser.parse_args()
+
+    from main import app, db
+    from migrations import migrate
+
+    with app.app_context():
+        migrate(db.engine)
+        print(f"🔄 Generating {args.stores} stores, {args.products} products (density {args.density}, seed {args.seed})...")
+        started = time.perf_counter()
+        stats = generate(
+            db.engine,
+            stores=args.stores,
+            products=args.products,
+            density=args.density,
+            seed=args.seed,
+            center=(args.lat, args.lon),
+            radius_km=args.radius,
+            reset=args.reset,
+        )
+        elapsed = time.perf_counter() - started
+
+    print(f"✅ {stats['stores']} stores in {stats['stores_seconds']}s")
+    print(f"✅ {stats['products']} products in {stats['products_seconds']}s")
+    print(f"✅ {stats['inventory_items']} inventory items in {stats['inventory_seconds']}s")
+    print(f"🎉 Done in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
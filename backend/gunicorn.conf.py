@@ -0,0 +1,68 @@
+"""
+Gunicorn configuration
+    gunicorn -c gunicorn.conf.py main:app
+
+With GUNICORN_PRELOAD=True (default) the master imports main.py, runs
+main.warm_up() (tables, catalog snapshot, bcrypt backend, URL map), closes its
+database connections and freezes the GC before forking. Workers start with all
+of that already in memory and share the pages copy-on-write. gc.freeze() moves
+the warmed objects out of the collector's generations so later collections in
+the workers don't write to (and so copy) those pages.
+
+Each worker then drops the pool it inherited in post_fork. SQLAlchemy
+connections must never be shared across processes.
+
+With GUNICORN_PRELOAD=False every worker imports and warms the app itself.
+Either way each worker logs how long it took from fork to ready.
+"""
+
+import gc
+import os
+import time
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# More than one thread switches to the gthread worker; db_pool.py sizes each pool to match
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+accesslog = '-'
+errorlog = '-'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before the first fork"""
+    if not preload_app:
+        return
+    import main
+
+    main.warm_up()
+    with main.app.app_context():
+        # Don't carry open sockets into the workers
+        main.db.engine.dispose()
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded app, {gc.get_freeze_count()} objects frozen before fork")
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+    if preload_app:
+        import main
+
+        with main.app.app_context():
+            # Forget inherited connections without closing the master's sockets
+            main.db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Runs in the worker once the app is loaded, before it accepts requests"""
+    import main
+
+    if not preload_app:
+        main.warm_up()
+    # Build this worker's storage client and check the bucket in the background.
+    # main.py doesn't do this at import time, and HTTP clients can't cross a fork.
+    main.warm_storage()
+    elapsed_ms = (time.perf_counter() - worker.forked_at) * 1000
+    worker.log.info(f"Worker {os.getpid()} ready in {elapsed_ms:.0f} ms")
@@ -0,0 +1,185 @@
+"""
+Image processing pipeline for product and store uploads
+Decodes an upload once and renders thumbnail, card and full-size variants in
+WebP and JPEG with metadata stripped. Rendering runs in a process pool so the
+request thread only waits on the result instead of burning CPU under the GIL.
+
+Variants are stored under deterministic keys derived from the entity id and a
+digest of the original bytes:
+    products/<product_id>/<digest>/thumb.webp   (and .jpg)
+    products/<product_id>/<digest>/card.webp
+    products/<product_id>/<digest>/full.webp
+The full WebP URL is saved as image_url; the other variant URLs are derived
+from it by image_variant_urls().
+"""
+
+import io
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+
+from metrics import set_queue_depth
+from storage import content_hash
+
+# Optional: Only used if Pillow is installed (imported by render_variants, in the pool processes)
+PILLOW_AVAILABLE = find_spec('PIL') is not None
+if not PILLOW_AVAILABLE:
+    print("⚠️  Warning: Pillow not installed. Uploads will be stored without resized variants.")
+    print("   Install with: pip install Pillow")
+
+# (name, longest edge in px) - largest first so each variant is resized from the previous one
+VARIANTS = (('full', 1600), ('card', 480), ('thumb', 160))
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_PROCESS_TIMEOUT = float(os.getenv('IMAGE_PROCESS_TIMEOUT', 30))
+
+_VARIANT_URL = re.compile(r'^(?P<base>.+/(?:products|stores)/[^/]+/[0-9a-f]{16})/full\.webp$')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+class ImageDecodeError(ValueError):
+    """The upload has an image signature but Pillow cannot decode it (truncated or corrupt)"""
+
+
+def render_variants(source):
+    """
+    Decode an image once and encode every variant (runs in a worker process)
+
+    Args:
+        source: Path of the spooled upload (or the raw bytes)
+
+    Returns:
+        Dict of variant name -> {extension: encoded bytes}
+
+    Raises:
+        ImageDecodeError: If Pillow cannot decode the image
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as opened:
+            largest = VARIANTS[0][1]
+            # Let the JPEG decoder downscale by a power of two when the original is huge
+            opened.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError and "image file is truncated" are OSErrors; broken chunks raise SyntaxError
+        raise ImageDecodeError(f"Could not decode image: {e}") from None
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    # Drop EXIF, ICC, XMP and comments so nothing leaks into the encoded files
+    image.info = {}
+
+    rendered = {}
+    current = image
+    for name, size in VARIANTS:
+        current = current.copy()
+        current.thumbnail((size, size), Image.LANCZOS)
+        encoded = {}
+        for extension, (fmt, _, options) in FORMATS.items():
+            frame = current.convert('RGB') if fmt == 'JPEG' and current.mode != 'RGB' else current
+            buffer = io.BytesIO()
+            frame.save(buffer, fmt, **options)
+            encoded[extension] = buffer.getvalue()
+        rendered[name] = encoded
+    return rendered
+
+
+def _get_executor():
+    """One process pool per worker process, created lazily (also after a gunicorn fork)"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+                _executor_pid = pid
+    return _executor
+
+
+def _track_pending(delta):
+    global _pending
+    with _executor_lock:
+        _pending += delta
+        set_queue_depth('images', _pending)
+
+
+def process_image(source, timeout=IMAGE_PROCESS_TIMEOUT):
+    """
+    Render all variants of an image in the process pool and wait for the result
+
+    Pass the path of a spooled upload so only the path (not the whole file) is
+    sent to the worker process.
+
+    Raises:
+        ImageDecodeError: If the bytes are not a decodable image
+        RuntimeError: If rendering failed for another reason (e.g. the pool broke)
+    """
+    _track_pending(1)
+    try:
+        future = _get_executor().submit(render_variants, source)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+        except ImageDecodeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Could not process image: {e}") from e
+    finally:
+        _track_pending(-1)
+
+
+def content_digest(data):
+    """Short content hash used in variant keys so a new image gets new URLs"""
+    return content_hash(data)[:16]
+
+
+def variant_keys(folder, entity_id, digest):
+    """
+    Storage keys for every variant and format
+
+    Returns:
+        Dict of (variant name, extension) -> key
+    """
+    return {
+        (name, extension): f"{folder}/{entity_id}/{digest}/{name}.{extension}"
+        for name, _ in VARIANTS
+        for extension in FORMATS
+    }
+
+
+def content_type(extension):
+    return FORMATS[extension][1]
+
+
+def image_variant_urls(image_url):
+    """
+    Variant URLs for an image_url written by the pipeline
+
+    Returns:
+        {'thumb': ..., 'card': ..., 'full': ...} WebP URLs (JPEG copies live next
+        to them with a .jpg extension), or None for images uploaded before the
+        pipeline existed.
+    """
+    if not image_url:
+        return None
+    match = _VARIANT_URL.match(image_url)
+    if not match:
+        return None
+    base = match.group('base')
+    return {name: f"{base}/{name}.webp" for name, _ in reversed(VARIANTS)}
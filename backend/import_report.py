@@ -0,0 +1,141 @@
+"""
+Import-time report for the app module
+Imports the module in a fresh interpreter under `python -X importtime` and
+summarizes where cold-start time goes: total, slowest modules by self time and
+totals per top-level package.
+
+Usage:
+    python import_report.py
+    python import_report.py --module main --top 30 --repeat 3
+    python import_report.py --budget-ms 800   # exit 1 if the import is slower
+    python import_report.py --json report.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cold-start budget for `import main`, also enforced by test_import_time.py
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', 800))
+
+# import time:  self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+@dataclass
+class ModuleTiming:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportReport:
+    module: str
+    timings: list
+
+    @property
+    def total_ms(self):
+        """Cumulative import time of the module itself"""
+        for timing in reversed(self.timings):
+            if timing.name == self.module and timing.depth == 0:
+                return timing.cumulative_us / 1000
+        return 0.0
+
+    @property
+    def modules(self):
+        return {timing.name for timing in self.timings}
+
+    def slowest(self, top=20):
+        return sorted(self.timings, key=lambda t: t.self_us, reverse=True)[:top]
+
+    def by_package(self):
+        totals = {}
+        for timing in self.timings:
+            package = timing.name.split('.')[0]
+            totals[package] = totals.get(package, 0) + timing.self_us
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def parse_importtime(output):
+    """Parse -X importtime stderr into ModuleTiming records (in completion order)"""
+    timings = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append(ModuleTiming(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return timings
+
+
+def measure_imports(module='main', repeat=1):
+    """
+    Import a module in fresh interpreters and keep the fastest run
+
+    Args:
+        module: Module to import from the backend directory
+        repeat: Number of runs; the first one may include compiling .pyc files
+
+    Returns:
+        ImportReport of the fastest run
+    """
+    best = None
+    for _ in range(max(repeat, 1)):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        report = ImportReport(module, parse_importtime(result.stderr))
+        if best is None or report.total_ms < best.total_ms:
+            best = report
+    return best
+
+
+def print_report(report, top):
+    print(f"\n⏱️  import {report.module}: {report.total_ms:.0f} ms ({len(report.timings)} modules)\n")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for timing in report.slowest(top):
+        print(f"{timing.self_us / 1000:>9.1f} {timing.cumulative_us / 1000:>9.1f}  {timing.name}")
+    print(f"\n{'self ms':>9}  package")
+    for package, self_us in report.by_package()[:top]:
+        print(f"{self_us / 1000:>9.1f}  {package}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=20, help='Rows per table')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs; the fastest is reported')
+    parser.add_argument('--budget-ms', type=float, help=f'Fail above this (suggested: {IMPORT_BUDGET_MS:.0f})')
+    parser.add_argument('--json', help='Also write the timings to this file')
+    args = parser.parse_args()
+
+    report = measure_imports(args.module, args.repeat)
+    print_report(report, args.top)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'module': report.module,
+                'total_ms': report.total_ms,
+                'timings': [timing.__dict__ for timing in report.timings],
+            }, f, indent=2)
+        print(f"\n✅ Wrote {args.json}")
+
+    if args.budget_ms is not None and report.total_ms > args.budget_ms:
+        print(f"\n❌ import {args.module} took {report.total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Per-request database instrumentation
+Hooks SQLAlchemy engine events to count queries and DB time for every request,
+adds a Server-Timing header, logs slow statements with their route and keeps
+per-route histograms in memory.
+
+Usage (in main.py):
+    from instrumentation import init_instrumentation
+    init_instrumentation(app)
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import observe_request
+
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'True').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 250))
+
+# Histogram bucket upper bounds (the last bucket is +Inf)
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative counts, last bucket is +Inf)"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            'buckets': [[bound, n] for bound, n in zip(list(self.bounds) + ['+Inf'], self.counts)],
+            'sum': round(self.sum, 3),
+            'count': self.count,
+        }
+
+
+class RouteStats:
+    """Per-route request latency, DB time and query count histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, status, duration_ms, db_ms, queries):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'latency_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'db_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'queries': Histogram(QUERY_COUNT_BUCKETS),
+                    'slow_queries': 0,
+                }
+            stats['requests'] += 1
+            if status >= 500:
+                stats['errors'] += 1
+            stats['latency_ms'].observe(duration_ms)
+            stats['db_ms'].observe(db_ms)
+            stats['queries'].observe(queries)
+
+    def record_slow_query(self, route):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is not None:
+                stats['slow_queries'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                route: {
+                    'requests': s['requests'],
+                    'errors': s['errors'],
+                    'slow_queries': s['slow_queries'],
+                    'latency_ms': s['latency_ms'].to_dict(),
+                    'db_ms': s['db_ms'].to_dict(),
+                    'queries': s['queries'].to_dict(),
+                }
+                for route, s in self._routes.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+def current_route():
+    """Route label for the active request, e.g. 'GET /api/products/<product_id>'"""
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    return f"{request.method} {rule}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finish_query(conn, statement)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't run for a failed statement; pop its start time here so
+    # it doesn't stay on the pooled connection, and still count the time it took
+    conn = exception_context.connection
+    # No execution context means the statement failed before before_cursor_execute ran
+    if conn is not None and exception_context.execution_context is not None:
+        _finish_query(conn, exception_context.statement or '')
+
+
+def _finish_query(conn, statement):
+    starts = conn.info.get('query_start_time')
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+
+    in_request = has_request_context()
+    if in_request:
+        g.db_query_count = g.get('db_query_count', 0) + 1
+        g.db_time_ms = g.get('db_time_ms', 0.0) + elapsed_ms
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        route = current_route() if in_request else None
+        if route:
+            route_stats.record_slow_query(route)
+        print(f"🐢 Slow query ({elapsed_ms:.1f}ms) on {route or 'n/a'}: {' '.join(statement.split())[:500]}")
+
+
+def _start_timer():
+    g.request_start_time = time.perf_counter()
+    g.db_query_count = 0
+    g.db_time_ms = 0.0
+
+
+def _record_request(response):
+    started = g.get('request_start_time')
+    if started is None:
+        return response
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    queries = g.get('db_query_count', 0)
+    db_ms = g.get('db_time_ms', 0.0)
+
+    route = current_route()
+    route_stats.observe(route, response.status_code, duration_ms, db_ms, queries)
+    observe_request(route, response.status_code, duration_ms, db_ms, queries)
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_ms:.2f};desc="{queries} queries", app;dur={duration_ms:.2f}'
+    )
+    return response
+
+
+def query_stats():
+    """Per-route histograms collected by this worker"""
+    return jsonify({
+        'pid': os.getpid(),
+        'slow_query_ms': SLOW_QUERY_MS,
+        'routes': route_stats.snapshot(),
+    })
+
+
+def init_instrumentation(app):
+    """Register engine listeners, request hooks and the /api/debug/query-stats route"""
+    if not INSTRUMENTATION_ENABLED:
+        return app
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/api/debug/query-stats', 'query_stats', query_stats, methods=['GET'])
+    return app
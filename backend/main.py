@@ -1,12 +1,32 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, distinct, func, literal, select, true, union_all
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 import jwt
+import math
 import os
+import time
 from dotenv import load_dotenv
 import uuid
+from instrumentation import init_instrumentation
+from metrics import init_metrics, record_cache
+from db_pool import describe as describe_pool, engine_options, init_pool_backpressure, normalize_database_url
+from db_retry import init_db_retry, retry_transient
+from read_replicas import init_read_replicas, read_replica
+from single_flight import coalesce, init_single_flight
+from compression import init_compression, precompressed
+from response_formats import JSON, dumps, init_response_formats, negotiate
+from models import db, User, Product, Store, InventoryItem, PriceFlag, PriceHistory, TableRowCount, CatalogVersion
+from migrations import migrate, reset_schema
+from table_stats import init_table_stats, get_counts
+from price_history import init_price_history, price_series
+from price_anomalies import DEAL_BLOCKING_FLAGS, init_price_flags
+from catalog_snapshot import init_catalog, get_catalog
+from image_pipeline import image_variant_urls
+from supabase_storage import SupabaseStorage
+from storage import init_local_media, warm_storage
+from uploads import MAX_UPLOAD_BYTES, UploadRejected
 
 # Load environment variables
 load_dotenv()
@@ -24,12 +44,9 @@ if database_url.startswith('sqlite://') and os.getenv('ENVIRONMENT') == 'product
     print("⚠️  Please set DATABASE_URL in Render environment variables")
     print("⚠️  See GET_SUPABASE_URL.md for instructions")
 
-# Convert postgresql:// to postgresql+psycopg:// for psycopg v3 compatibility
-if database_url and database_url.startswith('postgresql://'):
-    database_url = database_url.replace('postgresql://', 'postgresql+psycopg://', 1)
-    # Ensure SSL mode is set for security
-    if 'sslmode' not in database_url:
-        database_url += '?sslmode=require' if '?' not in database_url else '&sslmode=require'
+# Convert postgresql:// to postgresql+psycopg:// for psycopg v3 compatibility (and require SSL)
+database_url = normalize_database_url(database_url)
+if database_url.startswith('postgresql'):
     print(f"✅ Using PostgreSQL connection with IPv6 support")
 elif database_url.startswith('sqlite://'):
     print(f"✅ Using SQLite database")
@@ -37,19 +54,30 @@ elif database_url.startswith('sqlite://'):
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_size': 3,
-    'max_overflow': 5,
-    'pool_recycle': 1800,  # Recycle connections every 30 minutes
-    'pool_pre_ping': True,  # Test connections before using
-    'connect_args': {
-        'connect_timeout': 15,
-        'application_name': 'material_map',
-    } if not database_url.startswith('sqlite') else {}
-}
-
-# Initialize database
-db = SQLAlchemy(app)
+# Refuse bodies that can't hold acceptable uploads before parsing them (bulk imports carry many images)
+MAX_BULK_UPLOAD_BYTES = int(os.getenv('MAX_BULK_UPLOAD_BYTES', 50 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_BULK_UPLOAD_BYTES
+# Pool sizes come from DB_MAX_CONNECTIONS split across WEB_CONCURRENCY workers (see db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+print(f"✅ DB pool: {describe_pool(app.config['SQLALCHEMY_ENGINE_OPTIONS'])}")
+
+# Initialize database (reads of @read_replica routes go to DATABASE_READ_URLS when set)
+db.init_app(app)
+
+# Per-request query counting, Server-Timing headers and slow-query logging
+init_instrumentation(app)
+
+# Prometheus-style /metrics aggregated across gunicorn workers
+init_metrics(app, db)
+
+# 503 + Retry-After instead of 500 when no connection frees up within DB_POOL_TIMEOUT
+init_pool_backpressure(app)
+
+# Re-run read routes that failed on a dropped connection or serialization failure
+init_db_retry(db)
+
+# Round-robin replicas for read routes, with read-your-writes stickiness after a write
+init_read_replicas(app)
 
 # Enable CORS with comprehensive configuration
 CORS(app, 
@@ -61,17 +89,30 @@ CORS(app,
              "max_age": 3600
          },
          r"/health": {"origins": ["*"]},
+         r"/media/*": {"origins": ["*"]},
          r"/": {"origins": ["*"]}
      })
 
+# Serve uploads from disk when STORAGE_BACKEND=local
+init_local_media(app)
+
+# JSON or MessagePack, row or columnar layout, as the client's Accept header asks
+init_response_formats(app)
+
+# gzip/zstd for JSON responses the client accepts; cached bodies are compressed once per fill
+init_compression(app)
+
 # Initialize database tables on first request
 @app.before_request
 def init_db_tables():
     """Initialize database tables if they don't exist"""
+    # Health checks must answer while the database is still coming up
+    if request.endpoint in ('health', 'health_check', 'root'):
+        return
     try:
         # Only run once
         if not hasattr(init_db_tables, 'executed'):
-            db.create_all()
+            migrate(db.engine)
             init_db_tables.executed = True
             print("✅ Database tables initialized")
     except Exception as e:
@@ -82,49 +123,45 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # ============ DATABASE MODELS ============
 
-class User(db.Model):
-    id = db.Column(db.String(36), primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    hashed_password = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Product(db.Model):
-    id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(255), nullable=False)
-    brand = db.Column(db.String(255), nullable=False)
-    category = db.Column(db.String(100), nullable=False, index=True)
-    image_url = db.Column(db.String(500))
-    description = db.Column(db.Text)
-    unit = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Store(db.Model):
-    id = db.Column(db.String(36), primary_key=True)
-    name = db.Column(db.String(255), nullable=False)
-    category = db.Column(db.String(100), nullable=False, index=True, default='other')  # grocery, stationery, household
-    address = db.Column(db.String(500), nullable=False)
-    latitude = db.Column(db.Float)
-    longitude = db.Column(db.Float)
-    phone = db.Column(db.String(20))
-    image_url = db.Column(db.String(500))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class InventoryItem(db.Model):
-    id = db.Column(db.String(36), primary_key=True)
-    product_id = db.Column(db.String(36), db.ForeignKey('product.id'), nullable=False)
-    store_id = db.Column(db.String(36), db.ForeignKey('store.id'), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    original_price = db.Column(db.Float)  # Price before offer
-    discount_percentage = db.Column(db.Float, default=0)  # Discount percentage
-    offer_valid_until = db.Column(db.DateTime)  # When offer expires
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    product = db.relationship('Product', backref='inventory_items')
-    store = db.relationship('Store', backref='inventory_items')
+# Defined in models.py and shared with the scripts; schema changes go through migrations.py
+
+# Keep per-table counters so /api/status doesn't run COUNT(*) on every call
+init_table_stats(db, TableRowCount, [User, Product, Store, InventoryItem])
+
+# Append a price_history row in the same flush as every inventory price change
+init_price_history(db, PriceHistory, InventoryItem)
+
+# A repriced offer loses its price_flag rows in the same flush, so /api/deals shows the corrected deal
+init_price_flags(PriceFlag, InventoryItem)
+
+# Identical concurrent product reads share one query; responses live briefly in a per-worker cache
+init_single_flight(app)
+
+def products_body(catalog, fmt=JSON):
+    return dumps([product_to_dict(p) for p in catalog.products], fmt, app.json)
+
+def stores_body(catalog, category=None, fmt=JSON):
+    stores = catalog.stores if category is None else catalog.stores_by_category.get(category, ())
+    return dumps([store_to_dict(s) for s in stores], fmt, app.json)
+
+def catalog_bodies(catalog):
+    """List responses serialized once per catalog version (stored in the shared catalog file)"""
+    bodies = {'products': products_body(catalog), 'stores': stores_body(catalog)}
+    for category in catalog.store_categories:
+        bodies[('stores', category)] = stores_body(catalog, category)
+    return bodies
+
+# Serve catalog reads from a per-worker or shared-memory snapshot (see catalog_snapshot.py)
+init_catalog(db, CatalogVersion, Product, Store, prebuild=catalog_bodies)
 
 # ============ UTILITY FUNCTIONS ============
 
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 50))
+CATALOG_MAX_PAGE_SIZE = 200
+PRICE_HISTOGRAM_BUCKETS = int(os.getenv('PRICE_HISTOGRAM_BUCKETS', 10))
+# Upper bounds of the price filter chips on the browse screen (last chip is open-ended)
+PRICE_FACET_BOUNDS = (50, 100, 250, 500, 1000)
+
 def generate_id():
     return str(uuid.uuid4())
 
@@ -156,6 +193,7 @@ def product_to_dict(product, include_inventory=False):
         'brand': product.brand,
         'category': product.category,
         'image_url': product.image_url,
+        'image_variants': image_variant_urls(product.image_url),
         'description': product.description,
         'unit': product.unit,
         'created_at': product.created_at.isoformat()
@@ -164,32 +202,31 @@ def product_to_dict(product, include_inventory=False):
     # Only load inventory if explicitly requested to avoid N+1 queries
     if include_inventory:
         try:
-            # Use direct query to avoid relationship issues
-            items = db.session.execute(
-                db.text("SELECT * FROM inventory_item WHERE product_id = :product_id"),
-                {"product_id": product.id}
-            ).fetchall()
+            # One query for the rows and their store names, built from the models so table names can't drift
+            rows = db.session.execute(
+                select(
+                    InventoryItem.store_id,
+                    Store.name.label('store_name'),
+                    InventoryItem.price,
+                    InventoryItem.quantity,
+                    InventoryItem.discount_percentage,
+                    InventoryItem.original_price,
+                )
+                .join(Store, Store.id == InventoryItem.store_id)
+                .where(InventoryItem.product_id == product.id)
+            ).all()
             
-            inventory_list = []
-            for item in items:
-                try:
-                    store_result = db.session.execute(
-                        db.text("SELECT id, name FROM store WHERE id = :store_id"),
-                        {"store_id": item.store_id}
-                    ).fetchone()
-                    
-                    if store_result:
-                        inventory_list.append({
-                            'store_id': item.store_id,
-                            'store_name': store_result.name,
-                            'price': float(item.price) if item.price else None,
-                            'quantity': item.quantity,
-                            'discount_percentage': item.discount_percentage or 0,
-                            'original_price': float(item.original_price) if item.original_price else None
-                        })
-                except Exception as e:
-                    print(f"Error loading inventory item: {str(e)}")
-                    continue
+            inventory_list = [
+                {
+                    'store_id': row.store_id,
+                    'store_name': row.store_name,
+                    'price': float(row.price) if row.price else None,
+                    'quantity': row.quantity,
+                    'discount_percentage': row.discount_percentage or 0,
+                    'original_price': float(row.original_price) if row.original_price else None
+                }
+                for row in rows
+            ]
             
             data['inventory'] = inventory_list
             if inventory_list:
@@ -216,9 +253,86 @@ def store_to_dict(store):
         'longitude': store.longitude,
         'phone': store.phone,
         'image_url': store.image_url,
+        'image_variants': image_variant_urls(store.image_url),
         'created_at': store.created_at.isoformat()
     }
 
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in km"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+def nearby_store_ids(lat, lon, radius_km):
+    """Ids of stores within radius_km, prefiltered by a bounding box in SQL"""
+    dlat = radius_km / 111.0
+    dlon = radius_km / max(111.0 * math.cos(math.radians(lat)), 1e-6)
+    rows = db.session.execute(
+        select(Store.id, Store.latitude, Store.longitude).where(
+            Store.latitude.between(lat - dlat, lat + dlat),
+            Store.longitude.between(lon - dlon, lon + dlon),
+        )
+    ).all()
+    return [row.id for row in rows if haversine_km(lat, lon, row.latitude, row.longitude) <= radius_km]
+
+def price_facet_labels():
+    bounds = (0,) + PRICE_FACET_BOUNDS
+    labels = [f"{lo}-{hi}" for lo, hi in zip(bounds, bounds[1:])]
+    return labels + [f"{PRICE_FACET_BOUNDS[-1]}+"]
+
+def price_facet_bucket(price):
+    """SQL expression mapping a price to its index in price_facet_labels() (NULL when there is no price)"""
+    return case(
+        # Unstocked products have no min_price and belong in no bucket, not the top one
+        (price.is_(None), None),
+        *[(price < bound, index) for index, bound in enumerate(PRICE_FACET_BOUNDS)],
+        else_=len(PRICE_FACET_BOUNDS)
+    )
+
+def catalog_response(catalog, key, build):
+    """
+    Memoized catalog body in the negotiated format; its compressed forms are cached per catalog version too
+
+    Args:
+        key: Response key of the JSON body, e.g. 'products' (prebuilt in the shared catalog file)
+        build: Function(fmt) -> body
+    """
+    fmt = negotiate()
+    format_key = key if fmt is JSON else (fmt.name, key)
+    body = catalog.response(format_key, lambda: build(fmt))
+    response = app.response_class(body, content_type=fmt.content_type)
+    return precompressed(response, ('catalog', catalog.version, format_key))
+
+def sql_floor(expr):
+    """FLOOR() that also works on SQLite builds without math functions (only for non-negative values)"""
+    if db.engine.dialect.name == 'sqlite':
+        return db.cast(expr, db.Integer)
+    return func.floor(expr)
+
+def price_buckets(lo, hi, counts, buckets=PRICE_HISTOGRAM_BUCKETS):
+    """
+    Turn per-bucket counts into histogram entries
+
+    Args:
+        lo, hi: Price range the buckets were computed over
+        counts: Dict of bucket index -> count (index == buckets is the max price itself)
+
+    Returns:
+        List of {'min', 'max', 'count'}, one per bucket
+    """
+    if lo is None:
+        return []
+    width = (hi - lo) / buckets if hi > lo else 0
+    histogram = [
+        {'min': round(lo + i * width, 2), 'max': round(lo + (i + 1) * width, 2), 'count': 0}
+        for i in range(buckets if width else 1)
+    ]
+    if not width:
+        histogram[0]['max'] = round(hi, 2)
+    for index, count in counts.items():
+        histogram[min(int(index), len(histogram) - 1)]['count'] += count
+    return histogram
+
 def inventory_to_dict(item, include_relations=False):
     data = {
         'id': item.id,
@@ -260,20 +374,33 @@ def health_check():
 def health():
     return jsonify({'status': 'healthy'})
 
+# Cached /api/status payloads: {exact: (expires_at, payload)}
+STATUS_CACHE_SECONDS = float(os.getenv('STATUS_CACHE_SECONDS', 10))
+_status_cache = {}
+
 @app.route('/api/status', methods=['GET'])
 def status():
-    """Backend status endpoint with database check"""
+    """Backend status endpoint with database check
+
+    Row counts come from the table_row_count counters; pass ?exact=true to
+    recount every table (and repair the counters). Payloads are cached for
+    STATUS_CACHE_SECONDS so frequent health polls stay O(1).
+    """
+    exact = request.args.get('exact', 'false').lower() == 'true'
+    now = time.monotonic()
+    cached = _status_cache.get(exact)
+    if cached and cached[0] > now:
+        record_cache('status', hit=True)
+        return jsonify(cached[1])
+    record_cache('status', hit=False)
+
+    database_url = os.getenv('DATABASE_URL', 'sqlite:///material_map.db')
+    db_type = 'PostgreSQL' if 'postgresql' in database_url else 'SQLite'
+
     try:
-        # Try to query the database
-        user_count = User.query.count()
-        product_count = Product.query.count()
-        store_count = Store.query.count()
-        inventory_count = InventoryItem.query.count()
+        counts = get_counts(exact=exact)
         
-        database_url = os.getenv('DATABASE_URL', 'sqlite:///material_map.db')
-        db_type = 'PostgreSQL' if 'postgresql' in database_url else 'SQLite'
-        
-        return jsonify({
+        payload = {
             'status': 'healthy',
             'message': 'Material Map API is operational',
             'database_connected': True,
@@ -281,17 +408,18 @@ def status():
             'environment': os.getenv('ENVIRONMENT', 'development'),
             'api_version': '1.0.0',
             'data_stats': {
-                'users': user_count,
-                'products': product_count,
-                'stores': store_count,
-                'inventory_items': inventory_count
+                'users': counts[User.__tablename__],
+                'products': counts[Product.__tablename__],
+                'stores': counts[Store.__tablename__],
+                'inventory_items': counts[InventoryItem.__tablename__]
             },
+            'counts_exact': exact,
             'timestamp': datetime.utcnow().isoformat()
-        })
+        }
+        _status_cache[exact] = (now + STATUS_CACHE_SECONDS, payload)
+        return jsonify(payload)
     except Exception as e:
-        database_url = os.getenv('DATABASE_URL', 'sqlite:///material_map.db')
-        db_type = 'PostgreSQL' if 'postgresql' in database_url else 'SQLite'
-        
+        db.session.rollback()
         return jsonify({
             'status': 'error',
             'message': 'API is running but database connection failed',
@@ -303,20 +431,6 @@ def status():
             'timestamp': datetime.utcnow().isoformat()
         }), 503
 
-import time
-
-def retry_operation(func, max_retries=3, delay=2):
-    """Retry a database operation with exponential backoff"""
-    for attempt in range(max_retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise
-            print(f"⚠️  Attempt {attempt + 1} failed: {str(e)[:100]}. Retrying in {delay}s...")
-            time.sleep(delay)
-            delay *= 2  # Exponential backoff
-
 @app.route('/api/reseed', methods=['POST'])
 def reseed_database():
     """Clear database and reseed with fresh data"""
@@ -600,6 +714,8 @@ def login():
     })
 
 @app.route('/api/auth/me', methods=['GET'])
+@retry_transient
+@read_replica
 def get_user():
     token = request.args.get('token')
     if not token:
@@ -626,8 +742,14 @@ def logout():
 # ---- PRODUCT ROUTES ----
 
 @app.route('/api/products', methods=['GET'])
+@retry_transient
+@read_replica
 def get_all_products():
     try:
+        catalog = get_catalog()
+        if catalog is not None:
+            return catalog_response(catalog, 'products', lambda fmt: products_body(catalog, fmt=fmt))
+        
         products = Product.query.all()
         # Don't include inventory in list view - load separately if needed
         return jsonify([product_to_dict(p, include_inventory=False) for p in products])
@@ -638,9 +760,24 @@ def get_all_products():
         }), 500
 
 @app.route('/api/products/category/<category>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_by_category(category):
     try:
-        products = Product.query.filter_by(category=category).limit(30).all()
+        limit = min(max(request.args.get('limit', 30, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        catalog = get_catalog()
+        if catalog is not None:
+            products = catalog.products_by_category.get(category, ())[offset:offset + limit]
+            return jsonify([product_to_dict(p) for p in products])
+        
+        products = (
+            Product.query.filter_by(category=category)
+            .order_by(Product.name, Product.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
         return jsonify([product_to_dict(p, include_inventory=False) for p in products])
     except Exception as e:
         return jsonify({
@@ -648,7 +785,199 @@ def get_by_category(category):
             'error': str(e)
         }), 500
 
+class BrowseFilters:
+    """Parsed /api/products/browse filters; each facet is counted with every filter except its own"""
+    
+    def __init__(self, args):
+        self.categories = [c for c in args.getlist('category') if c]
+        self.brands = [b for b in args.getlist('brand') if b]
+        self.store_categories = [c for c in args.getlist('store_category') if c]
+        self.min_price = args.get('min_price', type=float)
+        self.max_price = args.get('max_price', type=float)
+        self.in_stock = args.get('in_stock', 'false').lower() == 'true'
+        self.latitude = args.get('latitude', type=float)
+        self.longitude = args.get('longitude', type=float)
+        self.radius = args.get('radius', 10, type=float)
+        self.store_ids = None
+        if self.latitude is not None and self.longitude is not None:
+            self.store_ids = nearby_store_ids(self.latitude, self.longitude, self.radius)
+    
+    def product_conditions(self, exclude=None):
+        conditions = []
+        if self.categories and exclude != 'category':
+            conditions.append(Product.category.in_(self.categories))
+        if self.brands and exclude != 'brand':
+            conditions.append(Product.brand.in_(self.brands))
+        return conditions
+    
+    def offer_conditions(self, exclude=None):
+        conditions = []
+        if self.min_price is not None and exclude != 'price':
+            conditions.append(InventoryItem.price >= self.min_price)
+        if self.max_price is not None and exclude != 'price':
+            conditions.append(InventoryItem.price <= self.max_price)
+        if self.in_stock:
+            conditions.append(InventoryItem.quantity > 0)
+        if self.store_ids is not None:
+            conditions.append(InventoryItem.store_id.in_(self.store_ids))
+        if self.store_categories and exclude != 'store_category':
+            conditions.append(Store.category.in_(self.store_categories))
+        return conditions
+    
+    def matching_products(self, exclude=None):
+        """
+        Subquery of (id, brand, category, min_price, offers) for products passing
+        every filter but `exclude`; min_price/offers only count matching offers
+        """
+        offer_conditions = self.offer_conditions(exclude)
+        offers = (
+            select(
+                InventoryItem.product_id,
+                func.min(InventoryItem.price).label('min_price'),
+                func.count().label('offers'),
+            )
+            .join(Store, Store.id == InventoryItem.store_id)
+            .where(*offer_conditions)
+            .group_by(InventoryItem.product_id)
+            .subquery()
+        )
+        query = select(
+            Product.id, Product.brand, Product.category, offers.c.min_price, offers.c.offers,
+            price_facet_bucket(offers.c.min_price).label('price_bucket'),
+        ).where(*self.product_conditions(exclude))
+        # Without offer filters, products that aren't stocked anywhere still match
+        if offer_conditions:
+            query = query.join(offers, offers.c.product_id == Product.id)
+        else:
+            query = query.outerjoin(offers, offers.c.product_id == Product.id)
+        return query.subquery()
+
+def browse_facet_counts(filters):
+    """
+    Total plus category, brand, price bucket and store category facets in one round trip
+
+    Returns:
+        Dict of facet name -> {value: product count}
+    """
+    def grouped(facet, exclude, column_name):
+        matched = filters.matching_products(exclude)
+        column = matched.c[column_name]
+        return (
+            select(literal(facet).label('facet'), db.cast(column, db.String).label('value'), func.count().label('n'))
+            .where(column.isnot(None))
+            .group_by(column)
+        )
+    
+    everything = filters.matching_products()
+    store_matched = filters.matching_products('store_category')
+    store_facet = (
+        select(
+            literal('store_category').label('facet'),
+            db.cast(Store.category, db.String).label('value'),
+            func.count(distinct(InventoryItem.product_id)).label('n'),
+        )
+        .join(Store, Store.id == InventoryItem.store_id)
+        .where(InventoryItem.product_id.in_(select(store_matched.c.id)), *filters.offer_conditions('store_category'))
+        .group_by(Store.category)
+    )
+    total = select(
+        literal('total').label('facet'), db.cast(literal(''), db.String).label('value'), func.count().label('n')
+    ).select_from(everything)
+    
+    rows = db.session.execute(union_all(
+        total,
+        grouped('category', 'category', 'category'),
+        grouped('brand', 'brand', 'brand'),
+        grouped('price', 'price', 'price_bucket'),
+        store_facet,
+    )).all()
+    
+    counts = {'total': {}, 'category': {}, 'brand': {}, 'price': {}, 'store_category': {}}
+    for facet, value, n in rows:
+        counts[facet][value] = n
+    return counts
+
+@app.route('/api/products/browse', methods=['GET'])
+@retry_transient
+@read_replica
+def browse_products():
+    """
+    Filtered, paged product list with facet counts for the filter chips
+    
+    Query params (category, brand and store_category may repeat):
+        category, brand, store_category, min_price, max_price, in_stock=true,
+        latitude, longitude, radius (km, default 10), sort=name|price_asc|price_desc,
+        page (1-based), page_size
+    """
+    try:
+        filters = BrowseFilters(request.args)
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', CATALOG_PAGE_SIZE, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+        sort = request.args.get('sort', 'name')
+        
+        counts = browse_facet_counts(filters)
+        total = counts['total'].get('', 0)
+        
+        matched = filters.matching_products()
+        if sort == 'price_asc':
+            order = (matched.c.min_price.is_(None), matched.c.min_price, Product.name, Product.id)
+        elif sort == 'price_desc':
+            order = (matched.c.min_price.is_(None), matched.c.min_price.desc(), Product.name, Product.id)
+        else:
+            order = (Product.name, Product.id)
+        rows = db.session.execute(
+            select(Product, matched.c.min_price, matched.c.offers)
+            .join(matched, matched.c.id == Product.id)
+            .order_by(*order)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ).all()
+        
+        products = []
+        for product, min_price, offers in rows:
+            data = product_to_dict(product)
+            data['min_price'] = float(min_price) if min_price is not None else None
+            data['offer_count'] = offers or 0
+            products.append(data)
+        
+        def facet_list(values):
+            return [
+                {'value': value, 'count': count}
+                for value, count in sorted(values.items(), key=lambda f: (-f[1], f[0]))
+            ]
+        
+        labels = price_facet_labels()
+        return jsonify({
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'has_more': page * page_size < total,
+            'products': products,
+            'facets': {
+                'category': facet_list(counts['category']),
+                'brand': facet_list(counts['brand']),
+                'store_category': facet_list(counts['store_category']),
+                'price': [
+                    {
+                        'value': label,
+                        'min_price': ((0,) + PRICE_FACET_BOUNDS)[index],
+                        'max_price': PRICE_FACET_BOUNDS[index] if index < len(PRICE_FACET_BOUNDS) else None,
+                        'count': counts['price'].get(str(index), 0),
+                    }
+                    for index, label in enumerate(labels)
+                ],
+            },
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'detail': 'Error browsing products',
+            'error': str(e)
+        }), 500
+
 @app.route('/api/products/search', methods=['GET'])
+@retry_transient
+@read_replica
 def search_products():
     try:
         query = request.args.get('q', '').lower()
@@ -668,6 +997,9 @@ def search_products():
         }), 500
 
 @app.route('/api/products/<product_id>', methods=['GET'])
+@coalesce
+@retry_transient
+@read_replica
 def get_product(product_id):
     product = Product.query.get(product_id)
     if not product:
@@ -686,11 +1018,103 @@ def create_product():
         description=data.get('description'),
         unit=data.get('unit')
     )
-    db.session.add(product)
-    db.session.commit()
+    try:
+        db.session.add(product)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'detail': 'Error creating product',
+            'error': str(e)
+        }), 500
     return jsonify(product_to_dict(product)), 201
 
+def upload_entity_image(entity, upload):
+    """Validate the multipart 'image' field, store its variants and save the URL"""
+    file = request.files.get('image')
+    is_valid, error = SupabaseStorage.validate_image_file(file)
+    if not is_valid:
+        return None, (jsonify({'detail': error}), 400)
+    
+    try:
+        storage = SupabaseStorage()
+    except Exception as e:
+        return None, (jsonify({'detail': 'Image storage not configured', 'error': str(e)}), 503)
+    
+    try:
+        url = upload(storage, file, entity.id)
+    except UploadRejected as e:
+        return None, (jsonify({'detail': str(e)}), e.status_code)
+    if not url:
+        return None, (jsonify({'detail': 'Image upload failed'}), 500)
+    
+    entity.image_url = url
+    db.session.commit()
+    return entity, None
+
+@app.before_request
+def limit_single_upload_size():
+    """Single-image uploads get a tighter body limit than bulk imports (64 KB for multipart framing)"""
+    if request.endpoint in ('upload_product_image', 'upload_store_image'):
+        if (request.content_length or 0) > MAX_UPLOAD_BYTES + 64 * 1024:
+            return request_too_large(None)
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Body exceeds the upload limit (rejected before the upload is read)"""
+    return jsonify({'detail': f"File too large. Max size: {MAX_UPLOAD_BYTES / 1024 / 1024:.0f}MB"}), 413
+
+@app.route('/api/products/<product_id>/image', methods=['POST'])
+def upload_product_image(product_id):
+    """Upload a product image (multipart field 'image') as thumb/card/full variants"""
+    product = Product.query.get(product_id)
+    if not product:
+        return jsonify({'detail': 'Product not found'}), 404
+    
+    product, error = upload_entity_image(product, SupabaseStorage.upload_product_image)
+    if error:
+        return error
+    return jsonify(product_to_dict(product))
+
+@app.route('/api/products/images', methods=['POST'])
+def upload_product_images():
+    """Bulk image upload for imports: one multipart file per product, field name = product id"""
+    files = dict(request.files.items())
+    if not files:
+        return jsonify({'detail': 'No files provided'}), 400
+    
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(list(files))).all()}
+    results = {}
+    to_upload = {}
+    for product_id, file in files.items():
+        is_valid, error = SupabaseStorage.validate_image_file(file)
+        if product_id not in products:
+            results[product_id] = {'detail': 'Product not found'}
+        elif not is_valid:
+            results[product_id] = {'detail': error}
+        else:
+            to_upload[product_id] = file
+    
+    try:
+        storage = SupabaseStorage()
+    except Exception as e:
+        return jsonify({'detail': 'Image storage not configured', 'error': str(e)}), 503
+    
+    for product_id, url in storage.upload_images(to_upload, "products").items():
+        if isinstance(url, UploadRejected):
+            results[product_id] = {'detail': str(url)}
+        elif not url:
+            results[product_id] = {'detail': 'Image upload failed'}
+        else:
+            products[product_id].image_url = url
+            results[product_id] = product_to_dict(products[product_id])
+    db.session.commit()
+    return jsonify(results)
+
 @app.route('/api/products/<product_id>/inventory', methods=['GET'])
+@coalesce
+@retry_transient
+@read_replica
 def get_product_prices(product_id):
     """Get inventory/pricing for a specific product"""
     try:
@@ -725,11 +1149,68 @@ def get_product_prices(product_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/products/<product_id>/price-history', methods=['GET'])
+@retry_transient
+@read_replica
+def get_price_history(product_id):
+    """
+    Price series of a product per store, downsampled to min/max/last per bucket
+    
+    Query params: from, to (ISO 8601, default the last 90 days), buckets (default 200,
+    max 1000), store_id. `ts` values are bucket starts in unix seconds.
+    """
+    try:
+        product = Product.query.get(product_id)
+        if not product:
+            return jsonify({'detail': 'Product not found'}), 404
+        
+        try:
+            start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'detail': 'from and to must be ISO 8601 timestamps'}), 400
+        if start and end and start >= end:
+            return jsonify({'detail': 'from must be before to'}), 400
+        
+        series = price_series(
+            product_id,
+            start=start,
+            end=end,
+            buckets=request.args.get('buckets', 200, type=int),
+            store_id=request.args.get('store_id'),
+        )
+        names = dict(db.session.execute(
+            select(Store.id, Store.name).where(Store.id.in_(list(series['stores'])))
+        ).all()) if series['stores'] else {}
+        
+        return jsonify({
+            'product_id': product_id,
+            'product_name': product.name,
+            'from': series['from'],
+            'to': series['to'],
+            'bucket_seconds': series['bucket_seconds'],
+            'stores': [
+                {'store_id': store_id, 'store_name': names.get(store_id), **points}
+                for store_id, points in series['stores'].items()
+            ],
+        })
+    except Exception as e:
+        return jsonify({
+            'detail': 'Error fetching price history',
+            'error': str(e)
+        }), 500
+
 # ---- STORE ROUTES ----
 
 @app.route('/api/stores', methods=['GET'])
+@retry_transient
+@read_replica
 def get_all_stores():
     try:
+        catalog = get_catalog()
+        if catalog is not None:
+            return catalog_response(catalog, 'stores', lambda fmt: stores_body(catalog, fmt=fmt))
+        
         stores = Store.query.all()
         return jsonify([store_to_dict(s) for s in stores])
     except Exception as e:
@@ -739,9 +1220,15 @@ def get_all_stores():
         }), 500
 
 @app.route('/api/store-categories', methods=['GET'])
+@retry_transient
+@read_replica
 def get_store_categories():
     """Get unique store categories"""
     try:
+        catalog = get_catalog()
+        if catalog is not None:
+            return jsonify(list(catalog.store_categories))
+        
         categories = db.session.query(Store.category).distinct().all()
         return jsonify([cat[0] for cat in categories if cat[0]])
     except Exception as e:
@@ -750,9 +1237,184 @@ def get_store_categories():
             'error': str(e)
         }), 500
 
+def within_radius(lat, lon, radius_km):
+    """
+    SQL conditions keeping stores within radius_km of (lat, lon)
+
+    A bounding box the store lat/lon columns can use, then an equirectangular
+    distance check (plain arithmetic, so it runs on SQLite too). Within a few
+    tens of km it agrees with haversine_km to well under 1%.
+    """
+    dlat = radius_km / 111.0
+    dlon = radius_km / max(111.0 * math.cos(math.radians(lat)), 1e-6)
+    dx = (Store.longitude - lon) * (111.32 * math.cos(math.radians(lat)))
+    dy = (Store.latitude - lat) * 110.57
+    return (
+        Store.latitude.between(lat - dlat, lat + dlat),
+        Store.longitude.between(lon - dlon, lon + dlon),
+        dx * dx + dy * dy <= radius_km * radius_km,
+    )
+
+@app.route('/api/store-categories/<category>/items', methods=['GET'])
+@retry_transient
+@read_replica
+def get_store_category_items(category):
+    """
+    Cheapest offers from stores of one category, optionally near a location
+
+    One query over the (store_category, price) index on inventory_item, so it
+    reads rows already in price order instead of joining every store first.
+
+    Query params: latitude, longitude, radius (km, default 10), in_stock (default true),
+    page (1-based), page_size
+    """
+    try:
+        latitude = request.args.get('latitude', type=float)
+        longitude = request.args.get('longitude', type=float)
+        radius = request.args.get('radius', 10, type=float)
+        in_stock = request.args.get('in_stock', 'true').lower() == 'true'
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', CATALOG_PAGE_SIZE, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+
+        conditions = [InventoryItem.store_category == category]
+        if in_stock:
+            conditions.append(InventoryItem.quantity > 0)
+        if latitude is not None and longitude is not None:
+            conditions.extend(within_radius(latitude, longitude, radius))
+
+        # One row past the page tells whether there is a next page without a COUNT(*)
+        rows = db.session.execute(
+            select(InventoryItem, Product, Store)
+            .join(Store, Store.id == InventoryItem.store_id)
+            .join(Product, Product.id == InventoryItem.product_id)
+            .where(*conditions)
+            .order_by(InventoryItem.price, InventoryItem.id)
+            .offset((page - 1) * page_size)
+            .limit(page_size + 1)
+        ).all()
+
+        items = []
+        for item, product, store in rows[:page_size]:
+            data = inventory_to_dict(item)
+            data['product'] = product_to_dict(product)
+            data['store'] = store_to_dict(store)
+            data['distance_km'] = (
+                round(haversine_km(latitude, longitude, store.latitude, store.longitude), 2)
+                if latitude is not None and longitude is not None else None
+            )
+            items.append(data)
+
+        return jsonify({
+            'store_category': category,
+            'page': page,
+            'page_size': page_size,
+            'has_more': len(rows) > page_size,
+            'items': items,
+        })
+    except Exception as e:
+        return jsonify({
+            'detail': 'Error fetching store category items',
+            'error': str(e)
+        }), 500
+
+DEAL_FLAG_FILTERS = ('exclude', 'include', 'only')
+
+@app.route('/api/deals', methods=['GET'])
+@retry_transient
+@read_replica
+def get_deals():
+    """
+    Current discounted offers, biggest discount first
+    
+    Offers that price_anomalies.py flagged with an inconsistent discount or an
+    inflated original price are left out unless flags=include. flags=only lists
+    every flagged offer (any flag) for review.
+    
+    Query params: category, store_category, latitude, longitude, radius (km, default 10),
+    min_discount (percent, default 0), flags=exclude|include|only, page (1-based), page_size
+    """
+    try:
+        category = request.args.get('category')
+        store_category = request.args.get('store_category')
+        latitude = request.args.get('latitude', type=float)
+        longitude = request.args.get('longitude', type=float)
+        radius = request.args.get('radius', 10, type=float)
+        min_discount = request.args.get('min_discount', 0, type=float)
+        flags = request.args.get('flags', 'exclude')
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', CATALOG_PAGE_SIZE, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+        if flags not in DEAL_FLAG_FILTERS:
+            return jsonify({'detail': f"flags must be one of {', '.join(DEAL_FLAG_FILTERS)}"}), 400
+        
+        conditions = [
+            InventoryItem.discount_percentage > min_discount,
+            InventoryItem.quantity > 0,
+            db.or_(InventoryItem.offer_valid_until.is_(None), InventoryItem.offer_valid_until >= datetime.utcnow()),
+        ]
+        if category:
+            conditions.append(Product.category == category)
+        if store_category:
+            conditions.append(InventoryItem.store_category == store_category)
+        if latitude is not None and longitude is not None:
+            conditions.extend(within_radius(latitude, longitude, radius))
+        
+        flagged = select(PriceFlag.inventory_item_id).where(PriceFlag.inventory_item_id == InventoryItem.id)
+        if flags == 'exclude':
+            conditions.append(~flagged.where(PriceFlag.flag.in_(DEAL_BLOCKING_FLAGS)).exists())
+        elif flags == 'only':
+            conditions.append(flagged.exists())
+        
+        rows = db.session.execute(
+            select(InventoryItem, Product, Store)
+            .join(Store, Store.id == InventoryItem.store_id)
+            .join(Product, Product.id == InventoryItem.product_id)
+            .where(*conditions)
+            .order_by(InventoryItem.discount_percentage.desc(), InventoryItem.price, InventoryItem.id)
+            .offset((page - 1) * page_size)
+            .limit(page_size + 1)
+        ).all()
+        item_flags = {}
+        if flags != 'exclude' and rows:
+            for item_id, flag in db.session.execute(
+                select(PriceFlag.inventory_item_id, PriceFlag.flag)
+                .where(PriceFlag.inventory_item_id.in_([item.id for item, _, _ in rows[:page_size]]))
+            ):
+                item_flags.setdefault(item_id, []).append(flag)
+        
+        items = []
+        for item, product, store in rows[:page_size]:
+            data = inventory_to_dict(item)
+            data['product'] = product_to_dict(product)
+            data['store'] = store_to_dict(store)
+            data['savings'] = round(item.original_price - item.price, 2) if item.original_price else None
+            data['distance_km'] = (
+                round(haversine_km(latitude, longitude, store.latitude, store.longitude), 2)
+                if latitude is not None and longitude is not None else None
+            )
+            data['flags'] = item_flags.get(item.id, [])
+            items.append(data)
+        
+        return jsonify({
+            'page': page,
+            'page_size': page_size,
+            'has_more': len(rows) > page_size,
+            'items': items,
+        })
+    except Exception as e:
+        return jsonify({
+            'detail': 'Error fetching deals',
+            'error': str(e)
+        }), 500
+
 @app.route('/api/stores/category/<category>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_stores_by_category(category):
     try:
+        catalog = get_catalog()
+        if catalog is not None:
+            return catalog_response(catalog, ('stores', category), lambda fmt: stores_body(catalog, category, fmt=fmt))
+        
         stores = Store.query.filter_by(category=category).all()
         return jsonify([store_to_dict(s) for s in stores])
     except Exception as e:
@@ -762,12 +1424,114 @@ def get_stores_by_category(category):
         }), 500
 
 @app.route('/api/stores/<store_id>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_store(store_id):
-    store = Store.query.get(store_id)
+    catalog = get_catalog()
+    # Fall back to the database for stores created since the snapshot was taken
+    store = (catalog.stores_by_id.get(store_id) if catalog is not None else None) or Store.query.get(store_id)
     if not store:
         return jsonify({'detail': 'Store not found'}), 404
     return jsonify(store_to_dict(store))
 
+@app.route('/api/stores/<store_id>/catalog', methods=['GET'])
+@retry_transient
+@read_replica
+def get_store_catalog(store_id):
+    """
+    In-stock products of a store with product data, category facets and a price histogram
+    
+    Query params: category, page (1-based), page_size. Facets always cover the
+    whole store; items, total and the histogram follow the category filter.
+    """
+    try:
+        store = Store.query.get(store_id)
+        if not store:
+            return jsonify({'detail': 'Store not found'}), 404
+        
+        category = request.args.get('category')
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', CATALOG_PAGE_SIZE, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+        in_stock = db.and_(InventoryItem.store_id == store_id, InventoryItem.quantity > 0)
+        
+        # Category facets and price histogram from one grouped query over the in-stock rows
+        stock = (
+            select(InventoryItem.price.label('price'), Product.category.label('category'))
+            .join(Product, Product.id == InventoryItem.product_id)
+            .where(in_stock)
+            .cte('stock')
+        )
+        bounds = select(func.min(stock.c.price).label('lo'), func.max(stock.c.price).label('hi')).cte('bounds')
+        width = bounds.c.hi - bounds.c.lo
+        bucketed = (
+            select(
+                stock.c.category,
+                case(
+                    (width > 0, sql_floor((stock.c.price - bounds.c.lo) * PRICE_HISTOGRAM_BUCKETS / width)),
+                    else_=0
+                ).label('bucket'),
+                bounds.c.lo,
+                bounds.c.hi,
+            )
+            .select_from(stock.join(bounds, true()))
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(bucketed.c.category, bucketed.c.bucket, func.count(), func.min(bucketed.c.lo), func.min(bucketed.c.hi))
+            .group_by(bucketed.c.category, bucketed.c.bucket)
+        ).all()
+        
+        facets = {}
+        bucket_counts = {}
+        lo = hi = None
+        for row_category, bucket, count, lo, hi in rows:
+            facets[row_category] = facets.get(row_category, 0) + count
+            if not category or row_category == category:
+                bucket_counts[bucket] = bucket_counts.get(bucket, 0) + count
+        
+        query = (
+            db.session.query(InventoryItem, Product)
+            .join(Product, Product.id == InventoryItem.product_id)
+            .filter(in_stock)
+        )
+        if category:
+            query = query.filter(Product.category == category)
+        rows = (
+            query.order_by(Product.category, Product.name, InventoryItem.id)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+            .all()
+        )
+        
+        items = []
+        for item, product in rows:
+            data = inventory_to_dict(item)
+            data['product'] = product_to_dict(product)
+            items.append(data)
+        
+        total = facets.get(category, 0) if category else sum(facets.values())
+        return jsonify({
+            'store': store_to_dict(store),
+            'category': category,
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'has_more': page * page_size < total,
+            'items': items,
+            'facets': {
+                'categories': [
+                    {'category': name, 'count': count}
+                    for name, count in sorted(facets.items(), key=lambda f: (-f[1], f[0]))
+                ]
+            },
+            'price_histogram': price_buckets(lo, hi, bucket_counts),
+        })
+    except Exception as e:
+        return jsonify({
+            'detail': 'Error fetching store catalog',
+            'error': str(e)
+        }), 500
+
 @app.route('/api/stores', methods=['POST'])
 def create_store():
     data = request.get_json()
@@ -780,36 +1544,44 @@ def create_store():
         phone=data.get('phone'),
         image_url=data.get('image_url')
     )
-    db.session.add(store)
-    db.session.commit()
+    try:
+        db.session.add(store)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'detail': 'Error creating store',
+            'error': str(e)
+        }), 500
     return jsonify(store_to_dict(store)), 201
 
+@app.route('/api/stores/<store_id>/image', methods=['POST'])
+def upload_store_image(store_id):
+    """Upload a store image (multipart field 'image') as thumb/card/full variants"""
+    store = Store.query.get(store_id)
+    if not store:
+        return jsonify({'detail': 'Store not found'}), 404
+    
+    store, error = upload_entity_image(store, SupabaseStorage.upload_store_image)
+    if error:
+        return error
+    return jsonify(store_to_dict(store))
+
 @app.route('/api/stores/nearby', methods=['GET'])
+@retry_transient
+@read_replica
 def get_nearby_stores():
     try:
-        import math
-        
         lat = float(request.args.get('latitude', 0))
         lon = float(request.args.get('longitude', 0))
         radius = float(request.args.get('radius', 10))
         
         stores = Store.query.all()
-        nearby = []
-        
-        for store in stores:
-            if store.latitude and store.longitude:
-                lat1, lon1 = math.radians(lat), math.radians(lon)
-                lat2, lon2 = math.radians(store.latitude), math.radians(store.longitude)
-                
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                
-                a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                distance = 6371 * c
-                
-                if distance <= radius:
-                    nearby.append(store)
+        nearby = [
+            store for store in stores
+            if store.latitude and store.longitude
+            and haversine_km(lat, lon, store.latitude, store.longitude) <= radius
+        ]
         
         return jsonify([store_to_dict(s) for s in nearby])
     except Exception as e:
@@ -821,6 +1593,8 @@ def get_nearby_stores():
 # ---- INVENTORY ROUTES ----
 
 @app.route('/api/inventory', methods=['GET'])
+@retry_transient
+@read_replica
 def get_all_inventory():
     try:
         items = InventoryItem.query.all()
@@ -832,6 +1606,8 @@ def get_all_inventory():
         }), 500
 
 @app.route('/api/inventory/product/<product_id>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_product_inventory(product_id):
     try:
         items = InventoryItem.query.filter_by(product_id=product_id).all()
@@ -844,6 +1620,8 @@ def get_product_inventory(product_id):
         }), 500
 
 @app.route('/api/inventory/store/<store_id>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_store_inventory(store_id):
     try:
         items = InventoryItem.query.filter_by(store_id=store_id).all()
@@ -855,6 +1633,8 @@ def get_store_inventory(store_id):
         }), 500
 
 @app.route('/api/inventory/<item_id>', methods=['GET'])
+@retry_transient
+@read_replica
 def get_inventory_item(item_id):
     item = InventoryItem.query.get(item_id)
     if not item:
@@ -874,8 +1654,15 @@ def create_inventory():
         discount_percentage=data.get('discount_percentage'),
         offer_valid_until=data.get('offer_valid_until')
     )
-    db.session.add(item)
-    db.session.commit()
+    try:
+        db.session.add(item)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'detail': 'Error creating inventory item',
+            'error': str(e)
+        }), 500
     return jsonify(inventory_to_dict(item)), 201
 
 @app.route('/api/inventory/<item_id>', methods=['PUT'])
@@ -916,8 +1703,7 @@ def init_db():
     """Initialize database with comprehensive demo data"""
     with app.app_context():
         print("Creating database tables...")
-        db.drop_all()  # Drop all existing tables to start fresh
-        db.create_all()
+        reset_schema(db.engine)  # Drop all existing tables and migrate from scratch
         print("✅ Tables created (fresh start)")
         
         # ===== GROCERY STORES =====
@@ -1257,7 +2043,32 @@ def init_db():
         print(f"   - {len(all_products)} Products (with brand, size & mfg date)")
         print(f"   - {inventory_count} Inventory items (with varied prices)")
 
+def warm_up():
+    """
+    Do the work the first requests would otherwise pay for: apply migrations, load the
+    catalog snapshot, pick the bcrypt backend and compile the URL map.
+
+    gunicorn.conf.py calls this once in the master with --preload (workers inherit
+    the result copy-on-write) or in every worker without it.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            migrate(db.engine)
+            init_db_tables.executed = True
+            get_catalog()
+        except Exception as e:
+            print(f"⚠️  Warm-up database step failed: {e}")
+        finally:
+            db.session.remove()
+    pwd_context.handler('bcrypt').get_backend()
+    app.url_map.update()
+    print(f"✅ App warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
 if __name__ == '__main__':
+    # Build the storage client and check the bucket off the request path (gunicorn.conf.py does this per worker)
+    warm_storage()
     print(f"Starting Flask server on {os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 9000)}")
     app.run(
         host=os.getenv('HOST', '0.0.0.0'),
@@ -0,0 +1,323 @@
+"""
+Prometheus-style metrics for the Material Map API
+Counters, gauges and histograms kept in memory per process and flushed to one
+file per worker in METRICS_DIR. GET /metrics merges the files of all live
+workers and renders them in the Prometheus text exposition format, so the
+numbers cover every gunicorn worker without an external collector.
+
+Usage (in main.py):
+    from metrics import init_metrics
+    init_metrics(app, db)
+
+Other modules report through the helpers:
+    record_cache('status', hit=True)
+    set_queue_depth('images', 3)
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response
+from sqlalchemy.pool import QueuePool
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'material_map_metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1))
+METRICS_PREFIX = 'materialmap_'
+
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=None):
+        self.name = METRICS_PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self._values = {}
+        self._lock = registry.lock
+        if not self.labelnames and self.kind != 'histogram':
+            # Unlabelled series are exported as 0 until first touched
+            self._values[()] = 0.0
+        registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(k), v[:] if isinstance(v, list) else v] for k, v in self._values.items()]
+        return {
+            'kind': self.kind,
+            'help': self.help,
+            'labelnames': list(self.labelnames),
+            'buckets': list(self.buckets) if self.buckets else None,
+            'values': values,
+        }
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Gauge summed across live workers"""
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            # Layout: non-cumulative bucket counts (+Inf last), then sum, then count
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+
+class Registry:
+    """All metrics of this process plus collectors that refresh gauges before a flush"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.collectors = []
+        self._flusher_pid = None
+        # Request threads and the flush thread share one tmp file; one writer at a time also
+        # keeps an older snapshot from replacing a newer one (a false counter reset)
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def add_collector(self, fn):
+        self.collectors.append(fn)
+
+    def snapshot(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️  Metrics collector failed: {e}")
+        return {m.name: m.snapshot() for m in self.metrics}
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR/<pid>.json atomically"""
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with self._flush_lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+
+    def reset_after_fork(self):
+        # The parent's flush thread may have held the lock at fork time
+        self._flush_lock = threading.Lock()
+
+    def ensure_flusher(self):
+        """Start the background flush thread once per process (also after a fork)"""
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self.lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Metrics flush failed: {e}")
+            time.sleep(METRICS_FLUSH_SECONDS)
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset_after_fork)
+
+REQUESTS = Counter(registry, 'http_requests_total', 'HTTP requests handled', ('route', 'status'))
+REQUEST_LATENCY = Histogram(registry, 'http_request_duration_seconds', 'HTTP request latency',
+                            ('route',), REQUEST_LATENCY_BUCKETS)
+DB_TIME = Histogram(registry, 'db_time_per_request_seconds', 'Time spent in SQL per request',
+                    ('route',), REQUEST_LATENCY_BUCKETS)
+DB_QUERIES = Histogram(registry, 'db_queries_per_request', 'SQL statements issued per request',
+                       ('route',), QUERY_COUNT_BUCKETS)
+POOL_SIZE = Gauge(registry, 'db_pool_size', 'Configured connection pool size')
+POOL_CHECKED_OUT = Gauge(registry, 'db_pool_checked_out', 'Connections currently checked out')
+POOL_OVERFLOW = Gauge(registry, 'db_pool_overflow', 'Connections open beyond pool_size')
+POOL_TIMEOUTS = Counter(registry, 'db_pool_timeouts_total', 'Connection checkouts that timed out')
+POOL_WAIT = Histogram(registry, 'db_pool_wait_seconds', 'Time spent checking out a connection',
+                    (), POOL_WAIT_BUCKETS)
+DB_RETRIES = Counter(registry, 'db_retries_total', 'Views re-run after a transient database error', ('view',))
+DB_READ_ROUTING = Counter(registry, 'db_read_routing_total', 'Read-only views by where their queries ran',
+                          ('target',))
+CACHE_REQUESTS = Counter(registry, 'cache_requests_total', 'Cache lookups', ('cache', 'result'))
+JOB_QUEUE_DEPTH = Gauge(registry, 'job_queue_depth', 'Jobs waiting or running', ('queue',))
+
+
+def observe_request(route, status, duration_ms, db_ms, queries):
+    """Called by instrumentation.py once per request"""
+    registry.ensure_flusher()
+    REQUESTS.inc(route, status)
+    REQUEST_LATENCY.observe(route, value=duration_ms / 1000)
+    DB_TIME.observe(route, value=db_ms / 1000)
+    DB_QUERIES.observe(route, value=queries)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+
+def set_queue_depth(queue, depth):
+    JOB_QUEUE_DEPTH.set(queue, value=depth)
+
+
+# ============ AGGREGATION ============
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_all():
+    """Merge the snapshots of every live worker (flushing this one first)"""
+    registry.flush()
+    merged = {}
+    for entry in os.listdir(METRICS_DIR):
+        # Only <pid>.json is a worker snapshot; leave anything else (editor copies, stray files) alone
+        if not entry.endswith('.json') or not entry[:-5].isdigit():
+            continue
+        pid = int(entry[:-5])
+        path = os.path.join(METRICS_DIR, entry)
+        if not _pid_alive(pid):
+            # Worker is gone; Prometheus treats the drop as a counter reset
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'values': {}})
+            for labels, value in metric['values']:
+                key = tuple(labels)
+                if metric['kind'] == 'histogram':
+                    current = target['values'].get(key)
+                    target['values'][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target['values'][key] = target['values'].get(key, 0.0) + value
+    return merged
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(merged):
+    """Prometheus text exposition format"""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric['labelnames']
+        for labels, value in sorted(metric['values'].items()):
+            if metric['kind'] == 'histogram':
+                cumulative = 0
+                bounds = metric['buckets'] + [float('inf')]
+                for bound, count in zip(bounds, value[:-2]):
+                    cumulative += count
+                    le = _format_labels(names, labels, ('le', _format_value(bound)))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(names, labels)} {_format_value(value[-2])}")
+                lines.append(f"{name}_count{_format_labels(names, labels)} {value[-1]}")
+            else:
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+
+    # Derived hit ratio per cache so dashboards don't need PromQL for it
+    cache = merged.get(CACHE_REQUESTS.name)
+    if cache and cache['values']:
+        totals = {}
+        for (cache_name, result), value in cache['values'].items():
+            hits, total = totals.get(cache_name, (0.0, 0.0))
+            totals[cache_name] = (hits + (value if result == 'hit' else 0.0), total + value)
+        ratio_name = f"{METRICS_PREFIX}cache_hit_ratio"
+        lines.append(f"# HELP {ratio_name} Cache hits / lookups since worker start")
+        lines.append(f"# TYPE {ratio_name} gauge")
+        for cache_name, (hits, total) in sorted(totals.items()):
+            ratio = hits / total if total else 0.0
+            lines.append(f"{ratio_name}{_format_labels(('cache',), (cache_name,))} {ratio:.4f}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_endpoint():
+    return Response(render(collect_all()), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app, db):
+    """Register /metrics and a collector for the SQLAlchemy pool gauges"""
+
+    def collect_pool():
+        with app.app_context():
+            pool = db.engine.pool
+        if isinstance(pool, QueuePool):
+            POOL_SIZE.set(value=pool.size())
+            POOL_CHECKED_OUT.set(value=pool.checkedout())
+            POOL_OVERFLOW.set(value=max(pool.overflow(), 0))
+
+    registry.add_collector(collect_pool)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+    return app
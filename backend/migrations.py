@@ -0,0 +1,256 @@
+"""
+Versioned schema migrations for the models in models.py
+Every entry point (main.py, generate_data.py, create_tables.py, database.py)
+calls migrate() instead of create_all(), so an index or constraint added here
+reaches local SQLite files, Supabase and the benchmark databases alike.
+
+Applied versions are recorded in `schema_migrations`. Pending migrations run
+in order, each in a transaction with its version row, so on Postgres a failed
+migration leaves nothing behind. An advisory lock keeps Postgres workers that
+start together from running the same migration twice; on SQLite a second
+process just finds the version recorded and moves on.
+
+Migration 1 creates the tables missing from the database, with the columns
+and indexes the models have *today*. Later migrations therefore have to work
+on both a fresh database and an old one: use the helpers below, which skip
+tables, columns and indexes that already exist.
+
+Adding a schema change:
+    1. Change the model in models.py
+    2. Append a Migration with the next version to MIGRATIONS
+    3. Deploy; the first process to start applies it (or run `python migrations.py`)
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied and pending migrations
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, exc as sa_exc, func, inspect, select, text
+
+from models import InventoryItem, PriceFlag, PriceHistory, Product, Store, db
+
+# Arbitrary constant shared by every process migrating the same database
+MIGRATION_LOCK_ID = 7_240_311
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable
+
+
+# ============ HELPERS ============
+
+def create_missing_tables(connection):
+    """CREATE TABLE (with its indexes) for every model whose table doesn't exist yet"""
+    db.metadata.create_all(connection, checkfirst=True)
+
+
+def create_table(connection, model):
+    """CREATE TABLE (with its indexes) for a model added after migration 1"""
+    model.__table__.create(connection, checkfirst=True)
+
+
+def create_index(connection, index):
+    """CREATE INDEX unless an index with that name exists (works for unique indexes too)"""
+    index.create(connection, checkfirst=True)
+
+
+def add_column(connection, table_name, column_name, ddl):
+    """
+    ALTER TABLE ... ADD COLUMN unless the column exists
+
+    Args:
+        table_name: Table to alter
+        column_name: New column
+        ddl: Type and constraints, e.g. "VARCHAR(100) NOT NULL DEFAULT 'other'".
+             NOT NULL needs a DEFAULT for the existing rows.
+    """
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    if column_name in existing:
+        return
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(
+        f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN {preparer.quote(column_name)} {ddl}"
+    ))
+
+
+def model_index(model, *column_names):
+    """The Index declared on a model over exactly these columns (index=True or __table_args__)"""
+    for index in model.__table__.indexes:
+        if tuple(column.name for column in index.columns) == column_names:
+            return index
+    raise LookupError(f"{model.__tablename__}{column_names} has no index in models.py")
+
+
+# ============ MIGRATIONS ============
+
+def _initial_schema(connection):
+    create_missing_tables(connection)
+
+
+def _store_category(connection):
+    # Databases created before stores had categories (see FIX_TABLES.sql)
+    add_column(connection, Store.__tablename__, 'category', "VARCHAR(100) NOT NULL DEFAULT 'other'")
+    create_index(connection, model_index(Store, 'category'))
+
+
+def _lookup_indexes(connection):
+    # Catalog filters and the per-product / per-store inventory lookups
+    create_index(connection, model_index(Product, 'category'))
+    create_index(connection, model_index(InventoryItem, 'store_id'))
+    create_index(connection, model_index(InventoryItem, 'product_id'))
+
+
+def _inventory_store_category(connection):
+    # Denormalized Store.category so category-scoped price queries need no join to filter
+    inventory, store = InventoryItem.__table__, Store.__table__
+    add_column(connection, inventory.name, 'store_category', "VARCHAR(100) NOT NULL DEFAULT 'other'")
+    connection.execute(
+        inventory.update().values(
+            store_category=select(store.c.category).where(store.c.id == inventory.c.store_id).scalar_subquery()
+        )
+    )
+    create_index(connection, model_index(InventoryItem, 'store_category', 'price', 'id'))
+
+
+def _price_history(connection):
+    create_table(connection, PriceHistory)
+    # Start every series with the current price, stamped with the row's last update
+    inventory, history = InventoryItem.__table__, PriceHistory.__table__
+    if connection.execute(select(history.c.product_id).limit(1)).first() is None:
+        connection.execute(history.insert().from_select(
+            ['product_id', 'ts', 'store_id', 'price', 'original_price', 'discount_percentage', 'quantity'],
+            select(
+                inventory.c.product_id, inventory.c.updated_at, inventory.c.store_id,
+                func.min(inventory.c.price), func.min(inventory.c.original_price),
+                func.min(inventory.c.discount_percentage), func.min(inventory.c.quantity),
+            )
+            .where(inventory.c.updated_at.isnot(None))
+            # Duplicate (product, store) offers updated at the same instant would collide on the key
+            .group_by(inventory.c.product_id, inventory.c.updated_at, inventory.c.store_id)
+        ))
+
+
+def _price_flags(connection):
+    create_table(connection, PriceFlag)
+    create_index(connection, model_index(InventoryItem, 'discount_percentage'))
+    create_index(connection, model_index(InventoryItem, 'store_category', 'discount_percentage'))
+
+
+MIGRATIONS = [
+    Migration(1, 'initial schema', _initial_schema),
+    Migration(2, 'store category column and index', _store_category),
+    Migration(3, 'product category and inventory lookup indexes', _lookup_indexes),
+    Migration(4, 'inventory store_category column and (store_category, price) index', _inventory_store_category),
+    Migration(5, 'price_history table seeded with current prices', _price_history),
+    Migration(6, 'price_flag table and discount indexes', _price_flags),
+]
+
+
+# ============ RUNNER ============
+
+def applied_versions(connection):
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(connection):
+    applied = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def migrate(engine, verbose=True):
+    """
+    Apply pending migrations to the database behind `engine`
+
+    Safe to call on every start: with nothing pending it only reads `schema_migrations`.
+
+    Returns:
+        Versions applied by this call
+    """
+    applied = []
+    with engine.connect() as connection:
+        postgres = connection.dialect.name == 'postgresql'
+        if postgres:
+            connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+            connection.commit()
+        try:
+            with connection.begin():
+                _metadata.create_all(connection, checkfirst=True)
+                pending = pending_migrations(connection)
+            for migration in pending:
+                started = time.perf_counter()
+                try:
+                    with connection.begin():
+                        migration.apply(connection)
+                        connection.execute(schema_migrations.insert().values(
+                            version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+                        ))
+                except sa_exc.IntegrityError:
+                    # Another process recorded this version first (SQLite has no advisory lock)
+                    continue
+                applied.append(migration.version)
+                if verbose:
+                    print(f"✅ Migration {migration.version:04d} {migration.name} "
+                          f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+        finally:
+            if postgres:
+                connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_LOCK_ID})
+                connection.commit()
+    return applied
+
+
+def reset_schema(engine):
+    """Drop every model table and the migration history, then migrate from scratch (dev seeding)"""
+    with engine.begin() as connection:
+        db.metadata.drop_all(connection)
+        _metadata.drop_all(connection)
+    return migrate(engine)
+
+
+def status(engine):
+    """(applied rows, pending migrations) for the database behind `engine`"""
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(schema_migrations.name):
+            return [], list(MIGRATIONS)
+        rows = connection.execute(select(schema_migrations).order_by(schema_migrations.c.version)).all()
+        return rows, pending_migrations(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply or list Material Map schema migrations')
+    parser.add_argument('command', nargs='?', choices=['upgrade', 'status'], default='upgrade')
+    args = parser.parse_args()
+
+    from main import app
+
+    with app.app_context():
+        if args.command == 'status':
+            rows, pending = status(db.engine)
+            for row in rows:
+                print(f"✅ {row.version:04d} {row.name} (applied {row.applied_at:%Y-%m-%d %H:%M})")
+            for migration in pending:
+                print(f"⏳ {migration.version:04d} {migration.name} (pending)")
+            return
+
+        applied = migrate(db.engine)
+        print(f"🎉 Applied {len(applied)} migration(s)" if applied else "✅ Schema is up to date")
+
+
+if __name__ == '__main__':
+    main()
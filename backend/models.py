@@ -0,0 +1,171 @@
+"""
+Database models shared by every entry point
+main.py, generate_data.py, create_tables.py, database.py and seed.py all import
+these classes, so a table has one name and one set of columns and indexes
+wherever it is used. Schema changes are applied by migrations.py, never by
+create_all() directly.
+
+`db` is created unbound; main.py attaches it with db.init_app(app). Scripts
+that don't run Flask can still use the model classes with a plain SQLAlchemy
+session (see database.py).
+"""
+
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from read_replicas import ReplicaRoutingSession
+
+# Reads of @read_replica routes go to DATABASE_READ_URLS when set (see read_replicas.py)
+db = SQLAlchemy(session_options={'class_': ReplicaRoutingSession})
+
+
+class User(db.Model):
+    __tablename__ = 'user'
+    id = db.Column(db.String(36), primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    hashed_password = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Product(db.Model):
+    __tablename__ = 'product'
+    id = db.Column(db.String(36), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    brand = db.Column(db.String(255), nullable=False)
+    category = db.Column(db.String(100), nullable=False, index=True)
+    image_url = db.Column(db.String(500))
+    description = db.Column(db.Text)
+    unit = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Store(db.Model):
+    __tablename__ = 'store'
+    id = db.Column(db.String(36), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    category = db.Column(db.String(100), nullable=False, index=True, default='other')  # grocery, stationery, household
+    address = db.Column(db.String(500), nullable=False)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    phone = db.Column(db.String(20))
+    image_url = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class InventoryItem(db.Model):
+    __tablename__ = 'inventory_item'
+    __table_args__ = (
+        # "Cheapest <store category> items" scans this in price order
+        db.Index('ix_inventory_item_store_category_price', 'store_category', 'price', 'id'),
+        # /api/deals reads the biggest discounts first, overall or within a store category
+        db.Index('ix_inventory_item_discount_percentage', 'discount_percentage'),
+        db.Index('ix_inventory_item_store_category_discount', 'store_category', 'discount_percentage'),
+    )
+    id = db.Column(db.String(36), primary_key=True)
+    product_id = db.Column(db.String(36), db.ForeignKey('product.id'), nullable=False, index=True)
+    store_id = db.Column(db.String(36), db.ForeignKey('store.id'), nullable=False, index=True)
+    # Copy of Store.category, kept in step by the events below (raw SQL inserts get 'other')
+    store_category = db.Column(db.String(100), nullable=False, default='other', server_default='other')
+    price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    original_price = db.Column(db.Float)  # Price before offer
+    discount_percentage = db.Column(db.Float, default=0)  # Discount percentage
+    offer_valid_until = db.Column(db.DateTime)  # When offer expires
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    product = db.relationship('Product', backref='inventory_items')
+    store = db.relationship('Store', backref='inventory_items')
+
+
+class PriceHistory(db.Model):
+    """Append-only log of inventory price changes, written by price_history.py"""
+    __tablename__ = 'price_history'
+    # One product's series is a contiguous key range; on SQLite the rows are stored in key order
+    __table_args__ = {'sqlite_with_rowid': False}
+    # No foreign keys: history outlives the inventory rows (and stores) it came from
+    product_id = db.Column(db.String(36), primary_key=True)
+    ts = db.Column(db.DateTime, primary_key=True)
+    store_id = db.Column(db.String(36), primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    original_price = db.Column(db.Float)
+    discount_percentage = db.Column(db.Float)
+    quantity = db.Column(db.Integer)
+
+
+class PriceFlag(db.Model):
+    """Offers flagged by the price_anomalies.py batch job; replaced on every run"""
+    __tablename__ = 'price_flag'
+    inventory_item_id = db.Column(db.String(36), primary_key=True)
+    flag = db.Column(db.String(40), primary_key=True)  # see price_anomalies.FLAGS
+    product_id = db.Column(db.String(36), nullable=False, index=True)
+    score = db.Column(db.Float)  # robust z-score, or relative gap for discount_mismatch
+    expected = db.Column(db.Float)  # product median price, or the price the discount implies
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class TableRowCount(db.Model):
+    """Row counts kept in step with ORM writes by table_stats.py"""
+    __tablename__ = 'table_row_count'
+    table_name = db.Column(db.String(64), primary_key=True)
+    row_count = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class CatalogVersion(db.Model):
+    """Single row bumped on every catalog write; workers reload their snapshot when it moves"""
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# ============ DENORMALIZED STORE CATEGORY ============
+
+def _store_changed(item):
+    attrs = inspect(item).attrs
+    return attrs.store_id.history.has_changes() or attrs.store.history.has_changes()
+
+
+@event.listens_for(Session, 'before_flush')
+def _copy_store_categories(session, flush_context, instances):
+    """Copy the store's category onto new or moved inventory rows, with at most one SELECT per flush"""
+    items = [obj for obj in session.new if isinstance(obj, InventoryItem)]
+    items += [obj for obj in session.dirty if isinstance(obj, InventoryItem) and _store_changed(obj)]
+    if not items:
+        return
+
+    # Stores this session already holds (pending, or loaded and possibly just recategorized)
+    pending = {obj.id: obj for obj in session.new if isinstance(obj, Store)}
+    store_mapper = inspect(Store)
+    categories = {}
+    unknown = set()
+    for store_id in {item.store_id for item in items if item.store_id is not None}:
+        store = pending.get(store_id)
+        if store is None:
+            store = session.identity_map.get(store_mapper.identity_key_from_primary_key([store_id]))
+        if store is None:
+            unknown.add(store_id)
+        else:
+            categories[store_id] = store.category
+    if unknown:
+        with session.no_autoflush:
+            rows = session.execute(select(Store.id, Store.category).where(Store.id.in_(unknown))).all()
+        categories.update(rows)
+
+    for item in items:
+        # An assigned relationship wins over store_id, as it does when the flush syncs the key
+        store = inspect(item).attrs.store.history.added
+        category = store[0].category if store and store[0] is not None else categories.get(item.store_id)
+        item.store_category = category or 'other'
+
+
+@event.listens_for(Store, 'after_update')
+def _propagate_store_category(mapper, connection, target):
+    if not inspect(target).attrs.category.history.has_changes():
+        return
+    connection.execute(
+        update(InventoryItem.__table__)
+        .where(InventoryItem.__table__.c.store_id == target.id)
+        .values(store_category=target.category)
+    )
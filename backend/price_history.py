@@ -0,0 +1,208 @@
+"""
+Append-only price history for inventory items
+update_inventory overwrites an offer's price in place. Every ORM insert or
+update of an InventoryItem that changes price, quantity, original_price or
+discount_percentage also appends a row to `price_history` in the same flush, so
+the new price and its history row commit or roll back together.
+
+Rows are keyed (product_id, ts, store_id), so one product's series is a single
+key range. On SQLite the table is WITHOUT ROWID and the rows themselves are
+stored in that order; on Postgres the key is a b-tree next to the append-only heap.
+
+price_series() reads a product's changes over a time range and downsamples
+them with NumPy to min/max/last per bucket and store. A year of daily changes
+comes back as at most PRICE_SERIES_MAX_BUCKETS points per store.
+
+Rows written outside the ORM (bulk loads, raw SQL) have no history. When one
+flush changes two offers of the same product in the same store, only the last
+one is recorded.
+
+Usage (in main.py):
+    from price_history import init_price_history, price_series
+    init_price_history(db, PriceHistory, InventoryItem)
+    series = price_series(product_id, start, end, buckets=200)
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+PRICE_SERIES_DEFAULT_DAYS = int(os.getenv('PRICE_SERIES_DEFAULT_DAYS', 90))
+PRICE_SERIES_DEFAULT_BUCKETS = 200
+PRICE_SERIES_MAX_BUCKETS = 1000
+TRACKED_FIELDS = ('price', 'quantity', 'original_price', 'discount_percentage')
+
+EPOCH = datetime(1970, 1, 1)
+
+_db = None
+_history_model = None
+_inventory_model = None
+
+
+def init_price_history(db, history_model, inventory_model):
+    """Append a history row for every ORM write that changes an inventory price"""
+    global _db, _history_model, _inventory_model
+    _db = db
+    _history_model = history_model
+    _inventory_model = inventory_model
+
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+
+def _changed(item):
+    attrs = inspect(item).attrs
+    return any(attrs[field].history.has_changes() for field in TRACKED_FIELDS)
+
+
+def _after_flush(session, flush_context):
+    items = [obj for obj in session.new if isinstance(obj, _inventory_model)]
+    items += [obj for obj in session.dirty if isinstance(obj, _inventory_model) and _changed(obj)]
+    if not items:
+        return
+    # Rows are keyed (product_id, ts, store_id) and a store may list a product twice;
+    # keep one row per key, from the last of its offers written in this flush
+    latest = {}
+    for item in items:
+        latest[(item.product_id, item.store_id)] = item
+
+    # One timestamp per flush: a bulk edit shows up as a single step in every series
+    ts = datetime.utcnow()
+    session.connection().execute(_history_model.__table__.insert(), [
+        {
+            'product_id': item.product_id,
+            'ts': ts,
+            'store_id': item.store_id,
+            'price': item.price,
+            'original_price': item.original_price,
+            'discount_percentage': item.discount_percentage,
+            'quantity': item.quantity,
+        }
+        for item in latest.values()
+    ])
+
+
+def _epoch_us(values):
+    """datetime sequence -> int64 microseconds since the epoch"""
+    import numpy as np
+
+    return np.array(values, dtype='datetime64[us]').astype(np.int64)
+
+
+def downsample(store_ids, ts_us, prices, start_us, width_us, buckets):
+    """
+    Min, max and last price per (store, bucket)
+
+    Args:
+        store_ids: Store id per change, grouped by store and sorted by time within a store
+        ts_us: Change times, int64 microseconds
+        prices: Price after each change
+        start_us, width_us: Start of the first bucket and bucket width, microseconds
+        buckets: Number of buckets; a change exactly at the range end goes in the last one
+
+    Returns:
+        Dict of store id -> {'ts': bucket starts (unix seconds), 'min', 'max', 'last'}
+    """
+    import numpy as np
+
+    if len(prices) == 0:
+        return {}
+    store_ids = np.asarray(store_ids)
+    ts_us = np.asarray(ts_us, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Number the stores in order of appearance, then form one sortable key per (store, bucket)
+    store_start = np.flatnonzero(np.r_[True, store_ids[1:] != store_ids[:-1]])
+    store_index = np.cumsum(np.r_[True, store_ids[1:] != store_ids[:-1]]) - 1
+    bucket = np.minimum((ts_us - start_us) // width_us, buckets - 1)
+    key = store_index * (int(bucket.max()) + 1) + bucket
+
+    # Changes are sorted by (store, time), so each key is a contiguous run
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+    mins = np.minimum.reduceat(prices, starts)
+    maxs = np.maximum.reduceat(prices, starts)
+    lasts = prices[ends]
+    bucket_seconds = (start_us + bucket[starts] * width_us) // 1_000_000
+    run_store = store_index[starts]
+
+    series = {}
+    for index, first in enumerate(store_start):
+        runs = run_store == index
+        series[str(store_ids[first])] = {
+            'ts': bucket_seconds[runs].tolist(),
+            'min': np.round(mins[runs], 2).tolist(),
+            'max': np.round(maxs[runs], 2).tolist(),
+            'last': np.round(lasts[runs], 2).tolist(),
+        }
+    return series
+
+
+def price_series(product_id, start=None, end=None, buckets=PRICE_SERIES_DEFAULT_BUCKETS, store_id=None):
+    """
+    Downsampled price series of one product, per store
+
+    Args:
+        product_id: Product to read
+        start, end: Time range (default: the last PRICE_SERIES_DEFAULT_DAYS days)
+        buckets: Points per store at most (capped at PRICE_SERIES_MAX_BUCKETS)
+        store_id: Only this store's series
+
+    Returns:
+        Dict with the range, bucket width and, per store id, the price in effect
+        at `start` ('initial') plus bucket starts and min/max/last prices.
+        Buckets without a change are left out; the price carries over.
+    """
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=PRICE_SERIES_DEFAULT_DAYS)
+    buckets = min(max(int(buckets), 1), PRICE_SERIES_MAX_BUCKETS)
+    history = _history_model.__table__
+    session = _db.session
+
+    conditions = [history.c.product_id == product_id]
+    if store_id:
+        conditions.append(history.c.store_id == store_id)
+
+    # Key range scan on (product_id, ts); sorted by store only in the result
+    rows = session.execute(
+        select(history.c.store_id, history.c.ts, history.c.price)
+        .where(*conditions, history.c.ts >= start, history.c.ts <= end)
+        .order_by(history.c.store_id, history.c.ts)
+    ).all()
+
+    # Last change before the range: the price each store had when it started
+    previous = (
+        select(history.c.store_id, func.max(history.c.ts).label('ts'))
+        .where(*conditions, history.c.ts < start)
+        .group_by(history.c.store_id)
+        .subquery()
+    )
+    initial = dict(session.execute(
+        select(history.c.store_id, history.c.price)
+        .join(previous, (previous.c.store_id == history.c.store_id) & (previous.c.ts == history.c.ts))
+        .where(history.c.product_id == product_id)
+    ).all())
+
+    start_us = int((start - EPOCH).total_seconds() * 1_000_000)
+    end_us = int((end - EPOCH).total_seconds() * 1_000_000)
+    width_us = max(-(-(end_us - start_us) // buckets), 1_000_000)
+
+    if rows:
+        store_ids, times, prices = zip(*rows)
+        series = downsample(store_ids, _epoch_us(times), prices, start_us, width_us, buckets)
+    else:
+        series = {}
+
+    stores = {}
+    for sid in sorted(set(series) | set(initial)):
+        points = series.get(sid, {'ts': [], 'min': [], 'max': [], 'last': []})
+        stores[sid] = {'initial': initial.get(sid), **points}
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'bucket_seconds': width_us // 1_000_000,
+        'stores': stores,
+    }
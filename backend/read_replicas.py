@@ -0,0 +1,213 @@
+"""
+Read-replica routing for read-only routes
+DATABASE_READ_URLS is a comma-separated list of replica URLs (Postgres
+streaming replicas or, for tests, SQLite files). Views decorated with
+@read_replica run their queries on a replica picked round-robin. Writes
+(flushes) and every other route stay on the primary.
+
+A replica is checked at most every REPLICA_CHECK_SECONDS on the request path
+with `SELECT 1`, plus its replay lag on Postgres. A replica that fails the
+check, lags more than REPLICA_MAX_LAG_SECONDS or drops a connection mid-query
+is skipped until its next check. With no healthy replica, reads go to the
+primary.
+
+Read-your-writes: after a successful write request the response sets a
+`db_primary_until` cookie, and that client's reads go to the primary for
+REPLICA_STICKY_SECONDS. Keep it at least as long as the allowed lag.
+
+Usage (in main.py):
+    from read_replicas import ReplicaRoutingSession, init_read_replicas, read_replica
+    db = SQLAlchemy(app, session_options={'class_': ReplicaRoutingSession})
+    init_read_replicas(app)
+
+    @app.route('/api/products', methods=['GET'])
+    @retry_transient
+    @read_replica
+    def get_all_products(): ...
+"""
+
+import functools
+import itertools
+import os
+import threading
+import time
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+
+from db_pool import engine_options, normalize_database_url
+from metrics import DB_READ_ROUTING
+
+DATABASE_READ_URLS = [url.strip() for url in os.getenv('DATABASE_READ_URLS', '').split(',') if url.strip()]
+REPLICA_CHECK_SECONDS = float(os.getenv('REPLICA_CHECK_SECONDS', 5))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 10))
+STICKY_COOKIE = 'db_primary_until'
+
+# Zero when the replica has replayed everything it received, else seconds since the last replayed commit
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class Replica:
+    """One read replica with its last health check result"""
+
+    def __init__(self, url):
+        self.url = normalize_database_url(url)
+        self.name = make_url(self.url).render_as_string(hide_password=True)
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        self._engine = None
+        self._engine_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        # One engine per process, created after a gunicorn fork
+        pid = os.getpid()
+        if self._engine is None or self._engine_pid != pid:
+            self._engine = create_engine(self.url, **engine_options(self.url))
+            self._engine_pid = pid
+        return self._engine
+
+    def lag_seconds(self, connection):
+        if connection.dialect.name == 'postgresql':
+            return float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+        return 0.0
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                self.lag = self.lag_seconds(connection)
+            healthy = self.lag <= REPLICA_MAX_LAG_SECONDS
+            if not healthy:
+                print(f"⚠️  Replica {self.name} lags {self.lag:.1f}s, reading from the primary")
+        except Exception as e:
+            healthy = False
+            print(f"⚠️  Replica {self.name} unavailable: {str(e)[:200]}")
+        if healthy and not self.healthy and self.checked_at is not None:
+            print(f"✅ Replica {self.name} back in rotation")
+        self.healthy = healthy
+        self.checked_at = time.monotonic()
+
+    def is_available(self):
+        """Healthy as of the last check, re-checking first if that is older than REPLICA_CHECK_SECONDS"""
+        if self.checked_at is None or time.monotonic() - self.checked_at >= REPLICA_CHECK_SECONDS:
+            # One thread checks; the others use the previous result meanwhile
+            if self._lock.acquire(blocking=self.checked_at is None):
+                try:
+                    self.check()
+                finally:
+                    self._lock.release()
+        return self.healthy
+
+    def mark_down(self):
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+_replicas = []
+_rotation = itertools.count()
+
+
+def set_replicas(urls):
+    """Replace the replica list (init_read_replicas and tests)"""
+    global _replicas
+    _replicas = [Replica(url) for url in urls]
+
+
+def pick_replica():
+    """Next healthy replica in round-robin order, or None to use the primary"""
+    if not _replicas:
+        return None
+    start = next(_rotation)
+    for offset in range(len(_replicas)):
+        replica = _replicas[(start + offset) % len(_replicas)]
+        if replica.is_available():
+            return replica
+    return None
+
+
+def sticky_to_primary():
+    """True while this client is inside its read-your-writes window"""
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRoutingSession(Session):
+    """Flask-SQLAlchemy session that sends reads to the replica chosen for the current view"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            engine = g.get('db_read_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Run a read-only view against a replica when one is healthy and the client hasn't just written"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _replicas:
+            return view(*args, **kwargs)
+        if sticky_to_primary():
+            DB_READ_ROUTING.inc('primary_sticky')
+            return view(*args, **kwargs)
+        replica = pick_replica()
+        if replica is None:
+            DB_READ_ROUTING.inc('primary_fallback')
+            return view(*args, **kwargs)
+        DB_READ_ROUTING.inc('replica')
+        g.db_read_engine = replica.engine
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.pop('db_read_engine', None)
+
+    return wrapper
+
+
+def _mark_sticky(response):
+    if _replicas and request.method in WRITE_METHODS and response.status_code < 400:
+        until = time.time() + REPLICA_STICKY_SECONDS
+        response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=int(REPLICA_STICKY_SECONDS) + 1,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def _handle_error(context):
+    # A replica that drops connections leaves the rotation until its next check
+    if context.is_disconnect and context.engine is not None:
+        for replica in _replicas:
+            if replica._engine is context.engine:
+                replica.mark_down()
+
+
+def init_read_replicas(app, urls=None):
+    """
+    Enable replica routing for @read_replica views
+
+    Args:
+        urls: Replica URLs (default: DATABASE_READ_URLS); empty keeps everything on the primary
+    """
+    set_replicas(DATABASE_READ_URLS if urls is None else urls)
+    app.after_request(_mark_sticky)
+    if not event.contains(Engine, 'handle_error', _handle_error):
+        event.listen(Engine, 'handle_error', _handle_error)
+    if _replicas:
+        print(f"✅ Read replicas: {len(_replicas)} (max lag {REPLICA_MAX_LAG_SECONDS:g}s, "
+              f"read-your-writes {REPLICA_STICKY_SECONDS:g}s)")
+    return app
@@ -0,0 +1,156 @@
+"""
+Per-request response formats: JSON or MessagePack, row or columnar layout
+Clients pick the format with the Accept header:
+    Accept: application/json                        default, unchanged
+    Accept: application/msgpack                     same structure, MessagePack encoded
+    Accept: application/msgpack; layout=columnar    list responses as arrays per field
+    Accept: application/json; layout=columnar       the same in JSON
+
+The columnar layout turns a list of objects into one object of arrays with a
+key per field:
+    [{"id": "a", "price": 1.5}, {"id": "b", "price": 2.0}]
+    -> {"id": ["a", "b"], "price": [1.5, 2.0]}
+Lists of objects directly inside a top-level object (e.g. the "stores" of
+/api/products/{id}/inventory) are converted too. A field missing from some
+rows is null there. Everything else keeps its shape.
+
+The response Content-Type names the format actually used, including
+`layout=columnar`. Without ormsgpack installed, MessagePack is not offered and
+such clients get JSON.
+
+jsonify() negotiates through NegotiatingJSONProvider, so views need no
+changes. Views that return pre-serialized bodies use negotiate() and dumps()
+and keep one cached body per format.
+
+Usage (in main.py):
+    from response_formats import init_response_formats, negotiate, dumps
+    init_response_formats(app)
+"""
+
+from typing import NamedTuple
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import ormsgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    print("⚠️  Warning: ormsgpack not installed. MessagePack responses will be disabled.")
+    print("   Install with: pip install ormsgpack")
+    MSGPACK_AVAILABLE = False
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+class ResponseFormat(NamedTuple):
+    name: str
+    content_type: str
+    msgpack: bool
+    columnar: bool
+
+
+JSON = ResponseFormat('json', 'application/json', False, False)
+JSON_COLUMNAR = ResponseFormat('json-columnar', 'application/json; layout=columnar', False, True)
+MSGPACK = ResponseFormat('msgpack', 'application/msgpack', True, False)
+MSGPACK_COLUMNAR = ResponseFormat('msgpack-columnar', 'application/msgpack; layout=columnar', True, True)
+
+if MSGPACK_AVAILABLE:
+    # Dates go through Flask's default hook, as in JSON; dict keys that aren't strings are allowed like in JSON
+    MSGPACK_OPTIONS = ormsgpack.OPT_PASSTHROUGH_DATETIME | ormsgpack.OPT_NON_STR_KEYS
+
+
+def _parse_media_range(value):
+    """'application/msgpack; layout=columnar' -> ('application/msgpack', {'layout': 'columnar'})"""
+    mimetype, *parameters = [part.strip() for part in value.split(';')]
+    params = {}
+    for parameter in parameters:
+        name, _, param_value = parameter.partition('=')
+        params[name.strip().lower()] = param_value.strip().strip('"').lower()
+    return mimetype.lower(), params
+
+
+def select_format(accept_mimetypes):
+    """
+    Response format for an Accept header
+
+    Args:
+        accept_mimetypes: werkzeug MIMEAccept, sorted best first
+
+    Returns:
+        The first acceptable entry we can produce; JSON for anything else,
+        including no header and */*
+    """
+    for value, quality in accept_mimetypes:
+        if quality <= 0:
+            continue
+        mimetype, params = _parse_media_range(value)
+        columnar = params.get('layout') == 'columnar'
+        if mimetype in MSGPACK_MIMETYPES and MSGPACK_AVAILABLE:
+            return MSGPACK_COLUMNAR if columnar else MSGPACK
+        if mimetype == 'application/json':
+            return JSON_COLUMNAR if columnar else JSON
+        if mimetype in ('*/*', 'application/*'):
+            return JSON
+    return JSON
+
+
+def negotiate():
+    """Format of the current request's response (JSON outside a request)"""
+    if not has_request_context():
+        return JSON
+    fmt = g.get('response_format')
+    if fmt is None:
+        fmt = g.response_format = select_format(request.accept_mimetypes)
+    return fmt
+
+
+def to_columnar(rows):
+    """List of dicts -> dict of lists (keys in order of first appearance); anything else unchanged"""
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return rows
+    keys = {}
+    for row in rows:
+        for key in row:
+            keys.setdefault(key, None)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def columnar(obj):
+    """Columnar layout of a response object: the list itself, or lists one level down in an object"""
+    if isinstance(obj, dict):
+        return {key: to_columnar(value) if isinstance(value, list) else value for key, value in obj.items()}
+    return to_columnar(obj)
+
+
+def dumps(obj, fmt, json_provider):
+    """Serialize a response object in `fmt` (str for JSON, bytes for MessagePack)"""
+    if fmt.columnar:
+        obj = columnar(obj)
+    if fmt.msgpack:
+        return ormsgpack.packb(obj, default=json_provider.default, option=MSGPACK_OPTIONS)
+    return json_provider.dumps(obj)
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """jsonify() that answers in the format the request negotiated"""
+
+    def response(self, *args, **kwargs):
+        fmt = negotiate()
+        if fmt is JSON:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, fmt, self), content_type=fmt.content_type)
+
+
+def _vary_on_accept(response):
+    if response.mimetype == 'application/json' or response.mimetype in MSGPACK_MIMETYPES:
+        response.vary.add('Accept')
+    return response
+
+
+def init_response_formats(app):
+    """Negotiate jsonify() responses and mark them as varying by Accept"""
+    app.json = NegotiatingJSONProvider(app)
+    app.after_request(_vary_on_accept)
+    return app
@@ -0,0 +1,405 @@
+"""
+Catalog snapshot in a memory-mapped file shared by all workers
+With CATALOG_SNAPSHOT_MODE=shared, catalog_snapshot.py writes each catalog
+version once to a single file (in /dev/shm when available) and every gunicorn
+worker maps it read-only, so the catalog costs the same memory for 1 or 8
+workers instead of one Python copy per worker.
+
+File layout (little endian):
+    b'MMCATv2\\0' | uint64 header length | JSON header | sections aligned to 64 bytes
+Sections are NumPy arrays: products and stores as structured arrays whose text
+fields are int32 indexes into a deduplicated UTF-8 string table, sorted id
+indexes for lookups, and the serialized list responses. Rows keep the order of
+the snapshot they were written from (name, id), as in memory mode; per-category
+row lists hold each category's rows as a contiguous range, in the same order.
+
+The file is rebuilt whenever its version differs from the database's, including
+when the counter goes backwards after a reseed or on a fresh database.
+Rebuilds write a temp file and os.replace() it over the old one; workers that
+still map the old file keep reading it until they remap.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from catalog_snapshot import ProductRecord, StoreRecord
+
+MAGIC = b'MMCATv2\0'
+ALIGNMENT = 64
+NO_STRING = -1
+NO_TIME = np.iinfo(np.int64).min
+EPOCH = datetime(1970, 1, 1)
+
+_default_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+SHARED_CATALOG_DIR = os.getenv('SHARED_CATALOG_DIR', _default_dir)
+
+PRODUCT_DTYPE = np.dtype([
+    ('id', '<i4'), ('name', '<i4'), ('brand', '<i4'), ('category', '<i4'), ('image_url', '<i4'),
+    ('description', '<i4'), ('unit', '<i4'), ('created_at', '<i8'),
+])
+STORE_DTYPE = np.dtype([
+    ('id', '<i4'), ('name', '<i4'), ('category', '<i4'), ('address', '<i4'), ('latitude', '<f8'),
+    ('longitude', '<f8'), ('phone', '<i4'), ('image_url', '<i4'), ('created_at', '<i8'),
+])
+
+
+def catalog_path(database_url):
+    """One file per database so several apps on a host don't share a catalog"""
+    digest = hashlib.sha1(str(database_url).encode()).hexdigest()[:10]
+    return os.path.join(SHARED_CATALOG_DIR, f'material_map_catalog-{digest}.bin')
+
+
+# ============ WRITING ============
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        if value is None:
+            return NO_STRING
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+    def arrays(self):
+        encoded = [value.encode('utf-8') for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _micros(value):
+    return NO_TIME if value is None else (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _float(value):
+    return np.nan if value is None else value
+
+
+def _id_index(ids):
+    """Ids as fixed-width bytes in sorted order plus the row each one points to"""
+    encoded = np.array([i.encode() for i in ids], dtype=f'S{max((len(i) for i in ids), default=1)}')
+    order = np.argsort(encoded, kind='stable').astype('<i4')
+    return encoded[order], order
+
+
+def _category_rows(records):
+    """Row numbers grouped by category (keeping row order within each) and each category's range in them"""
+    groups = {}
+    for row, record in enumerate(records):
+        if record.category is not None:
+            groups.setdefault(record.category, []).append(row)
+    rows = []
+    ranges = {}
+    for category, members in groups.items():
+        ranges[category] = [len(rows), len(rows) + len(members)]
+        rows.extend(members)
+    return np.array(rows, dtype='<i4'), ranges
+
+
+def write_catalog_file(path, snapshot, bodies):
+    """
+    Write a catalog snapshot and its serialized responses, replacing path atomically
+
+    Args:
+        snapshot: CatalogSnapshot (anything with version, products and stores)
+        bodies: Dict of response key -> serialized JSON (str or bytes)
+    """
+    strings = _StringTable()
+    products = list(snapshot.products)
+    stores = list(snapshot.stores)
+
+    product_rows = np.array([
+        (strings.add(p.id), strings.add(p.name), strings.add(p.brand), strings.add(p.category),
+         strings.add(p.image_url), strings.add(p.description), strings.add(p.unit), _micros(p.created_at))
+        for p in products
+    ], dtype=PRODUCT_DTYPE)
+    store_rows = np.array([
+        (strings.add(s.id), strings.add(s.name), strings.add(s.category), strings.add(s.address),
+         _float(s.latitude), _float(s.longitude), strings.add(s.phone), strings.add(s.image_url),
+         _micros(s.created_at))
+        for s in stores
+    ], dtype=STORE_DTYPE)
+
+    body_index = {}
+    body_chunks = []
+    position = 0
+    for key, body in bodies.items():
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        body_index[json.dumps(key)] = [position, len(data)]
+        body_chunks.append(data)
+        position += len(data)
+
+    string_offsets, string_data = strings.arrays()
+    product_ids, product_order = _id_index([p.id for p in products])
+    store_ids, store_order = _id_index([s.id for s in stores])
+    product_category_rows, product_categories = _category_rows(products)
+    store_category_rows, store_categories = _category_rows(stores)
+    sections = {
+        'products': product_rows,
+        'stores': store_rows,
+        'string_offsets': string_offsets,
+        'string_data': string_data,
+        'product_ids': product_ids,
+        'product_order': product_order,
+        'store_ids': store_ids,
+        'store_order': store_order,
+        'product_category_rows': product_category_rows,
+        'store_category_rows': store_category_rows,
+        'bodies': np.frombuffer(b''.join(body_chunks), dtype=np.uint8),
+    }
+
+    header = {
+        'version': snapshot.version,
+        'built_at': datetime.utcnow().isoformat(),
+        'product_categories': product_categories,
+        'store_categories': store_categories,
+        'bodies': body_index,
+        'sections': {},
+    }
+    # Offsets are relative to the end of the header, which depends on its own length
+    offset = 0
+    for name, array in sections.items():
+        header['sections'][name] = {
+            'dtype': array.dtype.descr if array.dtype.names else array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in sections.items():
+                f.seek(data_start + header['sections'][name]['offset'])
+                f.write(array.tobytes())
+            # Pad so trailing empty sections still lie inside the mapping
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _align(value):
+    return (value + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def file_version(path):
+    """Catalog version stored in path, or None if missing/unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = struct.unpack('<Q', f.read(8))
+            return json.loads(f.read(length))['version']
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def ensure_catalog_file(path, version, build):
+    """
+    Make sure path holds `version`, building it at most once across workers
+
+    Any other version is rebuilt, not just older ones: the counter starts over
+    after a reseed or on a fresh database.
+
+    Args:
+        build: Called (under an exclusive file lock) to write the file when it is stale
+    """
+    current = file_version(path)
+    if current == version:
+        return
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            current = file_version(path)
+            if current != version:
+                build()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# ============ READING ============
+
+class SharedCatalog:
+    """Read-only mapping of a catalog file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog file")
+        (length,) = struct.unpack_from('<Q', self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[header_start:header_start + length])
+        self.version = self.header['version']
+        data_start = _align(header_start + length)
+
+        self.sections = {}
+        for name, spec in self.header['sections'].items():
+            descr = spec['dtype']
+            dtype = np.dtype([tuple(field) for field in descr] if isinstance(descr, list) else descr)
+            count = int(np.prod(spec['shape']))
+            self.sections[name] = np.frombuffer(
+                self._mm, dtype=dtype, count=count, offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+
+        self._string_offsets = self.sections['string_offsets']
+        self._string_data = self.sections['string_data']
+
+    def string(self, index):
+        if index == NO_STRING:
+            return None
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return self._string_data[start:end].tobytes().decode('utf-8')
+
+    def body(self, key):
+        """Prebuilt response body for key, or None"""
+        entry = self.header['bodies'].get(json.dumps(key))
+        if entry is None:
+            return None
+        start, length = entry
+        return self.sections['bodies'][start:start + length].tobytes()
+
+    def find(self, table, record_id):
+        """Row number of an id in 'products' or 'stores', or None"""
+        ids = self.sections[f'{table[:-1]}_ids']
+        try:
+            encoded = record_id.encode()
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        # Longer ids would be truncated to the column width and could match a prefix
+        if not encoded or len(encoded) > ids.dtype.itemsize:
+            return None
+        key = np.array(encoded, dtype=ids.dtype)
+        position = int(np.searchsorted(ids, key))
+        if position < len(ids) and ids[position] == key:
+            return int(self.sections[f'{table[:-1]}_order'][position])
+        return None
+
+    def product(self, row):
+        r = self.sections['products'][row]
+        return ProductRecord((
+            self.string(r['id']), self.string(r['name']), self.string(r['brand']), self.string(r['category']),
+            self.string(r['image_url']), self.string(r['description']), self.string(r['unit']),
+            _datetime(r['created_at']),
+        ))
+
+    def store(self, row):
+        r = self.sections['stores'][row]
+        return StoreRecord((
+            self.string(r['id']), self.string(r['name']), self.string(r['category']), self.string(r['address']),
+            _optional_float(r['latitude']), _optional_float(r['longitude']), self.string(r['phone']),
+            self.string(r['image_url']), _datetime(r['created_at']),
+        ))
+
+
+def _datetime(micros):
+    return None if micros == NO_TIME else EPOCH + timedelta(microseconds=int(micros))
+
+
+def _optional_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+class RecordView:
+    """Lazy sequence of records over a row range of a shared catalog, optionally through a row list"""
+
+    def __init__(self, catalog, table, start, end, rows=None):
+        self._catalog = catalog
+        self._make = catalog.product if table == 'products' else catalog.store
+        self._start = start
+        self._end = end
+        self._rows = rows
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _row(self, position):
+        return position if self._rows is None else int(self._rows[position])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._make(self._row(self._start + i)) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self._make(self._row(self._start + item))
+
+    def __iter__(self):
+        return (self._make(self._row(position)) for position in range(self._start, self._end))
+
+
+class _CategoryIndex:
+    def __init__(self, catalog, table, ranges):
+        self._catalog = catalog
+        self._table = table
+        self._ranges = ranges
+
+    def get(self, category, default=None):
+        bounds = self._ranges.get(category)
+        if not bounds:
+            return default
+        rows = self._catalog.sections[f'{self._table[:-1]}_category_rows']
+        return RecordView(self._catalog, self._table, *bounds, rows=rows)
+
+    def items(self):
+        return ((category, self.get(category)) for category in self._ranges)
+
+
+class _IdIndex:
+    def __init__(self, catalog, table):
+        self._catalog = catalog
+        self._table = table
+        self._make = catalog.product if table == 'products' else catalog.store
+
+    def get(self, record_id, default=None):
+        row = self._catalog.find(self._table, record_id)
+        return default if row is None else self._make(row)
+
+
+class SharedSnapshot:
+    """CatalogSnapshot interface backed by a SharedCatalog mapping"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        n_products = len(catalog.sections['products'])
+        n_stores = len(catalog.sections['stores'])
+        self.products = RecordView(catalog, 'products', 0, n_products)
+        self.stores = RecordView(catalog, 'stores', 0, n_stores)
+        self.products_by_id = _IdIndex(catalog, 'products')
+        self.stores_by_id = _IdIndex(catalog, 'stores')
+        self.products_by_category = _CategoryIndex(catalog, 'products', catalog.header['product_categories'])
+        self.stores_by_category = _CategoryIndex(catalog, 'stores', catalog.header['store_categories'])
+        self.store_categories = tuple(sorted(c for c in catalog.header['store_categories'] if c))
+        self._responses = {}
+
+    def response(self, key, build):
+        """Prebuilt body from the shared file, else built once in this worker"""
+        body = self.catalog.body(key)
+        if body is None:
+            body = self._responses.get(key)
+            if body is None:
+                body = self._responses[key] = build()
+        return body
@@ -0,0 +1,228 @@
+"""
+Request coalescing (single-flight) and a stale-while-revalidate response cache
+When a product is featured, many clients ask for the same /api/products/<id>
+at once. Views decorated with @coalesce run once per key (endpoint, path and
+query string, response format) in each worker: concurrent identical requests
+wait for the request already running and get a copy of its response.
+
+Successful responses are also kept for RESPONSE_CACHE_SECONDS (default 5).
+After that an entry is stale for up to RESPONSE_CACHE_STALE_SECONDS (default
+30): the first request refreshes it, and requests arriving meanwhile are
+served the stale copy instead of queueing. A cold key therefore costs exactly
+one database load, however many requests arrive together.
+
+A commit that wrote anything clears this worker's cache. Other workers catch
+up within RESPONSE_CACHE_SECONDS. Clients inside their read-your-writes window
+(see read_replicas.py) bypass the cache.
+
+Coalescing needs concurrent requests in one process, so it only takes effect
+with GUNICORN_THREADS > 1. The cache helps either way.
+
+Usage (in main.py):
+    from single_flight import coalesce, init_single_flight
+    init_single_flight(app)
+
+    @app.route('/api/products/<product_id>', methods=['GET'])
+    @coalesce
+    @retry_transient
+    @read_replica
+    def get_product(product_id): ...
+"""
+
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from compression import precompressed
+from metrics import CACHE_REQUESTS
+from read_replicas import sticky_to_primary
+from response_formats import negotiate
+
+RESPONSE_CACHE_SECONDS = float(os.getenv('RESPONSE_CACHE_SECONDS', 5))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv('RESPONSE_CACHE_STALE_SECONDS', 30))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+# Longest a request waits on another one before running the view itself
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', 10))
+
+# Per-entry headers only; CORS, timing and cookies are added per request by after_request hooks
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class FrozenResponse:
+    """Immutable copy of a response that any number of requests can be served from"""
+
+    __slots__ = ('body', 'status', 'headers', 'stored_at', 'serial')
+    _serials = itertools.count()
+
+    def __init__(self, response):
+        self.body = response.get_data()
+        self.status = response.status_code
+        self.headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+        self.stored_at = time.monotonic()
+        # Identifies this body in the compressed-body cache (see compression.py)
+        self.serial = next(self._serials)
+
+    def to_response(self, cache_state):
+        response = current_app.response_class(self.body, status=self.status, headers=self.headers)
+        response.headers['X-Cache'] = cache_state
+        return precompressed(response, ('response', self.serial))
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a function once per key for all callers that arrive while it runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    def do(self, key, fn):
+        """
+        Run fn(), or wait for the call already running under `key`
+
+        Returns:
+            (result, shared): shared is True when another caller ran fn
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(SINGLE_FLIGHT_WAIT_SECONDS):
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            # The leader is stuck; don't let it hold everyone else
+            return fn(), False
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class ResponseCache:
+    """LRU of FrozenResponse by key"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_flight = SingleFlight()
+_cache = ResponseCache()
+
+
+def _reset_after_fork():
+    # A lock held by another thread at fork time would never be released in the child
+    global _flight, _cache
+    _flight = SingleFlight()
+    _cache = ResponseCache()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _load(key, view, args, kwargs):
+    frozen = FrozenResponse(make_response(view(*args, **kwargs)))
+    if frozen.status == 200 and RESPONSE_CACHE_SECONDS > 0:
+        _cache.put(key, frozen)
+    return frozen
+
+
+def coalesce(view):
+    """Share one run of a read-only view between identical concurrent requests, and cache its response"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if sticky_to_primary():
+            return view(*args, **kwargs)
+
+        # One entry per representation: the same URL can be JSON or MessagePack (see response_formats.py)
+        key = (request.endpoint, request.full_path, negotiate().name)
+        entry = _cache.get(key) if RESPONSE_CACHE_SECONDS > 0 else None
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if age < RESPONSE_CACHE_SECONDS:
+                CACHE_REQUESTS.inc('response', 'hit')
+                return entry.to_response('hit')
+            if age < RESPONSE_CACHE_SECONDS + RESPONSE_CACHE_STALE_SECONDS and _flight.in_flight(key):
+                CACHE_REQUESTS.inc('response', 'stale')
+                return entry.to_response('stale')
+
+        frozen, shared = _flight.do(key, lambda: _load(key, view, args, kwargs))
+        CACHE_REQUESTS.inc('response', 'shared' if shared else 'miss')
+        return frozen.to_response('shared' if shared else 'miss')
+
+    return wrapper
+
+
+def _mark_write(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info['response_cache_dirty'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('response_cache_dirty', False):
+        _cache.clear()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('response_cache_dirty', None)
+
+
+def init_single_flight(app):
+    """Clear cached responses when this worker commits a write"""
+    if not event.contains(Session, 'after_flush', _mark_write):
+        event.listen(Session, 'after_flush', _mark_write)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_soft_rollback', _after_rollback)
+    return app
@@ -1,49 +1,432 @@
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET
+"""
+Pluggable object storage for uploaded images
+STORAGE_BACKEND selects where objects go:
+    supabase - Supabase Storage bucket (default)
+    local    - content-addressed files under LOCAL_STORAGE_ROOT, served from /media
+
+The local backend keeps every distinct blob once under .blobs/<hash> (xxhash
+when installed, SHA-256 otherwise) and hard-links the requested keys to it, so
+uploading the same image twice costs no extra disk.
+"""
+
+import contextvars
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from importlib.util import find_spec
 from typing import Optional
-import uuid
 
-# Initialize Supabase client
-supabase: Optional[Client] = None
+from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET
 
-def init_supabase():
-    global supabase
-    if SUPABASE_URL and SUPABASE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return supabase
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
-def upload_image(file_bytes: bytes, file_name: str) -> Optional[str]:
-    """Upload image to Supabase storage and return public URL"""
-    if not supabase:
-        return None
-    
-    try:
-        # Create unique file name
-        unique_name = f"{uuid.uuid4()}_{file_name}"
-        
-        # Upload to Supabase
-        response = supabase.storage.from_(SUPABASE_BUCKET).upload(
-            unique_name, 
-            file_bytes
+# storage3 pulls in httpx (~150 ms of imports), so it is only imported when a client is built
+STORAGE3_AVAILABLE = find_spec("storage3") is not None
+if not STORAGE3_AVAILABLE:
+    print("⚠️  Warning: supabase package not installed. Supabase uploads will be disabled.")
+    print("   Install with: pip install supabase")
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_STORAGE_ROOT = os.path.abspath(os.getenv("LOCAL_STORAGE_ROOT", "media"))
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "")  # e.g. https://material-map.onrender.com/media
+
+# Concurrent requests per batch and keep-alive connections to Supabase per process
+STORAGE_CONCURRENCY = int(os.getenv("STORAGE_CONCURRENCY", 8))
+STORAGE_MAX_CONNECTIONS = int(os.getenv("STORAGE_MAX_CONNECTIONS", 16))
+
+# Object keys embed their content hash, so clients may cache them forever
+IMMUTABLE_CACHE_SECONDS = 31536000
+
+MEDIA_TYPES = {
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+}
+
+
+def new_hasher():
+    """Incremental hasher behind content_hash (update()/hexdigest())"""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128()
+    return hashlib.sha256()
+
+
+def content_hash(data: bytes) -> str:
+    """Hex digest used to address blobs (xxh3-128 when xxhash is installed)"""
+    hasher = new_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """content_hash of a file, read in chunks"""
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class StorageBackend:
+    """Interface implemented by every storage backend"""
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> str:
+        """Store data under key and return its public URL"""
+        raise NotImplementedError
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None,
+                 digest: Optional[str] = None) -> str:
+        """Store the contents of a local file under key without loading it into memory"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def public_url(self, key: str) -> str:
+        raise NotImplementedError
+
+    def put_many(self, items) -> list:
+        """
+        Store several objects concurrently
+
+        Args:
+            items: Iterable of (key, data, content_type)
+
+        Returns:
+            Public URLs in the same order as items
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [self.put(*item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(STORAGE_CONCURRENCY, len(items))) as pool:
+            # Each task runs in a copy of the caller's context (Flask request context included)
+            futures = [pool.submit(contextvars.copy_context().run, self.put, *item) for item in items]
+            return [future.result() for future in futures]
+
+    def delete_many(self, keys) -> bool:
+        """Delete several objects; True if all of them were deleted"""
+        return all([self.delete(key) for key in keys])
+
+
+# Buckets known to exist; survives a fork so workers don't repeat the master's check
+_ready_buckets = set()
+_bucket_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def pooled_client_class():
+    """storage3 client class whose HTTP session keeps a bounded pool of keep-alive connections"""
+    import httpx
+    from storage3 import SyncStorageClient
+    from storage3.utils import SyncClient
+
+    class PooledStorageClient(SyncStorageClient):
+        def _create_session(self, base_url, headers, timeout):
+            return SyncClient(
+                base_url=base_url,
+                headers=headers,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=STORAGE_MAX_CONNECTIONS,
+                    max_keepalive_connections=STORAGE_MAX_CONNECTIONS,
+                ),
+            )
+
+    return PooledStorageClient
+
+
+def create_storage_client(url: str = SUPABASE_URL, key: str = SUPABASE_KEY):
+    """Storage-only Supabase client (skips the auth/postgrest clients create_client builds)"""
+    return pooled_client_class()(
+        f"{url}/storage/v1",
+        {"apiKey": key, "Authorization": f"Bearer {key}"},
+    )
+
+
+class SupabaseBackend(StorageBackend):
+    """Objects in a Supabase Storage bucket"""
+
+    # Storage API accepts this many prefixes per delete request
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, storage_client, bucket: str = SUPABASE_BUCKET):
+        self.storage = storage_client
+        self.bucket = bucket
+
+    def ensure_bucket(self):
+        """Create the bucket if missing; runs once per process instead of once per upload"""
+        if self.bucket in _ready_buckets:
+            return
+        with _bucket_lock:
+            if self.bucket in _ready_buckets:
+                return
+            try:
+                self.storage.get_bucket(self.bucket)
+            except Exception:
+                try:
+                    self.storage.create_bucket(self.bucket, options={"public": True})
+                    print(f"✅ Created storage bucket: {self.bucket}")
+                except Exception as e:
+                    # Leave the flag unset so the next upload checks again
+                    print(f"⚠️  Could not create bucket: {e}")
+                    return
+            _ready_buckets.add(self.bucket)
+
+    def put(self, key, data, content_type=None):
+        self.ensure_bucket()
+        self.storage.from_(self.bucket).upload(
+            path=key,
+            file=data,
+            file_options={
+                "content-type": content_type or "application/octet-stream",
+                "cache-control": str(IMMUTABLE_CACHE_SECONDS),
+                "x-upsert": "true",
+            }
         )
-        
-        # Generate public URL
-        public_url = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(unique_name)
-        return public_url
-    except Exception as e:
-        print(f"Error uploading image: {e}")
+        return self.public_url(key)
+
+    def put_file(self, key, path, content_type=None, digest=None):
+        # storage3 streams file objects in the multipart body
+        with open(path, 'rb') as f:
+            return self.put(key, f, content_type)
+
+    def delete(self, key):
+        return self.delete_many([key])
+
+    def delete_many(self, keys):
+        # One request per DELETE_BATCH_SIZE keys instead of one per object
+        keys = list(keys)
+        bucket = self.storage.from_(self.bucket)
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            bucket.remove(keys[start:start + self.DELETE_BATCH_SIZE])
+        return True
+
+    def public_url(self, key):
+        return f"{SUPABASE_URL}/storage/v1/object/public/{self.bucket}/{key}"
+
+
+class LocalBackend(StorageBackend):
+    """Content-addressed files on local disk (tests and single-node deployments)"""
+
+    BLOB_DIR = '.blobs'
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, base_url: str = LOCAL_STORAGE_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(os.path.join(self.root, self.BLOB_DIR), exist_ok=True)
+
+    def path(self, key: str) -> str:
+        """Absolute path for a key; rejects keys that escape the root or touch blobs"""
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep) or key.startswith(self.BLOB_DIR):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, self.BLOB_DIR, digest[:2], digest)
+
+    def _write_blob(self, digest, source):
+        """Materialize a blob from bytes or a local file path, unless it exists already"""
+        blob = self._blob_path(digest)
+        if os.path.exists(blob):
+            return blob
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob))
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(source, bytes):
+                f.write(source)
+            else:
+                with open(source, 'rb') as src:
+                    shutil.copyfileobj(src, f)
+        os.replace(tmp_path, blob)
+        return blob
+
+    def _link(self, key, digest, source):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        for attempt in range(2):
+            blob = self._write_blob(digest, source)
+            try:
+                if os.path.exists(target) and os.path.samefile(blob, target):
+                    return self.public_url(key)
+                tmp_link = f"{target}.{os.getpid()}.tmp"
+                os.link(blob, tmp_link)
+                os.replace(tmp_link, target)
+                break
+            except FileNotFoundError:
+                # A concurrent delete removed the blob between write and link
+                if attempt:
+                    raise
+        return self.public_url(key)
+
+    def put(self, key, data, content_type=None):
+        return self._link(key, content_hash(data), data)
+
+    def put_file(self, key, path, content_type=None, digest=None):
+        return self._link(key, digest or file_hash(path), path)
+
+    def put_many(self, items):
+        # Local disk has no round trips to overlap
+        return [self.put(*item) for item in items]
+
+    def delete(self, key):
+        target = self.path(key)
+        try:
+            digest = file_hash(target)
+            os.remove(target)
+        except FileNotFoundError:
+            return False
+
+        # Drop the blob once no key links to it any more
+        blob = self._blob_path(digest)
+        try:
+            if os.stat(blob).st_nlink <= 1:
+                os.remove(blob)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def public_url(self, key):
+        base = self.base_url
+        if not base:
+            from flask import has_request_context, request
+            base = f"{request.host_url.rstrip('/')}/media" if has_request_context() else '/media'
+        return f"{base}/{key}"
+
+
+_backend: Optional[StorageBackend] = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+
+def _reset_locks_after_fork():
+    # A thread in the parent (e.g. warm_storage()) may hold these while a worker forks
+    global _backend_lock, _bucket_lock
+    _backend_lock = threading.Lock()
+    _bucket_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def _create_backend() -> Optional[StorageBackend]:
+    if STORAGE_BACKEND == 'local':
+        return LocalBackend()
+    if STORAGE3_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
+        return SupabaseBackend(create_storage_client())
+    return None
+
+
+def get_backend() -> Optional[StorageBackend]:
+    """
+    Process-wide backend chosen by STORAGE_BACKEND (None if Supabase is not configured)
+
+    Built once per process (again after a gunicorn fork) so every upload reuses
+    the same HTTP connection pool.
+    """
+    global _backend, _backend_pid
+    pid = os.getpid()
+    if _backend is None or _backend_pid != pid:
+        with _backend_lock:
+            if _backend is None or _backend_pid != pid:
+                _backend = _create_backend()
+                _backend_pid = pid
+    return _backend
+
+
+def warm_storage():
+    """Create the client and run the bucket check in the background so the first upload doesn't"""
+    def warm():
+        try:
+            backend = get_backend()
+            if isinstance(backend, SupabaseBackend):
+                backend.ensure_bucket()
+        except Exception as e:
+            print(f"⚠️  Storage warm-up failed: {e}")
+
+    threading.Thread(target=warm, name='storage-warmup', daemon=True).start()
+
+
+def init_local_media(app, backend: Optional[StorageBackend] = None):
+    """Serve the local backend's files from /media with immutable cache headers"""
+    backend = backend or (get_backend() if STORAGE_BACKEND == 'local' else None)
+    if not isinstance(backend, LocalBackend):
+        return app
+
+    from flask import abort, send_file
+
+    def media(key):
+        try:
+            path = backend.path(key)
+        except ValueError:
+            abort(404)
+        if not os.path.isfile(path):
+            abort(404)
+        # send_file hands the open file to wsgi.file_wrapper, which gunicorn serves with sendfile()
+        response = send_file(
+            path,
+            mimetype=MEDIA_TYPES.get(key.rsplit('.', 1)[-1].lower()),
+            max_age=IMMUTABLE_CACHE_SECONDS,
+            conditional=True,
+            etag=True,
+        )
+        response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_CACHE_SECONDS}, immutable"
+        return response
+
+    app.add_url_rule('/media/<path:key>', 'media', media, methods=['GET'])
+    return app
+
+
+def upload_image(file, file_name: str = '') -> Optional[str]:
+    """
+    Upload image to the configured storage backend and return public URL
+
+    Args:
+        file: Binary stream (or bytes); read in chunks and validated on the way
+        file_name: Original file name (the stored extension comes from the content)
+
+    Raises:
+        UploadRejected: If the content is not an allowed image or is too large
+    """
+    from uploads import spool_upload
+
+    backend = get_backend()
+    if not backend:
         return None
+    if isinstance(file, bytes):
+        file = io.BytesIO(file)
+
+    with spool_upload(file) as upload:
+        try:
+            # Name by content so re-uploading the same image reuses the same object
+            key = f"uploads/{upload.digest}.{upload.extension}"
+            return backend.put_file(key, upload.path, upload.content_type, upload.digest)
+        except Exception as e:
+            print(f"Error uploading image: {e}")
+            return None
 
 def delete_image(url: str) -> bool:
-    """Delete image from Supabase storage"""
-    if not supabase or not url:
+    """Delete image from the configured storage backend"""
+    backend = get_backend()
+    if not backend or not url:
         return False
-    
+
     try:
-        # Extract file name from URL
-        file_name = url.split("/")[-1]
-        supabase.storage.from_(SUPABASE_BUCKET).remove([file_name])
-        return True
+        # Keys start after the backend's public prefix
+        key = url.split("/uploads/", 1)[-1]
+        return backend.delete(f"uploads/{key}")
     except Exception as e:
         print(f"Error deleting image: {e}")
         return False
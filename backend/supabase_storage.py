@@ -1,39 +1,43 @@
 """
 Supabase Storage Handler for image uploads
 Use this module to upload/delete product and store images to Supabase Storage
+(or to local disk when STORAGE_BACKEND=local, see storage.py)
 """
 
+import contextvars
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Optional
 
+from image_pipeline import (
+    PILLOW_AVAILABLE, ImageDecodeError, process_image, variant_keys, content_type
+)
+from storage import STORAGE3_AVAILABLE, STORAGE_CONCURRENCY, get_backend
+from uploads import ALLOWED_IMAGE_TYPES, UploadRejected, spool_upload
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "material-map")
 
-# Optional: Only import if supabase is installed
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    print("⚠️  Warning: supabase package not installed. File uploads will be disabled.")
-    print("   Install with: pip install supabase")
-    SUPABASE_AVAILABLE = False
-    Client = None
-
 class SupabaseStorage:
-    """Handle file uploads/downloads to Supabase Storage"""
+    """
+    Handle file uploads/downloads to Supabase Storage
     
-    def __init__(self):
-        if not SUPABASE_AVAILABLE:
-            raise Exception("Supabase package not installed. Run: pip install supabase")
-        
-        if not SUPABASE_URL or not SUPABASE_KEY:
+    Cheap to construct: all instances in a process share the client and HTTP
+    connection pool from storage.get_backend(), and the bucket is checked once.
+    """
+    
+    def __init__(self, backend=None):
+        backend = backend or get_backend()
+        if backend is None:
+            if not STORAGE3_AVAILABLE:
+                raise Exception("Supabase package not installed. Run: pip install supabase")
             raise Exception("SUPABASE_URL and SUPABASE_KEY not configured in .env")
         
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        self.backend = backend
         self.bucket_name = SUPABASE_BUCKET
     
     def upload_product_image(self, file, product_id: str) -> Optional[str]:
@@ -45,30 +49,15 @@ class SupabaseStorage:
             product_id: UUID of the product
         
         Returns:
-            Public URL of the uploaded image, or None if failed
+            Public URL of the full-size variant, or None if failed
+        
+        Raises:
+            UploadRejected: If the content is not an allowed image or is too large
         """
         try:
-            # Create bucket if it doesn't exist
-            self._ensure_bucket_exists()
-            
-            # Generate file path
-            file_extension = self._get_file_extension(file.filename)
-            file_path = f"products/{product_id}.{file_extension}"
-            
-            # Upload file
-            response = self.client.storage.from_(self.bucket_name).upload(
-                path=file_path,
-                file=file.stream,
-                file_options={"content-type": file.content_type}
-            )
-            
-            if response:
-                # Return public URL
-                public_url = f"{SUPABASE_URL}/storage/v1/object/public/{self.bucket_name}/{file_path}"
-                return public_url
-            
-            return None
-            
+            return self._upload_variants(file, "products", product_id)
+        except UploadRejected:
+            raise
         except Exception as e:
             print(f"❌ Error uploading product image: {e}")
             return None
@@ -82,30 +71,84 @@ class SupabaseStorage:
             store_id: UUID of the store
         
         Returns:
-            Public URL of the uploaded image, or None if failed
+            Public URL of the full-size variant, or None if failed
+        
+        Raises:
+            UploadRejected: If the content is not an allowed image or is too large
         """
         try:
-            self._ensure_bucket_exists()
-            
-            file_extension = self._get_file_extension(file.filename)
-            file_path = f"stores/{store_id}.{file_extension}"
-            
-            response = self.client.storage.from_(self.bucket_name).upload(
-                path=file_path,
-                file=file.stream,
-                file_options={"content-type": file.content_type}
-            )
-            
-            if response:
-                public_url = f"{SUPABASE_URL}/storage/v1/object/public/{self.bucket_name}/{file_path}"
-                return public_url
-            
-            return None
-            
+            return self._upload_variants(file, "stores", store_id)
+        except UploadRejected:
+            raise
         except Exception as e:
             print(f"❌ Error uploading store image: {e}")
             return None
     
+    def _upload_variants(self, file, folder: str, entity_id: str) -> Optional[str]:
+        """
+        Stream the upload through validation into a temp file, render
+        thumb/card/full variants in WebP and JPEG from it and store them under
+        <folder>/<entity_id>/<digest>/<variant>.<ext>
+        
+        Falls back to storing the original as <folder>/<entity_id>/<digest>/original.<ext>
+        when Pillow is not installed.
+        
+        Raises:
+            UploadRejected: If the content is not an allowed image, is too large,
+                or has an image signature but cannot be decoded (400)
+        """
+        with spool_upload(file.stream) as upload:
+            digest = upload.digest[:16]
+            
+            if not PILLOW_AVAILABLE:
+                file_path = f"{folder}/{entity_id}/{digest}/original.{upload.extension}"
+                return self.backend.put_file(file_path, upload.path, upload.content_type, upload.digest)
+            
+            try:
+                variants = process_image(upload.path)
+            except ImageDecodeError as e:
+                # Bad input from the client, not a storage failure
+                raise UploadRejected("File could not be read as an image (corrupt or truncated)") from e
+        
+        keys = variant_keys(folder, entity_id, digest)
+        # Keys change with the content, so backends serve them as immutable
+        urls = self.backend.put_many(
+            (key, variants[name][extension], content_type(extension))
+            for (name, extension), key in keys.items()
+        )
+        return urls[list(keys).index(("full", "webp"))]
+    
+    def upload_images(self, files: dict, folder: str = "products") -> dict:
+        """
+        Upload images for many entities at once (bulk imports)
+        
+        Images are processed and uploaded concurrently over the shared
+        connection pool; invalid files are reported instead of raised.
+        
+        Args:
+            files: Dict of entity id -> file object
+            folder: "products" or "stores"
+        
+        Returns:
+            Dict of entity id -> public URL of the full-size variant, or an
+            UploadRejected / None if that image failed
+        """
+        def upload(item):
+            entity_id, file = item
+            try:
+                return entity_id, self._upload_variants(file, folder, entity_id)
+            except UploadRejected as e:
+                return entity_id, e
+            except Exception as e:
+                print(f"❌ Error uploading {folder} image {entity_id}: {e}")
+                return entity_id, None
+        
+        if not files:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(STORAGE_CONCURRENCY, len(files))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, upload, item) for item in files.items()]
+            return dict(future.result() for future in futures)
+    
     def delete_image(self, file_path: str) -> bool:
         """
         Delete image from Supabase Storage
@@ -117,27 +160,23 @@ class SupabaseStorage:
             True if deleted, False if failed
         """
         try:
-            self.client.storage.from_(self.bucket_name).remove([file_path])
-            return True
+            return self.backend.delete(file_path)
         except Exception as e:
             print(f"❌ Error deleting image: {e}")
             return False
     
-    def _ensure_bucket_exists(self):
-        """Create bucket if it doesn't exist"""
+    def delete_images(self, file_paths: list) -> bool:
+        """
+        Delete many images in as few requests as the backend allows
+        
+        Returns:
+            True if deleted, False if failed
+        """
         try:
-            # Try to get bucket metadata
-            self.client.storage.get_bucket(self.bucket_name)
-        except Exception:
-            # Bucket doesn't exist, create it
-            try:
-                self.client.storage.create_bucket(
-                    self.bucket_name,
-                    options={"public": True}
-                )
-                print(f"✅ Created storage bucket: {self.bucket_name}")
-            except Exception as e:
-                print(f"⚠️  Could not create bucket: {e}")
+            return self.backend.delete_many(file_paths)
+        except Exception as e:
+            print(f"❌ Error deleting images: {e}")
+            return False
     
     @staticmethod
     def _get_file_extension(filename: str) -> str:
@@ -149,7 +188,10 @@ class SupabaseStorage:
     @staticmethod
     def validate_image_file(file) -> tuple[bool, str]:
         """
-        Validate image file
+        Cheap checks before the upload is streamed
+        
+        Content type and size are enforced chunk by chunk while uploading
+        (see uploads.py), so this never reads the file.
         
         Returns:
             (is_valid, error_message)
@@ -158,20 +200,11 @@ class SupabaseStorage:
             return False, "No file provided"
         
         # Check file extension
-        allowed_extensions = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+        allowed_extensions = set(ALLOWED_IMAGE_TYPES) | {'jpeg'}
         extension = SupabaseStorage._get_file_extension(file.filename).lower()
         
         if extension not in allowed_extensions:
-            return False, f"File type not allowed. Allowed: {', '.join(allowed_extensions)}"
-        
-        # Check file size (max 5MB)
-        file.stream.seek(0, 2)  # Seek to end
-        file_size = file.stream.tell()
-        file.stream.seek(0)  # Reset to beginning
-        
-        max_size = 5 * 1024 * 1024  # 5MB
-        if file_size > max_size:
-            return False, f"File too large. Max size: 5MB (Got: {file_size / 1024 / 1024:.2f}MB)"
+            return False, f"File type not allowed. Allowed: {', '.join(sorted(allowed_extensions))}"
         
         return True, ""
 
@@ -0,0 +1,123 @@
+"""
+Incremental table row counts for /api/status
+Keeps one row per tracked table in `table_row_count`, adjusted in the same
+transaction as the ORM inserts/deletes that change it, so status checks read
+four numbers instead of running COUNT(*) over every table.
+
+Rows written outside the ORM (bulk loads, raw SQL) are picked up by recount().
+A missing counter row is initialized lazily with an exact COUNT(*); when two
+workers do that at once, the one that loses the insert reads the winner's row.
+"""
+
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+_db = None
+_counter_model = None
+_tracked = {}  # table name -> model
+
+
+def init_table_stats(db, counter_model, models):
+    """Track row counts for the given models using counter_model as storage"""
+    global _db, _counter_model
+    _db = db
+    _counter_model = counter_model
+    _tracked.clear()
+    _tracked.update({model.__table__.name: model for model in models})
+
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_bulk_delete', _after_bulk_delete)
+
+
+def _after_flush(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        name = getattr(obj, '__tablename__', None)
+        if name in _tracked:
+            deltas[name] = deltas.get(name, 0) + 1
+    for obj in session.deleted:
+        name = getattr(obj, '__tablename__', None)
+        if name in _tracked:
+            deltas[name] = deltas.get(name, 0) - 1
+    if not deltas:
+        return
+
+    table = _counter_model.__table__
+    connection = session.connection()
+    for name, delta in deltas.items():
+        # No counter row yet means it gets initialized with COUNT(*) on the next read
+        connection.execute(
+            table.update()
+            .where(table.c.table_name == name)
+            .values(row_count=table.c.row_count + delta)
+        )
+
+
+def _after_bulk_delete(delete_context):
+    entity = delete_context.query.column_descriptions[0].get('entity')
+    name = getattr(entity, '__tablename__', None)
+    if name not in _tracked:
+        return
+
+    table = _counter_model.__table__
+    rowcount = delete_context.result.rowcount
+    connection = delete_context.session.connection()
+    if rowcount is None or rowcount < 0:
+        # Driver can't tell how many rows went away; recount on next read
+        connection.execute(table.delete().where(table.c.table_name == name))
+    else:
+        connection.execute(
+            table.update()
+            .where(table.c.table_name == name)
+            .values(row_count=table.c.row_count - rowcount)
+        )
+
+
+def get_counts(exact=False):
+    """
+    Row counts for all tracked tables
+
+    Args:
+        exact: Run COUNT(*) on every table and repair the stored counters
+
+    Returns:
+        Dict of table name -> row count
+    """
+    session = _db.session
+    table = _counter_model.__table__
+
+    if exact:
+        stored = {}
+    else:
+        stored = dict(session.execute(select(table.c.table_name, table.c.row_count)).all())
+
+    missing = [name for name in _tracked if name not in stored]
+    if missing:
+        for name in missing:
+            stored[name] = session.execute(select(func.count()).select_from(_tracked[name])).scalar()
+        try:
+            for name in missing:
+                session.merge(_counter_model(table_name=name, row_count=stored[name]))
+            session.commit()
+        except IntegrityError:
+            # Another worker initialized the same counters first; use what it stored
+            session.rollback()
+            stored.update(session.execute(select(table.c.table_name, table.c.row_count)).all())
+
+    return {name: stored[name] for name in _tracked}
+
+
+def recount(connection=None):
+    """Recompute every counter with COUNT(*) (use after bulk loads or raw SQL writes)"""
+    table = _counter_model.__table__
+    if connection is None:
+        return get_counts(exact=True)
+
+    counts = {}
+    for name, model in _tracked.items():
+        counts[name] = connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+        connection.execute(table.delete().where(table.c.table_name == name))
+        connection.execute(table.insert().values(table_name=name, row_count=counts[name]))
+    return counts
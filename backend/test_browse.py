@@ -0,0 +1,45 @@
+"""
+Facet counts of /api/products/browse
+Runs main.py's app against a fresh SQLite file (see conftest.py).
+"""
+
+import pytest
+
+from models import db, InventoryItem, Product, Store
+
+
+@pytest.fixture
+def catalog(main_app):
+    with main_app.app_context():
+        db.session.add_all([
+            Product(id='p1', name='Rice', brand='Farm', category='grains'),
+            Product(id='p2', name='Oil', brand='Press', category='oils'),
+            Product(id='p3', name='Saffron', brand='Farm', category='spices'),
+            Store(id='s1', name='Corner Shop', category='grocery', address='1 Main Road'),
+            InventoryItem(id='i1', product_id='p1', store_id='s1', price=45.0, quantity=3),
+            InventoryItem(id='i2', product_id='p2', store_id='s1', price=180.0, quantity=1),
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def price_counts(body):
+    return {bucket['value']: bucket['count'] for bucket in body['facets']['price']}
+
+
+def test_unstocked_product_is_in_no_price_bucket(client, catalog):
+    body = client.get('/api/products/browse').get_json()
+
+    # p3 has no offers: it is listed and counted, but has no price to bucket
+    assert body['total'] == 3
+    assert sum(price_counts(body).values()) == 2
+    assert price_counts(body) == {'0-50': 1, '50-100': 0, '100-250': 1, '250-500': 0, '500-1000': 0, '1000+': 0}
+    assert client.get('/api/products/browse?min_price=1000').get_json()['total'] == 0
+
+
+def test_offer_filters_drop_unstocked_products(client, catalog):
+    body = client.get('/api/products/browse?brand=Farm&in_stock=true').get_json()
+
+    assert [p['id'] for p in body['products']] == ['p1']
+    assert price_counts(body)['0-50'] == 1
+    assert sum(price_counts(body).values()) == 1
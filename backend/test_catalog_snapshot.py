@@ -0,0 +1,123 @@
+"""
+Per-worker catalog snapshots from catalog_snapshot.py
+Runs the shared models against a fresh SQLite file: building a snapshot,
+polling the version counter, and the version bumps that make the next read
+see a write.
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import select, text
+
+import catalog_snapshot
+from catalog_snapshot import bump_version, get_catalog, init_catalog
+from models import db, CatalogVersion, Product, Store
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, 'CATALOG_SNAPSHOT_MODE', 'memory')
+    monkeypatch.setattr(catalog_snapshot, 'CATALOG_POLL_SECONDS', 60)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    db.init_app(app)
+    init_catalog(db, CatalogVersion, Product, Store)
+    catalog_snapshot.reset_catalog()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Product(id='p1', name='Rice', brand='Farm', category='grains'),
+            Product(id='p2', name='Apples', brand='Orchard', category='fruit'),
+            Store(id='s1', name='Corner Shop', category='grocery', address='1 Main Road'),
+            Store(id='s2', name='Pen Point', category='stationery', address='2 Main Road'),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+    catalog_snapshot.reset_catalog()
+
+
+def version():
+    return db.session.execute(select(CatalogVersion.version)).scalar()
+
+
+def names(records):
+    return [record.name for record in records]
+
+
+def test_snapshot_holds_the_catalog(app):
+    catalog = get_catalog()
+
+    assert catalog.version == version()
+    assert names(catalog.products) == ['Apples', 'Rice']
+    assert catalog.products_by_id['p1'].brand == 'Farm'
+    assert names(catalog.products_by_category['grains']) == ['Rice']
+    assert catalog.stores_by_id['s2'].name == 'Pen Point'
+    assert catalog.store_categories == ('grocery', 'stationery')
+    assert catalog.response('products', lambda: 'built') == 'built'
+    assert catalog.response('products', lambda: 'rebuilt') == 'built'
+    with pytest.raises(AttributeError):
+        catalog.products[0].name = 'Changed'
+
+
+def test_snapshot_is_reused_until_the_version_moves(app, monkeypatch):
+    catalog = get_catalog()
+    assert get_catalog() is catalog
+
+    # Written by another worker: this one only notices when it next polls
+    db.session.execute(text("UPDATE product SET name = 'Basmati Rice' WHERE id = 'p1'"))
+    bump_version(db.session.connection())
+    db.session.commit()
+    assert get_catalog() is catalog
+
+    monkeypatch.setattr(catalog_snapshot, 'CATALOG_POLL_SECONDS', 0)
+    reloaded = get_catalog()
+    assert reloaded.version == catalog.version + 1
+    assert reloaded.products_by_id['p1'].name == 'Basmati Rice'
+    # Polling an unchanged version keeps the snapshot
+    assert get_catalog() is reloaded
+
+
+def test_orm_write_is_seen_by_the_next_read(app):
+    catalog = get_catalog()
+
+    db.session.get(Product, 'p1').name = 'Basmati Rice'
+    db.session.add(Store(id='s3', name='Home Needs', category='household', address='3 Main Road'))
+    db.session.commit()
+
+    # Within the poll interval: the commit itself invalidates this worker's snapshot
+    reloaded = get_catalog()
+    assert reloaded.version == catalog.version + 1 == version()
+    assert reloaded.products_by_id['p1'].name == 'Basmati Rice'
+    assert reloaded.store_categories == ('grocery', 'household', 'stationery')
+
+
+def test_bulk_delete_bumps_the_version(app):
+    catalog = get_catalog()
+
+    db.session.query(Product).filter(Product.category == 'fruit').delete()
+    db.session.commit()
+
+    assert names(get_catalog().products) == ['Rice']
+    assert get_catalog().version == catalog.version + 1
+
+
+def test_unrelated_and_rolled_back_writes_keep_the_version(app):
+    before = get_catalog().version
+
+    db.session.get(Product, 'p1').name = 'Basmati Rice'
+    db.session.flush()
+    db.session.rollback()
+    db.session.get(Product, 'p1').name = 'Rice'  # unchanged value
+    db.session.commit()
+
+    assert version() == before
+    assert get_catalog().products_by_id['p1'].name == 'Rice'
+
+
+def test_fresh_counter_does_not_restart_at_one(app):
+    db.session.execute(CatalogVersion.__table__.delete())
+    bump_version(db.session.connection())
+    db.session.commit()
+
+    assert version() > 1
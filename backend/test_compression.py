@@ -0,0 +1,160 @@
+"""
+Accept-Encoding negotiation and the compressed-body cache of compression.py
+The app has routes written like the ones in main.py: a jsonify() list, a small
+detail object, a catalog-style body marked with precompressed() and a
+@coalesce view. Every encoded body must decompress to the uncompressed JSON.
+"""
+
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+import compression
+import single_flight
+from compression import init_compression, precompressed
+from single_flight import coalesce
+
+ITEMS = [{'id': f'item-{i}', 'name': f'Product {i}', 'price': 10.5 + i, 'category': 'grains'} for i in range(200)]
+GZIP = {'Accept-Encoding': 'gzip'}
+ZSTD = {'Accept-Encoding': 'zstd'}
+
+
+@pytest.fixture
+def client():
+    single_flight._cache.clear()
+    compression._reset_after_fork()
+    app = Flask(__name__)
+    init_compression(app)
+    state = {'version': 1}
+
+    @app.route('/api/inventory', methods=['GET'])
+    def get_all_inventory():
+        return jsonify(ITEMS)
+
+    @app.route('/api/inventory/<item_id>', methods=['GET'])
+    def get_inventory_item(item_id):
+        return jsonify(ITEMS[0])
+
+    @app.route('/api/products', methods=['GET'])
+    def get_all_products():
+        response = jsonify(ITEMS[:150] if state['version'] == 1 else ITEMS)
+        return precompressed(response, ('catalog', state['version'], 'products'))
+
+    @app.route('/api/products/<product_id>/inventory', methods=['GET'])
+    @coalesce
+    def get_product_prices(product_id):
+        return jsonify({'product_id': product_id, 'stores': ITEMS})
+
+    client = app.test_client()
+    client.state = state
+    return client
+
+
+@pytest.fixture
+def encode_calls(monkeypatch):
+    """Count real encodes per encoding"""
+    calls = []
+    for name, (encode, level, cached_level) in list(compression.ENCODERS.items()):
+        def counted(data, level, name=name, encode=encode):
+            calls.append(name)
+            return encode(data, level)
+        monkeypatch.setitem(compression.ENCODERS, name, (counted, level, cached_level))
+    return calls
+
+
+def test_gzip_matches_uncompressed_json(client):
+    plain = client.get('/api/inventory')
+    response = client.get('/api/inventory', headers=GZIP)
+
+    assert 'Content-Encoding' not in plain.headers
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_zstd_matches_uncompressed_json(client):
+    zstandard = pytest.importorskip('zstandard')
+    plain = client.get('/api/inventory')
+    response = client.get('/api/inventory', headers=ZSTD)
+
+    assert response.headers['Content-Encoding'] == 'zstd'
+    assert zstandard.ZstdDecompressor().decompress(response.data) == plain.data
+
+
+def test_best_supported_encoding_is_chosen(client):
+    pytest.importorskip('zstandard')
+
+    def encoding(accept):
+        return client.get('/api/inventory', headers={'Accept-Encoding': accept}).headers.get('Content-Encoding')
+
+    assert encoding('gzip, deflate, zstd') == 'zstd'
+    assert encoding('zstd;q=0.5, gzip') == 'gzip'
+    assert encoding('deflate') is None
+    assert encoding('identity') is None
+
+
+def test_responses_vary_by_accept_encoding(client):
+    for path, headers in (('/api/inventory', GZIP), ('/api/inventory', {}), ('/api/inventory/item-0', GZIP)):
+        assert 'Accept-Encoding' in client.get(path, headers=headers).vary
+
+
+def test_small_bodies_are_sent_as_they_are(client, monkeypatch):
+    small = client.get('/api/inventory/item-0', headers=GZIP)
+    assert len(small.data) < compression.COMPRESSION_MIN_BYTES
+    assert 'Content-Encoding' not in small.headers
+    assert small.get_json() == ITEMS[0]
+
+    large = client.get('/api/inventory')
+    monkeypatch.setattr(compression, 'COMPRESSION_MIN_BYTES', len(large.data) + 1)
+    assert 'Content-Encoding' not in client.get('/api/inventory', headers=GZIP).headers
+    monkeypatch.setattr(compression, 'COMPRESSION_MIN_BYTES', len(large.data))
+    assert client.get('/api/inventory', headers=GZIP).headers['Content-Encoding'] == 'gzip'
+
+
+def test_precompressed_body_is_encoded_once_per_key(client, encode_calls):
+    plain = client.get('/api/products')
+    first = client.get('/api/products', headers=GZIP)
+    second = client.get('/api/products', headers=GZIP)
+
+    assert encode_calls == ['gzip']
+    assert second.data == first.data
+    assert gzip.decompress(second.data) == plain.data
+    assert compression._cache.get((('catalog', 1, 'products'), 'gzip')) == first.data
+
+    # A new version is a new key, so the changed body is encoded again
+    client.state['version'] = 2
+    changed = client.get('/api/products', headers=GZIP)
+    assert encode_calls == ['gzip', 'gzip']
+    assert gzip.decompress(changed.data) == client.get('/api/products').data
+
+
+def test_uncached_bodies_are_encoded_every_time(client, encode_calls):
+    client.get('/api/inventory', headers=GZIP)
+    client.get('/api/inventory', headers=GZIP)
+
+    assert encode_calls == ['gzip', 'gzip']
+    assert len(compression._cache) == 0
+
+
+def test_coalesced_responses_reuse_their_encoding(client, encode_calls):
+    path = '/api/products/p1/inventory'
+    miss = client.get(path, headers=GZIP)
+    hit = client.get(path, headers=GZIP)
+
+    assert (miss.headers['X-Cache'], hit.headers['X-Cache']) == ('miss', 'hit')
+    assert encode_calls == ['gzip']
+    assert hit.data == miss.data
+    assert gzip.decompress(hit.data) == client.get(path).data
+
+
+def test_encoded_body_cache_is_bounded():
+    cache = compression.EncodedBodyCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    cache.put('c', b'123')
+    cache.put('huge', b'x' * 11)
+
+    assert cache.get('a') is None
+    assert (cache.get('b'), cache.get('c'), cache.get('huge')) == (b'12345', b'123', None)
+    assert cache.size == 8
@@ -0,0 +1,191 @@
+"""
+Retry behaviour of db_retry.retry_transient against a fault-injecting database proxy
+The proxy sits between SQLAlchemy and SQLite and, on request, breaks the next
+statement the way a flaky network database would: the connection drops mid-request,
+the server reports a serialization failure, or the SSL stream ends.
+"""
+
+import random
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+import db_retry
+from db_retry import backoff_delays, init_db_retry, is_transient, retry_transient
+
+
+class InjectedDatabaseError(sqlite3.OperationalError):
+    """DBAPI error carrying a Postgres SQLSTATE, like psycopg raises"""
+
+    def __init__(self, message, sqlstate=None):
+        super().__init__(message)
+        self.sqlstate = sqlstate
+
+
+class FaultInjectingProxy:
+    """Hands out SQLite connections whose next statements fail as scripted"""
+
+    def __init__(self, path):
+        self.path = path
+        self.faults = []
+        self.statements = 0
+        self.connections = 0
+
+    def inject(self, *faults):
+        self.faults.extend(faults)
+
+    def connect(self):
+        self.connections += 1
+        return ProxyConnection(self, sqlite3.connect(self.path, check_same_thread=False))
+
+
+class ProxyConnection:
+    def __init__(self, proxy, connection):
+        object.__setattr__(self, '_proxy', proxy)
+        object.__setattr__(self, '_connection', connection)
+
+    def cursor(self, *args):
+        return ProxyCursor(self, self._connection.cursor(*args))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+class ProxyCursor:
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    def execute(self, statement, *args):
+        proxy = self._connection._proxy
+        proxy.statements += 1
+        if proxy.faults:
+            fault = proxy.faults.pop(0)
+            if fault == 'reset':
+                # Like a dropped TCP connection: this and every later call on it fails
+                self._connection._connection.close()
+            elif fault == 'serialization':
+                raise InjectedDatabaseError('could not serialize access due to concurrent update', '40001')
+            elif fault == 'ssl_eof':
+                raise InjectedDatabaseError('SSL SYSCALL error: EOF detected')
+            elif fault == 'syntax':
+                raise InjectedDatabaseError('syntax error at or near "SELEC"', '42601')
+        return self._cursor.execute(statement, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+@pytest.fixture
+def proxied_app(tmp_path, monkeypatch):
+    """Flask app with one read route written like the ones in main.py"""
+    monkeypatch.setattr(db_retry, 'DB_RETRY_BASE_DELAY', 0.001)
+    monkeypatch.setattr(db_retry, 'DB_RETRY_MAX_DELAY', 0.01)
+
+    path = tmp_path / 'proxied.db'
+    with sqlite3.connect(path) as setup:
+        setup.execute('CREATE TABLE product (id TEXT PRIMARY KEY, name TEXT)')
+        setup.execute("INSERT INTO product VALUES ('p1', 'Rice')")
+    proxy = FaultInjectingProxy(str(path))
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'creator': proxy.connect}
+    db = SQLAlchemy(app)
+    init_db_retry(db)
+    calls = []
+
+    @app.route('/api/products', methods=['GET'])
+    @retry_transient
+    def get_all_products():
+        calls.append(time.monotonic())
+        try:
+            rows = db.session.execute(text('SELECT id, name FROM product')).all()
+            return jsonify([{'id': row.id, 'name': row.name} for row in rows])
+        except Exception as e:
+            return jsonify({'detail': str(e)}), 500
+
+    return app, proxy, calls
+
+
+@pytest.mark.parametrize('fault', ['reset', 'serialization', 'ssl_eof'])
+def test_transient_fault_is_retried(proxied_app, fault):
+    app, proxy, calls = proxied_app
+    proxy.inject(fault)
+
+    response = app.test_client().get('/api/products')
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'id': 'p1', 'name': 'Rice'}]
+    assert len(calls) == 2
+
+
+def test_dropped_connection_is_replaced(proxied_app):
+    app, proxy, calls = proxied_app
+    client = app.test_client()
+    client.get('/api/products')
+    connections = proxy.connections
+
+    proxy.inject('reset')
+    assert client.get('/api/products').status_code == 200
+    assert proxy.connections == connections + 1
+
+
+def test_permanent_error_is_not_retried(proxied_app):
+    app, proxy, calls = proxied_app
+    proxy.inject('syntax')
+
+    response = app.test_client().get('/api/products')
+
+    assert response.status_code == 500
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_attempts(proxied_app):
+    app, proxy, calls = proxied_app
+    proxy.inject(*['serialization'] * 10)
+
+    response = app.test_client().get('/api/products')
+
+    assert response.status_code == 500
+    assert len(calls) == db_retry.DB_RETRY_ATTEMPTS
+
+
+def test_deadline_stops_retries(proxied_app, monkeypatch):
+    app, proxy, calls = proxied_app
+    monkeypatch.setattr(db_retry, 'DB_RETRY_ATTEMPTS', 100)
+    monkeypatch.setattr(db_retry, 'DB_RETRY_DEADLINE', 0.1)
+    proxy.inject(*['serialization'] * 1000)
+
+    started = time.monotonic()
+    response = app.test_client().get('/api/products')
+
+    assert response.status_code == 500
+    assert time.monotonic() - started < 0.1 + db_retry.DB_RETRY_MAX_DELAY + 0.05
+    assert 1 < len(calls) < 100
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    delays = backoff_delays(base=0.05, cap=1.0, rng=random.Random(7))
+    previous = 0.05
+    for _ in range(200):
+        delay = next(delays)
+        assert 0.05 <= delay <= min(1.0, previous * 3)
+        previous = delay
+
+
+def test_pool_timeout_is_not_transient():
+    from sqlalchemy import exc as sa_exc
+
+    assert not is_transient(sa_exc.TimeoutError('QueuePool limit reached'))
+    assert is_transient(ConnectionResetError(104, 'Connection reset by peer'))
@@ -0,0 +1,23 @@
+"""
+Health endpoints of main.py answer without touching the database
+Runs main.py's app (see conftest.py) as if no request had migrated it yet.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def migrations(main_module, monkeypatch):
+    calls = []
+    monkeypatch.delattr(main_module.init_db_tables, 'executed')
+    monkeypatch.setattr(main_module, 'migrate', lambda engine: calls.append(engine))
+    return calls
+
+
+def test_health_probes_skip_the_migration(client, migrations):
+    for path in ('/health', '/api/health', '/'):
+        assert client.get(path).status_code == 200
+    assert migrations == []
+
+    client.get('/api/status')
+    assert len(migrations) == 1
@@ -0,0 +1,25 @@
+"""
+Cold-start import budget
+Fails when `import main` gets slower than IMPORT_BUDGET_MS (default 800) or when
+a dependency that is only needed on rare paths is imported eagerly again.
+Run `python import_report.py` to see where the time goes.
+"""
+
+from import_report import IMPORT_BUDGET_MS, measure_imports
+
+# Only needed for uploads (Supabase client, image resizing) or shared catalog mode
+DEFERRED_MODULES = ('httpx', 'storage3', 'supabase', 'PIL', 'numpy')
+
+
+def test_app_import_within_budget():
+    report = measure_imports('main', repeat=3)
+    assert report.total_ms <= IMPORT_BUDGET_MS, (
+        f"import main took {report.total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms); "
+        f"slowest: {[t.name for t in report.slowest(5)]}"
+    )
+
+
+def test_rarely_used_dependencies_are_deferred():
+    report = measure_imports('main')
+    eager = sorted(name for name in DEFERRED_MODULES if name in report.modules)
+    assert not eager, f"imported at startup: {eager}"
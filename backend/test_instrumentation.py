@@ -0,0 +1,49 @@
+"""
+Query timing kept by instrumentation.py on pooled connections
+The app has a route written like the ones in main.py whose first statement
+fails, against a SQLite file served from a single pooled connection.
+"""
+
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+
+from instrumentation import init_instrumentation
+
+
+@pytest.fixture
+def app_db(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'instrumentation.db'}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': StaticPool}
+    db = SQLAlchemy(app)
+    init_instrumentation(app)
+
+    @app.route('/api/report', methods=['GET'])
+    def report():
+        try:
+            rows = db.session.execute(text('SELECT * FROM missing_table')).all()
+        except Exception as e:
+            db.session.rollback()
+            rows = db.session.execute(text('SELECT 1')).all()
+            return jsonify({'detail': 'Fell back', 'error': str(e), 'rows': len(rows)})
+        return jsonify({'rows': len(rows)})
+
+    return app, db
+
+
+def test_failed_statements_leave_no_start_times(app_db):
+    app, db = app_db
+    client = app.test_client()
+
+    for _ in range(5):
+        response = client.get('/api/report')
+        assert response.get_json()['detail'] == 'Fell back'
+        # The failed statement is still counted as a query
+        assert '2 queries' in response.headers['Server-Timing']
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            assert connection.info.get('query_start_time') == []
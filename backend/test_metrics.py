@@ -0,0 +1,74 @@
+"""
+Concurrent flushes of the per-worker metrics file
+Every GET /metrics flushes this process's snapshot before merging, so request
+threads and the background flush thread write the same file at once.
+"""
+
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+import metrics
+from metrics import Counter, Registry
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    return tmp_path
+
+
+def run_threads(target, threads=8):
+    errors = []
+
+    def worker():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return errors
+
+
+def test_concurrent_flushes_do_not_collide(metrics_dir):
+    registry = Registry()
+    counter = Counter(registry, 'test_flushes_total', 'Flushes')
+
+    def flush_many():
+        for _ in range(50):
+            counter.inc()
+            registry.flush()
+
+    assert run_threads(flush_many) == []
+    assert [path.name for path in metrics_dir.iterdir()] == [f"{os.getpid()}.json"]
+
+
+def test_concurrent_scrapes_all_succeed(metrics_dir):
+    app = Flask(__name__)
+    app.add_url_rule('/metrics', 'metrics', metrics.metrics_endpoint, methods=['GET'])
+    statuses = []
+
+    def scrape():
+        client = app.test_client()
+        for _ in range(50):
+            statuses.append(client.get('/metrics').status_code)
+
+    assert run_threads(scrape) == []
+    assert statuses == [200] * 400
+
+
+def test_scrape_ignores_files_that_are_not_worker_snapshots(metrics_dir):
+    for name in ('backup.json', '.1234.json.swp', 'copy of 1234.json', 'notes.txt'):
+        (metrics_dir / name).write_text('{}')
+
+    app = Flask(__name__)
+    app.add_url_rule('/metrics', 'metrics', metrics.metrics_endpoint, methods=['GET'])
+    assert app.test_client().get('/metrics').status_code == 200
+    assert (metrics_dir / 'backup.json').exists()
@@ -0,0 +1,162 @@
+"""
+Price anomaly detection from price_anomalies.py and the /api/deals flag filter
+detect() runs on small hand-built offer sets; the deals tests run main.py's app
+against a fresh SQLite file (see conftest.py).
+"""
+
+import pytest
+from sqlalchemy import select
+
+pytest.importorskip('numpy')
+
+import price_anomalies
+from models import db, InventoryItem, PriceFlag, Product, Store
+from price_anomalies import OfferArrays, detect
+
+
+def flagged(rows):
+    """Flag -> ids of the offers carrying it"""
+    offers = OfferArrays(rows)
+    return {flag: sorted(offers.ids[i] for i in indexes) for flag, (indexes, _, _) in detect(offers).items()}
+
+
+def regular(product_id, price, count, prefix='r'):
+    return [(f'{prefix}{n}', product_id, price, None, 0) for n in range(count)]
+
+
+def test_discount_consistency_flags():
+    flags = flagged([
+        ('fine', 'p1', 80.0, 100.0, 20),
+        ('rounded', 'p1', 79.5, 100.0, 20),
+        ('no_original', 'p1', 80.0, None, 20),
+        ('original_below_price', 'p1', 80.0, 70.0, 20),
+        ('mismatch', 'p1', 90.0, 100.0, 20),
+        ('no_discount', 'p1', 80.0, 100.0, 0),
+    ])
+
+    assert flags['discount_without_original'] == ['no_original', 'original_below_price']
+    assert flags['discount_mismatch'] == ['mismatch']
+
+
+def test_price_outliers_against_other_offers():
+    flags = flagged(regular('p1', 100.0, 6) + [
+        ('near', 'p1', 110.0, None, 0),
+        ('high', 'p1', 400.0, None, 0),
+        ('low', 'p1', 20.0, None, 0),
+        ('inflated', 'p1', 150.0, 300.0, 50),
+    ])
+
+    assert flags['price_outlier_high'] == ['high']
+    assert flags['price_outlier_low'] == ['low']
+    assert flags['original_price_inflated'] == ['inflated']
+    assert flags['discount_mismatch'] == []
+
+
+def test_outliers_when_most_offers_share_one_price():
+    # MAD is 0 here; the outliers must not widen the scale and hide each other
+    assert flagged(regular('p1', 100.0, 6) + [('a', 'p1', 20.0, None, 0), ('b', 'p1', 25.0, None, 0)])[
+        'price_outlier_low'] == ['a', 'b']
+    flags = flagged(regular('p1', 100.0, 6) + [('high', 'p1', 400.0, None, 0), ('low', 'p1', 20.0, None, 0)])
+    assert (flags['price_outlier_high'], flags['price_outlier_low']) == (['high'], ['low'])
+
+
+def test_spread_prices_are_not_outliers():
+    prices = [80.0, 90.0, 95.0, 100.0, 105.0, 110.0, 120.0, 130.0]
+    flags = flagged([(f'o{n}', 'p1', price, None, 0) for n, price in enumerate(prices)])
+
+    assert flags['price_outlier_high'] == flags['price_outlier_low'] == []
+
+
+def test_small_groups_are_only_checked_for_discounts():
+    # One offer short of ANOMALY_MIN_OFFERS
+    rows = regular('p1', 100.0, price_anomalies.ANOMALY_MIN_OFFERS - 3) + [
+        ('high', 'p1', 400.0, None, 0),
+        ('no_original', 'p1', 80.0, None, 20),
+    ]
+    # Another product's offers don't count towards p1's group
+    rows += regular('p2', 400.0, price_anomalies.ANOMALY_MIN_OFFERS, prefix='q')
+    flags = flagged(rows)
+
+    assert flags['price_outlier_high'] == []
+    assert flags['discount_without_original'] == ['no_original']
+
+
+def test_no_offers():
+    assert all(ids == [] for ids in flagged([]).values())
+
+
+# ============ /api/deals ============
+
+@pytest.fixture
+def deals(main_app):
+    """Seven stores selling p1: one good deal, one per discount problem, a low outlier and regular offers"""
+    with main_app.app_context():
+        db.session.add(Product(id='p1', name='Rice', brand='Farm', category='grains'))
+        db.session.add_all([
+            Store(id=f's{n}', name=f'Store {n}', category='grocery', address=f'{n} Main Road') for n in range(1, 8)
+        ])
+        offers = [
+            ('good', 's1', 80.0, 100.0, 20),
+            ('mismatch', 's2', 90.0, 100.0, 20),
+            ('inflated', 's3', 150.0, 300.0, 50),
+            ('low', 's4', 18.0, 20.0, 10),
+            ('regular1', 's5', 100.0, None, 0),
+            ('regular2', 's6', 100.0, None, 0),
+            ('regular3', 's7', 100.0, None, 0),
+        ]
+        db.session.add_all([
+            InventoryItem(id=item_id, product_id='p1', store_id=store_id, price=price, quantity=5,
+                          original_price=original, discount_percentage=discount)
+            for item_id, store_id, price, original, discount in offers
+        ])
+        db.session.commit()
+        price_anomalies.run(db.engine)
+        db.session.remove()
+
+
+def deal_flags(client, flags=None):
+    query = f'?flags={flags}' if flags else ''
+    response = client.get(f'/api/deals{query}')
+    assert response.status_code == 200
+    return {item['id']: item['flags'] for item in response.get_json()['items']}
+
+
+def test_deals_hide_blocking_flags_by_default(client, deals):
+    # The low outlier is not a discount problem, so it stays listed
+    assert deal_flags(client) == deal_flags(client, 'exclude') == {'good': [], 'low': []}
+
+
+def test_deals_include_and_only(client, deals):
+    assert deal_flags(client, 'include') == {
+        'inflated': ['original_price_inflated'],
+        'good': [],
+        'mismatch': ['discount_mismatch'],
+        'low': ['price_outlier_low'],
+    }
+    assert deal_flags(client, 'only') == {
+        'inflated': ['original_price_inflated'],
+        'mismatch': ['discount_mismatch'],
+        'low': ['price_outlier_low'],
+    }
+    assert client.get('/api/deals?flags=all').status_code == 400
+
+
+def test_dry_run_leaves_flags_alone(main_app, deals):
+    with main_app.app_context():
+        db.session.execute(PriceFlag.__table__.delete())
+        db.session.commit()
+        stats = price_anomalies.run(db.engine, dry_run=True)
+
+        assert stats['rows'] == 7
+        assert stats['flags']['discount_mismatch'] == 1
+        assert db.session.execute(select(PriceFlag)).all() == []
+
+
+def test_corrected_offer_is_listed_without_waiting_for_the_next_run(client, deals):
+    assert client.put('/api/inventory/mismatch', json={'price': 80.0}).status_code == 200
+    assert set(deal_flags(client)) == {'good', 'mismatch', 'low'}
+
+    # Stock changes don't touch the pricing, so the flags stay
+    assert client.put('/api/inventory/inflated', json={'quantity': 2}).status_code == 200
+    assert 'inflated' not in deal_flags(client)
+    assert deal_flags(client, 'include')['inflated'] == ['original_price_inflated']
@@ -0,0 +1,59 @@
+"""
+History rows written by price_history.py for ORM inventory writes
+Runs the shared models against a fresh SQLite file.
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+from models import db, InventoryItem, PriceHistory, Product, Store
+from price_history import init_price_history
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'history.db'}"
+    db.init_app(app)
+    init_price_history(db, PriceHistory, InventoryItem)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Product(id='p1', name='Rice', brand='Farm', category='grains'),
+            Store(id='s1', name='Corner Shop', category='grocery', address='1 Main Road'),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def history():
+    table = PriceHistory.__table__
+    return db.session.execute(select(table.c.store_id, table.c.price).order_by(table.c.ts)).all()
+
+
+def test_insert_and_price_change_are_recorded(app):
+    item = InventoryItem(id='i1', product_id='p1', store_id='s1', price=50.0, quantity=3)
+    db.session.add(item)
+    db.session.commit()
+    item.price = 45.0
+    db.session.commit()
+    item.updated_at = None  # not a tracked field
+    db.session.commit()
+
+    assert history() == [('s1', 50.0), ('s1', 45.0)]
+
+
+def test_duplicate_offers_changed_in_one_flush(app):
+    first = InventoryItem(id='i1', product_id='p1', store_id='s1', price=50.0, quantity=3)
+    second = InventoryItem(id='i2', product_id='p1', store_id='s1', price=52.0, quantity=1)
+    db.session.add_all([first, second])
+    db.session.commit()
+
+    first.price = 40.0
+    second.price = 41.0
+    db.session.commit()
+
+    assert [store_id for store_id, _ in history()] == ['s1', 's1']
+    assert {first.price, second.price} == {40.0, 41.0}
@@ -0,0 +1,134 @@
+"""
+Read-replica routing against SQLite files standing in for a primary and its replicas
+Each file holds a product with a different name, so a response shows which
+database served it.
+"""
+
+import sqlite3
+
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+import read_replicas
+from db_retry import init_db_retry, retry_transient
+from read_replicas import ReplicaRoutingSession, STICKY_COOKIE, init_read_replicas, read_replica
+
+
+def make_database(path, name):
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE product (id TEXT PRIMARY KEY, name TEXT)')
+        connection.execute('INSERT INTO product VALUES (?, ?)', ('p1', name))
+
+
+def replica_url(path):
+    # Read-only, and missing files fail instead of being created
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
+
+
+@pytest.fixture
+def databases(tmp_path):
+    paths = {name: tmp_path / f'{name}.db' for name in ('primary', 'replica_a', 'replica_b')}
+    for name, path in paths.items():
+        make_database(path, name)
+    return paths
+
+
+def make_app(primary_path, replica_paths):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{primary_path}'
+    db = SQLAlchemy(app, session_options={'class_': ReplicaRoutingSession})
+    init_db_retry(db)
+    init_read_replicas(app, [replica_url(path) for path in replica_paths])
+
+    @app.route('/api/products/<product_id>', methods=['GET'])
+    @retry_transient
+    @read_replica
+    def get_product(product_id):
+        try:
+            name = db.session.execute(text('SELECT name FROM product WHERE id = :id'), {'id': product_id}).scalar()
+            return jsonify({'id': product_id, 'name': name})
+        except Exception as e:
+            return jsonify({'detail': str(e)}), 500
+
+    @app.route('/api/products/<product_id>', methods=['PUT'])
+    def update_product(product_id):
+        try:
+            db.session.execute(text('UPDATE product SET name = :name WHERE id = :id'), {'id': product_id, 'name': 'renamed'})
+            db.session.commit()
+            return jsonify({'id': product_id, 'name': 'renamed'})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'detail': str(e)}), 500
+
+    return app
+
+
+def served_by(client):
+    response = client.get('/api/products/p1')
+    assert response.status_code == 200
+    return response.get_json()['name']
+
+
+def test_reads_are_spread_across_replicas(databases):
+    client = make_app(databases['primary'], [databases['replica_a'], databases['replica_b']]).test_client()
+
+    served = [served_by(client) for _ in range(6)]
+
+    assert sorted(set(served)) == ['replica_a', 'replica_b']
+    assert served.count('replica_a') == served.count('replica_b') == 3
+
+
+def test_writes_go_to_primary_and_stick_for_a_window(databases, monkeypatch):
+    client = make_app(databases['primary'], [databases['replica_a']]).test_client()
+    assert served_by(client) == 'replica_a'
+
+    response = client.put('/api/products/p1')
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.headers.get('Set-Cookie', '')
+
+    # Read-your-writes: the primary has the update, the replica hasn't caught up
+    assert served_by(client) == 'renamed'
+
+    # Once the window has passed the client reads from the replica again
+    monkeypatch.setattr(read_replicas.time, 'time', lambda: 2 ** 40)
+    assert served_by(client) == 'replica_a'
+
+
+def test_unavailable_replica_falls_back_to_primary(databases):
+    missing = databases['replica_a'].with_name('missing.db')
+    client = make_app(databases['primary'], [missing]).test_client()
+
+    assert served_by(client) == 'primary'
+
+
+def test_unavailable_replica_is_skipped(databases):
+    missing = databases['replica_a'].with_name('missing.db')
+    client = make_app(databases['primary'], [missing, databases['replica_b']]).test_client()
+
+    assert {served_by(client) for _ in range(4)} == {'replica_b'}
+
+
+def test_lagging_replica_falls_back_to_primary(databases, monkeypatch):
+    monkeypatch.setattr(read_replicas.Replica, 'lag_seconds', lambda self, connection: 60.0)
+    client = make_app(databases['primary'], [databases['replica_a']]).test_client()
+
+    assert served_by(client) == 'primary'
+
+
+def test_replica_returns_after_next_check(databases, monkeypatch):
+    lag = {'seconds': 60.0}
+    monkeypatch.setattr(read_replicas.Replica, 'lag_seconds', lambda self, connection: lag['seconds'])
+    monkeypatch.setattr(read_replicas, 'REPLICA_CHECK_SECONDS', 0)
+    client = make_app(databases['primary'], [databases['replica_a']]).test_client()
+    assert served_by(client) == 'primary'
+
+    lag['seconds'] = 0.0
+    assert served_by(client) == 'replica_a'
+
+
+def test_no_replicas_configured_uses_primary(databases):
+    client = make_app(databases['primary'], []).test_client()
+
+    assert served_by(client) == 'primary'
@@ -0,0 +1,162 @@
+"""
+MessagePack and columnar responses against the JSON shapes they stand in for
+The app has routes written like the ones in main.py: a jsonify() list, a
+detail object, an object wrapping a list, a pre-serialized cached body and a
+404. Every format must decode to the same data as the JSON response.
+"""
+
+import gzip
+from datetime import datetime
+
+import pytest
+from flask import Flask, jsonify
+
+import single_flight
+from compression import init_compression
+from response_formats import JSON, dumps, init_response_formats, negotiate, to_columnar
+from single_flight import coalesce
+
+ormsgpack = pytest.importorskip('ormsgpack')
+
+MSGPACK = {'Accept': 'application/msgpack'}
+MSGPACK_COLUMNAR = {'Accept': 'application/msgpack; layout=columnar'}
+JSON_COLUMNAR = {'Accept': 'application/json; layout=columnar'}
+
+ITEMS = [
+    {'id': f'item-{i}', 'price': 10.5 + i, 'quantity': i, 'original_price': None if i % 2 else 20.0,
+     'discount_percentage': 0, 'updated_at': datetime(2024, 5, 1, 12, i)}
+    for i in range(40)
+]
+PATHS = ['/api/inventory', '/api/inventory/item-3', '/api/products/p1/inventory', '/api/products', '/api/missing']
+
+
+@pytest.fixture
+def client():
+    single_flight._cache.clear()
+    app = Flask(__name__)
+    init_response_formats(app)
+    init_compression(app)
+    bodies = {}
+
+    @app.route('/api/inventory', methods=['GET'])
+    def get_all_inventory():
+        return jsonify(ITEMS)
+
+    @app.route('/api/inventory/<item_id>', methods=['GET'])
+    def get_inventory_item(item_id):
+        item = next((i for i in ITEMS if i['id'] == item_id), None)
+        if not item:
+            return jsonify({'detail': 'Inventory item not found'}), 404
+        return jsonify(item)
+
+    @app.route('/api/products/<product_id>/inventory', methods=['GET'])
+    @coalesce
+    def get_product_prices(product_id):
+        return jsonify({'product_id': product_id, 'product_name': 'Rice', 'stores': ITEMS[:5]})
+
+    @app.route('/api/products', methods=['GET'])
+    def get_all_products():
+        # Serialized once per format, like the catalog bodies
+        fmt = negotiate()
+        if fmt not in bodies:
+            bodies[fmt] = dumps([{'id': 'p1', 'name': 'Rice'}, {'id': 'p2', 'name': 'Dal'}], fmt, app.json)
+        return app.response_class(bodies[fmt], content_type=fmt.content_type)
+
+    @app.route('/api/missing', methods=['GET'])
+    def missing():
+        return jsonify({'detail': 'Not found'}), 404
+
+    return app.test_client()
+
+
+def rows(columns):
+    """Columnar object back to a list of dicts"""
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def test_json_is_the_default(client):
+    for headers in ({}, {'Accept': '*/*'}, {'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8'}):
+        response = client.get('/api/inventory', headers=headers)
+        assert response.mimetype == 'application/json'
+        assert len(response.get_json()) == len(ITEMS)
+    assert negotiate() is JSON
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_msgpack_matches_json(client, path):
+    expected = client.get(path)
+    response = client.get(path, headers=MSGPACK)
+
+    assert response.status_code == expected.status_code
+    assert response.content_type == 'application/msgpack'
+    assert ormsgpack.unpackb(response.data) == expected.get_json()
+
+
+def test_msgpack_dates_match_json(client):
+    item = ormsgpack.unpackb(client.get('/api/inventory/item-3', headers=MSGPACK).data)
+    assert item['updated_at'] == client.get('/api/inventory/item-3').get_json()['updated_at']
+
+
+def test_columnar_list_has_one_array_per_field(client):
+    expected = client.get('/api/inventory').get_json()
+    response = client.get('/api/inventory', headers=MSGPACK_COLUMNAR)
+
+    columns = ormsgpack.unpackb(response.data)
+    assert response.content_type == 'application/msgpack; layout=columnar'
+    assert list(columns) == list(ITEMS[0])
+    assert rows(columns) == expected
+    assert len(response.data) < len(client.get('/api/inventory', headers=MSGPACK).data)
+
+
+def test_columnar_converts_lists_inside_an_object(client):
+    expected = client.get('/api/products/p1/inventory').get_json()
+    body = ormsgpack.unpackb(client.get('/api/products/p1/inventory', headers=MSGPACK_COLUMNAR).data)
+
+    assert body['product_id'] == expected['product_id']
+    assert rows(body['stores']) == expected['stores']
+
+
+@pytest.mark.parametrize('path', ['/api/inventory', '/api/products', '/api/inventory/item-3'])
+def test_columnar_json_matches_json(client, path):
+    expected = client.get(path).get_json()
+    response = client.get(path, headers=JSON_COLUMNAR)
+
+    assert response.content_type == 'application/json; layout=columnar'
+    body = response.get_json()
+    assert (rows(body) if isinstance(expected, list) else body) == expected
+
+
+def test_columnar_fills_missing_fields_with_null():
+    assert to_columnar([{'a': 1}, {'b': 2}]) == {'a': [1, None], 'b': [None, 2]}
+    assert to_columnar([]) == []
+    assert to_columnar([1, 2]) == [1, 2]
+
+
+def test_quality_values_are_respected(client):
+    preferred = client.get('/api/inventory', headers={'Accept': 'application/json, application/msgpack;q=0.5'})
+    assert preferred.mimetype == 'application/json'
+    preferred = client.get('/api/inventory', headers={'Accept': 'application/json;q=0.5, application/msgpack'})
+    assert preferred.mimetype == 'application/msgpack'
+
+
+def test_responses_vary_by_accept(client):
+    assert 'Accept' in client.get('/api/inventory', headers=MSGPACK).vary
+    assert 'Accept' in client.get('/api/inventory').vary
+
+
+def test_coalescing_cache_keeps_formats_apart(client):
+    path = '/api/products/p1/inventory'
+    as_json = client.get(path).get_json()
+
+    cached = client.get(path, headers=MSGPACK)
+    assert cached.headers['X-Cache'] == 'miss'
+    assert ormsgpack.unpackb(cached.data) == as_json
+    assert client.get(path, headers=MSGPACK).headers['X-Cache'] == 'hit'
+    assert client.get(path).get_json() == as_json
+
+
+def test_msgpack_is_compressed(client):
+    response = client.get('/api/inventory', headers={**MSGPACK, 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert ormsgpack.unpackb(gzip.decompress(response.data)) == client.get('/api/inventory').get_json()
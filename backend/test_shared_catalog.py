@@ -0,0 +1,100 @@
+"""
+Shared (memory-mapped) catalog snapshots from shared_catalog.py
+Runs the shared models against a fresh SQLite file and compares the shared
+snapshot with the per-worker one built from the same database.
+"""
+
+import pytest
+from flask import Flask
+
+pytest.importorskip('numpy')
+
+import catalog_snapshot
+import shared_catalog
+from catalog_snapshot import init_catalog, load_shared_snapshot, load_snapshot
+from models import db, CatalogVersion, Product, Store
+from shared_catalog import ensure_catalog_file, file_version, write_catalog_file
+
+# Name order differs from category order, so grouping by category must not reorder rows
+PRODUCTS = [
+    dict(id='p1', name='Wheat Flour', brand='Mill', category='grains'),
+    dict(id='p2', name='Apples', brand='Orchard', category='fruit'),
+    dict(id='p3', name='Basmati Rice', brand='Farm', category='grains'),
+    dict(id='p4', name='Apples', brand='Valley', category='fruit'),
+    dict(id='p5', name='Notebook', brand='Paper Co', category='stationery'),
+]
+STORES = [
+    dict(id='s1', name='Zen Mart', category='grocery', address='1 Main Road'),
+    dict(id='s2', name='Acme Pens', category='stationery', address='2 Main Road'),
+    dict(id='s3', name='Bazaar', category='grocery', address='3 Main Road'),
+]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_catalog, 'SHARED_CATALOG_DIR', str(tmp_path))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'catalog.db'}"
+    db.init_app(app)
+    init_catalog(db, CatalogVersion, Product, Store)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Product(**row) for row in PRODUCTS] + [Store(**row) for row in STORES])
+        db.session.commit()
+        yield app
+        db.session.remove()
+    catalog_snapshot.reset_catalog()
+
+
+def ids(records):
+    return [record.id for record in records]
+
+
+def test_rows_are_in_the_same_order_in_both_modes(app):
+    memory = load_snapshot()
+    shared = load_shared_snapshot(memory.version)
+
+    assert shared.version == memory.version
+    assert ids(shared.products) == ids(memory.products) == ['p2', 'p4', 'p3', 'p5', 'p1']
+    assert ids(shared.stores) == ids(memory.stores) == ['s2', 's3', 's1']
+    assert shared.store_categories == memory.store_categories
+    for category in ('grains', 'fruit', 'stationery'):
+        assert ids(shared.products_by_category.get(category)) == ids(memory.products_by_category[category])
+    assert ids(shared.products_by_category.get('grains')[1:]) == ['p1']
+    assert ids(shared.stores_by_category.get('grocery')) == ids(memory.stores_by_category['grocery'])
+    assert shared.products_by_category.get('missing', ()) == ()
+
+
+def test_file_is_rebuilt_when_the_version_changes(tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    builds = []
+
+    def builder(version):
+        def build():
+            builds.append(version)
+            write_catalog_file(path, catalog_snapshot.CatalogSnapshot(version, [], []), {})
+        return build
+
+    for version in (5, 5, 6, 2, 2):
+        ensure_catalog_file(path, version, builder(version))
+        assert file_version(path) == version
+
+    # Built once per change, including when the counter went backwards
+    assert builds == [5, 6, 2]
+
+
+def test_reset_database_is_not_served_from_the_old_file(app, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, 'CATALOG_SNAPSHOT_MODE', 'shared')
+    monkeypatch.setattr(catalog_snapshot, 'CATALOG_POLL_SECONDS', 0)
+    catalog_snapshot.reset_catalog()
+    before = catalog_snapshot.get_catalog()
+    assert len(before.products) == len(PRODUCTS)
+
+    db.drop_all()
+    db.create_all()
+    db.session.add(Product(id='p9', name='Lentils', brand='Farm', category='grains'))
+    db.session.commit()
+
+    after = catalog_snapshot.get_catalog()
+    assert after.version != before.version
+    assert ids(after.products) == ['p9']
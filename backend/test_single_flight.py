@@ -0,0 +1,185 @@
+"""
+Request coalescing and the stale-while-revalidate response cache of single_flight.py
+The app has a coalesced read route and write routes written like the ones in
+main.py, against a SQLite file. The read route can be held open to line up
+concurrent requests behind it.
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+import single_flight
+from single_flight import coalesce, init_single_flight
+
+KEY = ('get_product', '/api/products/p1?', 'json')
+
+
+@pytest.fixture
+def app_state(tmp_path):
+    single_flight._cache.clear()
+    path = tmp_path / 'single_flight.db'
+    with sqlite3.connect(path) as setup:
+        setup.execute('CREATE TABLE product (id TEXT PRIMARY KEY, name TEXT NOT NULL)')
+        setup.execute("INSERT INTO product VALUES ('p1', 'Rice')")
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db = SQLAlchemy(app)
+    init_single_flight(app)
+
+    class Product(db.Model):
+        id = db.Column(db.String(36), primary_key=True)
+        name = db.Column(db.String(255), nullable=False)
+
+    state = {'calls': 0, 'hold': None, 'entered': threading.Event()}
+
+    @app.route('/api/products/<product_id>', methods=['GET'])
+    @coalesce
+    def get_product(product_id):
+        state['calls'] += 1
+        state['entered'].set()
+        if state['hold'] is not None:
+            state['hold'].wait(5)
+        product = db.session.get(Product, product_id)
+        if not product:
+            return jsonify({'detail': 'Product not found'}), 404
+        return jsonify({'id': product.id, 'name': product.name})
+
+    @app.route('/api/products/<product_id>', methods=['PUT'])
+    def update_product(product_id):
+        try:
+            db.session.get(Product, product_id).name = request.get_json()['name']
+            db.session.commit()
+            return jsonify({'id': product_id})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'detail': 'Error updating product', 'error': str(e)}), 500
+
+    return app, db, Product, state
+
+
+def get_concurrently(app, count):
+    results = []
+    lock = threading.Lock()
+
+    def get():
+        response = app.test_client().get('/api/products/p1')
+        with lock:
+            results.append((response.headers['X-Cache'], response.get_json()))
+
+    threads = [threading.Thread(target=get) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_requests_share_one_run(app_state):
+    app, _, _, state = app_state
+    state['hold'] = threading.Event()
+
+    threads, results = get_concurrently(app, 8)
+    assert state['entered'].wait(5)
+    time.sleep(0.1)  # let the others queue behind the first request
+    state['hold'].set()
+    for thread in threads:
+        thread.join()
+
+    assert state['calls'] == 1
+    assert [cache for cache, _ in results].count('miss') == 1
+    assert {cache for cache, _ in results} <= {'miss', 'shared', 'hit'}
+    assert all(body == {'id': 'p1', 'name': 'Rice'} for _, body in results)
+
+
+def test_fresh_entries_are_served_from_cache(app_state):
+    app, _, _, state = app_state
+    client = app.test_client()
+
+    assert client.get('/api/products/p1').headers['X-Cache'] == 'miss'
+    assert client.get('/api/products/p1').headers['X-Cache'] == 'hit'
+    assert state['calls'] == 1
+
+
+def test_errors_are_not_cached(app_state):
+    app, _, _, state = app_state
+    client = app.test_client()
+
+    assert client.get('/api/products/missing').status_code == 404
+    assert client.get('/api/products/missing').headers['X-Cache'] == 'miss'
+    assert state['calls'] == 2
+
+
+def test_stale_entry_is_served_while_one_request_refreshes(app_state):
+    app, db, _, state = app_state
+    client = app.test_client()
+    client.get('/api/products/p1')
+    single_flight._cache.get(KEY).stored_at -= single_flight.RESPONSE_CACHE_SECONDS + 1
+    # Raw SQL bypasses the flush hooks, so the expired entry keeps the old name
+    with app.app_context():
+        db.session.execute(text("UPDATE product SET name = 'Basmati' WHERE id = 'p1'"))
+        db.session.commit()
+
+    state['hold'] = threading.Event()
+    state['entered'].clear()
+    threads, results = get_concurrently(app, 1)
+    assert state['entered'].wait(5)
+
+    stale = client.get('/api/products/p1')
+    assert stale.headers['X-Cache'] == 'stale'
+    assert stale.get_json()['name'] == 'Rice'
+
+    state['hold'].set()
+    threads[0].join()
+    assert results == [('miss', {'id': 'p1', 'name': 'Basmati'})]
+    fresh = client.get('/api/products/p1')
+    assert (fresh.headers['X-Cache'], fresh.get_json()['name']) == ('hit', 'Basmati')
+
+
+def test_expired_entry_past_stale_window_waits_for_reload(app_state):
+    app, _, _, state = app_state
+    client = app.test_client()
+    client.get('/api/products/p1')
+    expired = single_flight.RESPONSE_CACHE_SECONDS + single_flight.RESPONSE_CACHE_STALE_SECONDS + 1
+    single_flight._cache.get(KEY).stored_at -= expired
+
+    assert client.get('/api/products/p1').headers['X-Cache'] == 'miss'
+    assert state['calls'] == 2
+
+
+def test_commit_clears_the_cache(app_state):
+    app, _, _, _ = app_state
+    client = app.test_client()
+    client.get('/api/products/p1')
+
+    assert client.put('/api/products/p1', json={'name': 'Basmati'}).status_code == 200
+
+    response = client.get('/api/products/p1')
+    assert response.headers['X-Cache'] == 'miss'
+    assert response.get_json()['name'] == 'Basmati'
+
+
+def test_rollback_returns_the_views_json_error(app_state):
+    app, _, _, _ = app_state
+    client = app.test_client()
+    client.get('/api/products/p1')
+
+    response = client.put('/api/products/p1', json={'name': None})
+
+    assert response.status_code == 500
+    assert response.get_json()['detail'] == 'Error updating product'
+    # Nothing was written, so the cached response stays
+    assert client.get('/api/products/p1').headers['X-Cache'] == 'hit'
+
+
+def test_rollback_of_a_flushed_write_keeps_working(app_state):
+    app, db, Product, _ = app_state
+    with app.app_context():
+        db.session.get(Product, 'p1').name = 'Basmati'
+        db.session.flush()
+        db.session.rollback()
+        assert db.session.get(Product, 'p1').name == 'Rice'
@@ -0,0 +1,111 @@
+"""
+InventoryItem.store_category, the copy of its store's category kept by models.py
+Runs the shared models against a fresh create_all() SQLite file.
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, select, text
+
+from models import db, InventoryItem, Product, Store
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'store_category.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Product(id='p1', name='Rice', brand='Farm', category='grains'),
+            Store(id='s1', name='Corner Shop', category='grocery', address='1 Main Road'),
+            Store(id='s2', name='Pen Point', category='stationery', address='2 Main Road'),
+        ])
+        db.session.commit()
+        db.session.expunge_all()
+        yield app
+        db.session.remove()
+
+
+def categories():
+    table = InventoryItem.__table__
+    return dict(db.session.execute(select(table.c.id, table.c.store_category).order_by(table.c.id)).all())
+
+
+def store_selects(statements):
+    return [s for s in statements if s.lstrip().upper().startswith('SELECT') and 'FROM store' in s]
+
+
+@pytest.fixture
+def statements(app):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_raw_insert_defaults_to_other(app):
+    db.session.execute(text(
+        "INSERT INTO inventory_item (id, product_id, store_id, price, quantity) VALUES ('i1', 'p1', 's1', 10, 1)"
+    ))
+    db.session.commit()
+
+    assert categories() == {'i1': 'other'}
+
+
+def test_inserts_look_up_stores_once_per_flush(app, statements):
+    db.session.add_all([
+        InventoryItem(id=f'i{n}', product_id='p1', store_id='s1' if n % 2 else 's2', price=10.0 + n, quantity=1)
+        for n in range(20)
+    ])
+    db.session.commit()
+
+    assert len(store_selects(statements)) == 1
+    assert set(categories().values()) == {'grocery', 'stationery'}
+    assert categories()['i1'] == 'grocery'
+
+
+def test_pending_and_loaded_stores_need_no_query(app, statements):
+    store = Store(id='s3', name='Home Needs', category='household', address='3 Main Road')
+    loaded = db.session.get(Store, 's1')
+    loaded.category = 'supermarket'
+    statements.clear()
+    db.session.add_all([
+        store,
+        InventoryItem(id='i1', product_id='p1', store_id='s3', price=10.0, quantity=1),
+        InventoryItem(id='i2', product_id='p1', store=loaded, price=11.0, quantity=1),
+    ])
+    db.session.commit()
+
+    assert store_selects(statements) == []
+    assert categories() == {'i1': 'household', 'i2': 'supermarket'}
+
+
+def test_moving_an_item_copies_the_new_category(app):
+    item = InventoryItem(id='i1', product_id='p1', store_id='s1', price=10.0, quantity=1)
+    db.session.add(item)
+    db.session.commit()
+    db.session.expunge_all()
+
+    db.session.get(InventoryItem, 'i1').store_id = 's2'
+    db.session.commit()
+    assert categories() == {'i1': 'stationery'}
+
+    db.session.get(InventoryItem, 'i1').price = 12.0
+    db.session.commit()
+    assert categories() == {'i1': 'stationery'}
+
+
+def test_store_category_change_reaches_its_items(app):
+    db.session.add(InventoryItem(id='i1', product_id='p1', store_id='s1', price=10.0, quantity=1))
+    db.session.commit()
+
+    db.session.get(Store, 's1').category = 'supermarket'
+    db.session.commit()
+
+    assert categories() == {'i1': 'supermarket'}
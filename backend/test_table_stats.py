@@ -0,0 +1,62 @@
+"""
+Row counters kept by table_stats.py for /api/status
+Runs the shared models against a fresh SQLite file.
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, select
+
+import table_stats
+from models import db, Product, Store, TableRowCount
+from table_stats import get_counts, init_table_stats
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'stats.db'}"
+    db.init_app(app)
+    init_table_stats(db, TableRowCount, [Product, Store])
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Product(id='p1', name='Rice', brand='Farm', category='grains'),
+            Product(id='p2', name='Oil', brand='Press', category='oils'),
+        ])
+        db.session.commit()
+        db.session.execute(TableRowCount.__table__.delete())
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def stored():
+    table = TableRowCount.__table__
+    return dict(db.session.execute(select(table.c.table_name, table.c.row_count)).all())
+
+
+def test_missing_counters_are_initialized_and_kept_in_step(app):
+    assert get_counts() == {'product': 2, 'store': 0}
+    assert stored() == {'product': 2, 'store': 0}
+
+    db.session.add(Store(id='s1', name='Corner Shop', category='grocery', address='1 Main Road'))
+    db.session.delete(db.session.get(Product, 'p2'))
+    db.session.commit()
+
+    assert get_counts() == stored() == {'product': 1, 'store': 1}
+
+
+def test_concurrent_initialization_reads_the_winners_counters(app):
+    def another_worker_initializes(session, flush_context, instances):
+        # Lands between this request's COUNT(*) and its insert of the same rows
+        with db.engine.begin() as connection:
+            connection.execute(TableRowCount.__table__.insert(), [
+                {'table_name': 'product', 'row_count': 2},
+                {'table_name': 'store', 'row_count': 0},
+            ])
+
+    event.listen(db.session, 'before_flush', another_worker_initializes, once=True)
+
+    assert get_counts() == {'product': 2, 'store': 0}
+    assert stored() == {'product': 2, 'store': 0}
@@ -0,0 +1,210 @@
+"""
+Image uploads through main.py's routes, stored by storage.LocalBackend
+Runs the app against a fresh SQLite file (see conftest.py) with the storage
+backend pointed at a LocalBackend under tmp_path.
+"""
+
+import io
+import os
+
+import pytest
+from flask import Flask
+
+import storage
+from image_pipeline import VARIANTS, image_variant_urls
+from models import db, Product
+from storage import LocalBackend, init_local_media
+from supabase_storage import SupabaseStorage
+from uploads import MAX_UPLOAD_BYTES, UploadRejected, spool_upload
+
+Image = pytest.importorskip('PIL.Image')
+
+MEDIA_URL = 'http://media.test/media'
+
+
+def png(size=(640, 480), color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def corrupt_png():
+    # Valid signature and header, then the image data stops
+    data = png()
+    return data[:len(data) // 2]
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = LocalBackend(str(tmp_path / 'media'), MEDIA_URL)
+    monkeypatch.setattr(storage, '_backend', backend)
+    monkeypatch.setattr(storage, '_backend_pid', os.getpid())
+    return backend
+
+
+@pytest.fixture
+def products(main_app):
+    with main_app.app_context():
+        db.session.add_all([
+            Product(id=f'p{n}', name=f'Product {n}', brand='Farm', category='grains') for n in range(1, 4)
+        ])
+        db.session.commit()
+        db.session.remove()
+
+
+def upload(client, product_id, data, filename='photo.png'):
+    return client.post(
+        f'/api/products/{product_id}/image',
+        data={'image': (io.BytesIO(data), filename)},
+        content_type='multipart/form-data',
+    )
+
+
+def stored_url(main_app, product_id):
+    with main_app.app_context():
+        return db.session.get(Product, product_id).image_url
+
+
+def test_corrupt_image_is_rejected_with_400(client, main_app, backend, products):
+    response = upload(client, 'p1', corrupt_png())
+
+    assert response.status_code == 400
+    assert 'could not be read as an image' in response.get_json()['detail']
+    assert stored_url(main_app, 'p1') is None
+
+
+def test_bulk_upload_reports_the_corrupt_file(client, main_app, backend, products):
+    response = client.post('/api/products/images', data={
+        'p1': (io.BytesIO(png()), 'one.png'),
+        'p2': (io.BytesIO(corrupt_png()), 'two.png'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert results['p1']['image_url'].startswith(f'{MEDIA_URL}/products/p1/')
+    assert 'could not be read as an image' in results['p2']['detail']
+    assert stored_url(main_app, 'p2') is None
+
+
+def variant_paths(backend, image_url):
+    base = image_url[len(MEDIA_URL) + 1:].rsplit('/', 1)[0]
+    return {
+        (name, extension): backend.path(f'{base}/{name}.{extension}')
+        for name in ('thumb', 'card', 'full') for extension in ('webp', 'jpg')
+    }
+
+
+def test_upload_stores_every_variant(client, main_app, backend, products):
+    data = png(size=(2000, 1000))
+    response = upload(client, 'p1', data)
+
+    assert response.status_code == 200
+    image_url = response.get_json()['image_url']
+    digest = storage.content_hash(data)[:16]
+    assert image_url == f'{MEDIA_URL}/products/p1/{digest}/full.webp'
+    assert stored_url(main_app, 'p1') == image_url
+    assert image_variant_urls(image_url) == {
+        name: f'{MEDIA_URL}/products/p1/{digest}/{name}.webp' for name in ('thumb', 'card', 'full')
+    }
+
+    for (name, extension), path in variant_paths(backend, image_url).items():
+        with Image.open(path) as variant:
+            assert variant.format == {'webp': 'WEBP', 'jpg': 'JPEG'}[extension]
+            assert max(variant.size) == dict(VARIANTS)[name]
+            assert variant.size[0] == 2 * variant.size[1]
+
+
+def test_identical_images_share_one_blob(client, backend, products):
+    data = png()
+    first = upload(client, 'p1', data).get_json()['image_url']
+    second = upload(client, 'p2', data).get_json()['image_url']
+    first_paths, second_paths = variant_paths(backend, first), variant_paths(backend, second)
+
+    assert first != second
+    blobs = [path for _, _, files in os.walk(os.path.join(backend.root, LocalBackend.BLOB_DIR)) for path in files]
+    assert len(blobs) == len(first_paths)
+    for key, path in first_paths.items():
+        assert os.path.samefile(path, second_paths[key])
+        assert os.stat(path).st_nlink == 3  # two keys and the blob
+
+    # The blob goes once no key links to it
+    full = first_paths[('full', 'webp')]
+    blob = backend._blob_path(storage.file_hash(full))
+    assert backend.delete(first[len(MEDIA_URL) + 1:])
+    assert os.path.exists(blob)
+    assert backend.delete(second[len(MEDIA_URL) + 1:])
+    assert not os.path.exists(blob)
+
+
+def test_local_backend_rejects_keys_outside_its_root(backend):
+    for key in ('../escape.png', '/etc/passwd', '.blobs/ab/abcdef'):
+        with pytest.raises(ValueError):
+            backend.path(key)
+
+
+def test_content_that_is_not_an_image_is_rejected(client, main_app, backend, products):
+    response = upload(client, 'p1', b'<?php echo "hi"; ?>' * 20, filename='photo.png')
+
+    assert response.status_code == 400
+    assert 'not an allowed image type' in response.get_json()['detail']
+    assert stored_url(main_app, 'p1') is None
+    assert upload(client, 'p1', png(), filename='photo.exe').status_code == 400
+
+
+def test_oversize_upload_is_rejected_with_413(client, backend, products):
+    data = png() + b'\0' * MAX_UPLOAD_BYTES
+    response = upload(client, 'p1', data)
+
+    assert response.status_code == 413
+    assert 'File too large' in response.get_json()['detail']
+
+    # Inside a bulk request the limit is enforced while the file streams in
+    results = client.post('/api/products/images', data={'p1': (io.BytesIO(data), 'big.png')},
+                          content_type='multipart/form-data').get_json()
+    assert 'File too large' in results['p1']['detail']
+
+
+def test_streaming_validation_stops_at_the_limit():
+    stream = io.BytesIO(png() + b'\0' * 10_000)
+    with pytest.raises(UploadRejected) as rejected:
+        with spool_upload(stream, max_bytes=4096, chunk_size=1024):
+            pass
+
+    assert rejected.value.status_code == 413
+    # Rejected within a chunk of the limit instead of after reading everything
+    assert stream.tell() <= 4096 + 2 * 1024
+
+
+def test_bulk_upload_reports_each_bad_file(client, main_app, backend, products):
+    response = client.post('/api/products/images', data={
+        'p1': (io.BytesIO(png()), 'one.png'),
+        'p2': (io.BytesIO(b'plain text, not an image' * 20), 'two.png'),
+        'p3': (io.BytesIO(png(color=(0, 0, 200))), 'three.gif.txt'),
+        'missing': (io.BytesIO(png()), 'four.png'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert results['p1']['image_url'] == stored_url(main_app, 'p1')
+    assert 'not an allowed image type' in results['p2']['detail']
+    assert 'File type not allowed' in results['p3']['detail']
+    assert results['missing'] == {'detail': 'Product not found'}
+    assert stored_url(main_app, 'p2') is None
+
+
+def test_storage_clients_share_the_process_backend(backend):
+    assert SupabaseStorage().backend is backend
+    assert SupabaseStorage().backend is storage.get_backend()
+
+
+def test_local_media_is_served_immutable(backend):
+    app = Flask(__name__)
+    init_local_media(app, backend)
+    backend.put('uploads/logo.png', png(), 'image/png')
+
+    response = app.test_client().get('/media/uploads/logo.png')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert 'immutable' in response.headers['Cache-Control']
+    response.close()
+    assert app.test_client().get('/media/.blobs/missing').status_code == 404
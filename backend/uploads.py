@@ -0,0 +1,147 @@
+"""
+Streaming validation for image uploads
+Reads the upload in fixed-size chunks, sniffs the real file type from the
+first bytes and enforces the size limit as it goes, so an oversize or
+disguised file is rejected as soon as it shows up instead of after it has been
+read into memory. Accepted uploads are spooled to a temporary file that the
+image pipeline and storage backends read from by path.
+
+Usage:
+    with spool_upload(file.stream) as upload:
+        backend.put_file(key, upload.path, upload.content_type)
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from storage import new_hasher
+
+# Optional: Only import if filetype is installed
+try:
+    import filetype
+    FILETYPE_AVAILABLE = True
+except ImportError:
+    print("⚠️  Warning: filetype not installed. Falling back to built-in image signatures.")
+    print("   Install with: pip install filetype")
+    FILETYPE_AVAILABLE = False
+
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 5 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))
+
+# Sniffed extension -> content type
+ALLOWED_IMAGE_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+# filetype needs at most this many leading bytes to identify a file
+SNIFF_BYTES = 261
+
+
+class UploadRejected(ValueError):
+    """Upload failed validation; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    digest: str
+    extension: str
+    content_type: str
+
+
+def sniff_image_type(head):
+    """
+    Identify an image from its leading bytes
+
+    Returns:
+        Extension from ALLOWED_IMAGE_TYPES, or None if the bytes are not an allowed image
+    """
+    if FILETYPE_AVAILABLE:
+        kind = filetype.guess(head)
+        extension = kind.extension if kind else None
+    elif head.startswith(b'\xff\xd8\xff'):
+        extension = 'jpg'
+    elif head.startswith(b'\x89PNG\r\n\x1a\n'):
+        extension = 'png'
+    elif head[:6] in (b'GIF87a', b'GIF89a'):
+        extension = 'gif'
+    elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        extension = 'webp'
+    else:
+        extension = None
+    return extension if extension in ALLOWED_IMAGE_TYPES else None
+
+
+def iter_validated_chunks(stream, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Yield the upload in chunks, validating type and size on the fly
+
+    The first item yielded is the sniffed extension; the rest are data chunks.
+
+    Raises:
+        UploadRejected: Empty file, not an allowed image type, or larger than max_bytes (413)
+    """
+    head = b''
+    while len(head) < SNIFF_BYTES:
+        chunk = stream.read(SNIFF_BYTES - len(head))
+        if not chunk:
+            break
+        head += chunk
+    if not head:
+        raise UploadRejected("Empty file")
+
+    extension = sniff_image_type(head)
+    if extension is None:
+        allowed = ', '.join(sorted(ALLOWED_IMAGE_TYPES))
+        raise UploadRejected(f"File content is not an allowed image type. Allowed: {allowed}")
+    yield extension
+
+    size = len(head)
+    chunk = head
+    while chunk:
+        if size > max_bytes:
+            raise UploadRejected(
+                f"File too large. Max size: {max_bytes / 1024 / 1024:.0f}MB", status_code=413
+            )
+        yield chunk
+        chunk = stream.read(chunk_size)
+        size += len(chunk)
+
+
+@contextmanager
+def spool_upload(stream, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Validate an upload stream chunk by chunk into a temporary file
+
+    Yields:
+        SpooledUpload with the temp file path, size and content hash; the file
+        is removed when the block exits.
+    """
+    chunks = iter_validated_chunks(stream, max_bytes, chunk_size)
+    extension = next(chunks)
+    hasher = new_hasher()
+    size = 0
+
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix=f'.{extension}')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                hasher.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        yield SpooledUpload(path, size, hasher.hexdigest(), extension, ALLOWED_IMAGE_TYPES[extension])
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -19,9 +19,11 @@ class ApiConfig {
   static const String PRODUCTS = '/products';
   static const String PRODUCTS_SEARCH = '/products/search';
   static const String PRODUCTS_CATEGORY = '/products/category';
+  static const String PRODUCTS_BROWSE = '/products/browse';
   
   static const String STORES = '/stores';
   static const String STORES_NEARBY = '/stores/nearby';
+  static const String STORE_CATALOG = '/catalog';  // GET /stores/{id}/catalog
   
   static const String INVENTORY = '/inventory';
   static const String INVENTORY_PRODUCT = '/inventory/product';
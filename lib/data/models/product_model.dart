@@ -4,6 +4,7 @@ class ProductModel {
   final String brand;
   final String category;
   final String? imageUrl;
+  final Map<String, String>? imageVariants; // thumb / card / full WebP URLs
   final String? description;
   final String? unit; // e.g., "1kg", "500ml", "piece"
 
@@ -13,10 +14,15 @@ class ProductModel {
     required this.brand,
     required this.category,
     this.imageUrl,
+    this.imageVariants,
     this.description,
     this.unit,
   });
 
+  // Small variants for list screens, falling back to the original upload
+  String? get thumbnailUrl => imageVariants?['thumb'] ?? imageUrl;
+  String? get cardImageUrl => imageVariants?['card'] ?? imageUrl;
+
   factory ProductModel.fromJson(Map<String, dynamic> json) {
     return ProductModel(
       id: json['id'] ?? '',
@@ -24,6 +30,8 @@ class ProductModel {
       brand: json['brand'] ?? '',
       category: json['category'] ?? '',
       imageUrl: json['image_url'],
+      imageVariants: (json['image_variants'] as Map<String, dynamic>?)
+          ?.map((key, value) => MapEntry(key, value as String)),
       description: json['description'],
       unit: json['unit'],
     );
@@ -36,6 +44,7 @@ class ProductModel {
       'brand': brand,
       'category': category,
       'image_url': imageUrl,
+      'image_variants': imageVariants,
       'description': description,
       'unit': unit,
     };
@@ -219,13 +219,13 @@ class _ProductCard extends StatelessWidget {
                   bottomLeft: Radius.circular(16),
                 ),
               ),
-              child: (product.imageUrl?.isNotEmpty ?? false)
+              child: (product.thumbnailUrl?.isNotEmpty ?? false)
                   ? ClipRRect(
                       borderRadius: const BorderRadius.only(
                         topLeft: Radius.circular(16),
                         bottomLeft: Radius.circular(16),
                       ),
-                      child: Image.network(product.imageUrl!, fit: BoxFit.cover,
+                      child: Image.network(product.thumbnailUrl!, fit: BoxFit.cover,
                           errorBuilder: (_, __, ___) =>
                               const Icon(Icons.image_not_supported_outlined, color: Colors.grey)),
                     )
@@ -61,14 +61,14 @@ class ProductItemCard extends StatelessWidget {
                   topRight: Radius.circular(15),
                 ),
               ),
-              child: (product.imageUrl?.isNotEmpty ?? false)
+              child: (product.cardImageUrl?.isNotEmpty ?? false)
                   ? ClipRRect(
                       borderRadius: const BorderRadius.only(
                         topLeft: Radius.circular(15),
                         topRight: Radius.circular(15),
                       ),
                       child: Image.network(
-                        product.imageUrl!,
+                        product.cardImageUrl!,
                         fit: BoxFit.cover,
                         errorBuilder: (_, __, ___) => Center(
                           child: Text(